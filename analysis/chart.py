@@ -1,17 +1,20 @@
-from matplotlib.axes import Axes
-import matplotlib.pyplot as plt
+from typing import TYPE_CHECKING
+
 import pandas as pd
 
 from base import Threaded
 from data import store as store
 from utils import ui, logger
 
+if TYPE_CHECKING:
+    import matplotlib.pyplot as plt
+
 _logger = logger.get_logger()
 
 
 class Chart(Threaded):
-    figure: plt.Figure
-    ax: plt.Axes
+    figure: 'plt.Figure'
+    ax: 'plt.Axes'
     ticker: str
     history: pd.DataFrame
 
@@ -26,6 +29,10 @@ class Chart(Threaded):
         self.live = live
         self.history = pd.DataFrame()
         self.company: dict = {}
+
+        # matplotlib is slow to import, so only when a chart is created
+        import matplotlib.pyplot as plt
+
         self.figure, self.ax = plt.subplots(figsize=ui.CHART_SIZE)
 
         plt.style.use(ui.CHART_STYLE)
@@ -49,7 +56,7 @@ class Chart(Threaded):
 
         self.task_state = 'Done'
 
-    def plot_ohlc(self) -> tuple[plt.Figure, plt.Axes]:
+    def plot_ohlc(self) -> tuple['plt.Figure', 'plt.Axes']:
         if self.history.empty:
             _logger.info(f'Need history for {self.ticker}. Fetching...')
             self.fetch_history()
@@ -92,7 +99,7 @@ class Chart(Threaded):
 
         return (self.figure, self.ax)
 
-    def plot_history(self, close: bool = False) -> plt.Figure:
+    def plot_history(self, close: bool = False) -> 'plt.Figure':
         if self.history.empty:
             _logger.info(f'Need history for {self.ticker}. Fetching...')
             self.fetch_history()
@@ -9,8 +9,10 @@ _logger = logger.get_logger()
 
 
 class Company:
-    def __init__(self, ticker: str, days: int, backtest: int = 0, lazy: bool = True, live: bool = False):
-        if not store.is_ticker(ticker):
+    def __init__(self, ticker: str, days: int, backtest: int = 0, lazy: bool = True, live: bool = False, history: pd.DataFrame | None = None,
+                 validated: bool = False):
+        preloaded = history is not None and not history.empty
+        if not preloaded and not validated and not store.is_ticker(ticker):
             raise ValueError(f'Invalid ticker {ticker}')
         if days < 1:
             raise ValueError('Invalid number of days')
@@ -28,6 +30,9 @@ class Company:
         self.active = True
         self.ta: Technical = None
 
+        if preloaded:
+            self.set_history(history)
+
         if not lazy:
             self._load_history()
             self._load_company()
@@ -38,6 +43,13 @@ class Company:
     def __str__(self):
         return f'{self.ticker}'
 
+    def set_history(self, history: pd.DataFrame) -> None:
+        ''' Use a history loaded elsewhere (e.g. in bulk), rather than loading it on first use '''
+
+        if not history.empty:
+            self.history = history
+            self.ta = Technical(self.ticker, self.history, self.days, end=self.backtest, live=self.live)
+
     def get_last_price(self) -> float:
         value = -1.0
         if self.history.empty:
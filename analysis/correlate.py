@@ -1,5 +1,6 @@
 import datetime as dt
 
+import numpy as np
 import pandas as pd
 
 from base import Threaded
@@ -11,10 +12,17 @@ _logger = logger.get_logger()
 
 CORRELATION_CUTOFF = 0.85
 CACHE_TYPE = 'cor'
+TOP_K = 25          # Neighbors kept per ticker
+BLOCK_SIZE = 512    # Tickers correlated per block (block x tickers matrix in memory)
+CACHE_TYPE_ROLLING = 'rcor'
+ROLLING_WINDOW = 60     # Days in each rolling correlation
+ROLLING_HISTORY = 365   # Days of rolling correlations kept
+CACHE_TYPE_CLUSTER = 'clu'
+CLUSTER_CUTOFF = 0.90   # Return correlation of every pair within a cluster
 
 
 class Correlate(Threaded):
-    def __init__(self, tickers: list[str], name: str, days: int = 365):
+    def __init__(self, tickers: list[str], name: str, days: int = 365, dtype: type = np.float64):
         if tickers is None:
             raise ValueError('Invalid list of tickers')
         if not tickers:
@@ -24,14 +32,18 @@ class Correlate(Threaded):
         self.name = name
         self.results: pd.DataFrame = pd.DataFrame()
         self.filtered: pd.DataFrame = pd.DataFrame()
+        self.closes: pd.DataFrame = pd.DataFrame()
+        self.clusters: pd.DataFrame = pd.DataFrame()
+        self.rolling: RollingCorrelation | None = None
         self.days: int = days
+        self.dtype: type = dtype
         self.cache_available = False
         self.cache_date: str = dt.datetime.now().strftime(ui.DATE_FORMAT_YMD)
         self.cache_today_only = cache.CACHE_TODAY_ONLY
         self.cache_available = cache.exists(self.name, CACHE_TYPE, today_only=self.cache_today_only)
 
     @Threaded.threaded
-    def compute(self) -> None:
+    def compute(self, returns: bool = False, top: int = TOP_K, cutoff: float = CORRELATION_CUTOFF) -> None:
         self.results = pd.DataFrame()
         combined_df = pd.DataFrame()
         self.task_total = len(self.tickers)
@@ -40,82 +52,145 @@ class Correlate(Threaded):
             combined_df, self.cache_date = cache.load(self.name, CACHE_TYPE, today_only=self.cache_today_only)
         else:
             self.task_state = 'Fetching'
-            for ticker in self.tickers:
-                self.task_ticker = ticker
-                df = store.get_history(ticker, self.days)
-                if not df.empty:
-                    df = df.set_index('date')
-                    df = df.rename(columns={'close': ticker})
-                    df = df.drop(['high', 'low', 'open', 'volume'], axis=1)
-
-                    if combined_df.empty:
-                        combined_df = df
-                    else:
-                        combined_df = pd.concat([combined_df, df], axis=1)
-
-                self.task_completed += 1
+            combined_df = self._get_closes(self.tickers, self.days)
 
             if not combined_df.empty:
                 cache.dump(combined_df, self.name, CACHE_TYPE)
 
+        self.closes = combined_df
+
         if not combined_df.empty:
             self.task_state = 'Correlating'
-            self.results = combined_df.fillna(combined_df.mean())
-            self.results = combined_df.corr()
+
+            values = combined_df.to_numpy(dtype=float)
+            if returns:
+                values = _get_returns(values)
+
+            ticker, neighbor, correlation = find_neighbors(values, top=top, cutoff=cutoff, dtype=self.dtype)
+
+            tickers = combined_df.columns.to_numpy()
+            self.results = pd.DataFrame({'ticker1': tickers[ticker], 'ticker2': tickers[neighbor], 'correlation': correlation})
             self.task_object = self.results
 
+            _logger.info(f'Correlated {len(tickers)} tickers, {len(self.results)} neighbors above {cutoff}')
+
         self.task_state = 'Done'
 
     @Threaded.threaded
     def filter(self, sublist: list[str]=[]) -> None:
         self.filtered = pd.DataFrame()
 
-        all_df = pd.DataFrame()
-        all = []
         if not self.results.empty:
             if sublist:
-                tickers = [ticker for ticker in self.results if ticker in sublist]
+                tickers = [ticker for ticker in self.results['ticker1'].unique() if ticker in sublist]
             else:
-                tickers = [ticker for ticker in self.results if ticker in self.results]
+                tickers = self.results['ticker1'].unique().tolist()
 
             self.task_total = len(tickers)
             self.task_state = 'Filtering'
 
-            correlation_generator = (self.get_ticker_correlation(ticker) for ticker in tickers)
-            for df in correlation_generator:
-                self.task_ticker = df.index.name
-                for s in df.itertuples():
-                    # s = (ticker1, ticker2, correlation)
-                    # Arrange the symbol names so we can more easily remove duplicates
-                    if df.index.name < s[1]:
-                        t = (df.index.name, s[1])
-                    else:
-                        t = (s[1], df.index.name)
-
-                    # Add if relevant and not already in list
-                    if s[2] < CORRELATION_CUTOFF:
-                        pass
-                    elif t not in all:
-                        all.append(t)
-                        new = pd.Series({'ticker1':t[0], 'ticker2':t[1], 'correlation':s[2]}).to_frame().T
-                        all_df = pd.concat([all_df, new])
+            df = _get_pairs(self.results[self.results['ticker1'].isin(tickers)])
+
+            self.task_completed = len(tickers)
+            df = df.sort_values(['correlation'], ascending=False)
+            self.filtered = df.reset_index(drop=True)
+
+        self.task_state = 'Done'
+
+    @Threaded.threaded
+    def compute_rolling(self, window: int = ROLLING_WINDOW, min_periods: int = 0, returns: bool = False, use_cache: bool = True) -> None:
+        ''' Rolling correlation of each neighbor pair found by compute(). The running sums are cached, so later
+        calls only fetch and add the days since, rather than re-correlating the whole history '''
+
+        pairs = []
+        if not self.results.empty:
+            df = _get_pairs(self.results)
+            pairs = list(zip(df['ticker1'], df['ticker2']))
+
+        closes = pd.DataFrame()
+        self.rolling = None
 
+        if use_cache and cache.exists(self.name, CACHE_TYPE_ROLLING, today_only=False):
+            rolling, _ = cache.load(self.name, CACHE_TYPE_ROLLING, today_only=False)
+            if rolling is None:
+                _logger.info('Cached rolling correlation not used. Unable to load')
+            elif rolling.window != window or rolling.min_periods != (min_periods or window) or rolling.returns != returns:
+                _logger.info('Cached rolling correlation not used. Different window')
+            elif not set(pairs) <= set(rolling.pairs):
+                _logger.info('Cached rolling correlation not used. Different pairs')
+            else:
+                self.rolling = rolling
+
+        if self.rolling is not None:
+            self.task_state = 'Fetching'
+            last = pd.Timestamp(self.rolling.dates[-1])
+            closes = self._get_closes(self.rolling.tickers, (pd.Timestamp.now() - last).days + 2)
+            if not closes.empty:
+                closes = closes[pd.to_datetime(closes.index) > last]
+        elif pairs:
+            self.rolling = RollingCorrelation(self.closes.columns.tolist(), pairs, window=window, min_periods=min_periods, returns=returns)
+            closes = self.closes
+        else:
+            _logger.warning('Must first compute correlation')
+
+        if self.rolling is not None:
+            self.task_state = 'Correlating'
+            self.task_total = len(closes)
+            self.task_completed = 0
+
+            closes = closes.reindex(columns=self.rolling.tickers)
+            for date, values in zip(closes.index, closes.to_numpy(dtype=float)):
+                self.rolling.update(date, values)
                 self.task_completed += 1
 
-            all_df = all_df.sort_values(['correlation'], ascending=False)
-            self.filtered = all_df.reset_index(drop=True)
+            if len(closes) > 0:
+                cache.dump(self.rolling, self.name, CACHE_TYPE_ROLLING)
+
+            self.task_object = self.rolling
+            _logger.info(f'Rolled {len(self.rolling.pairs)} pairs over {len(closes)} new day(s)')
 
         self.task_state = 'Done'
 
+    def cluster(self, cutoff: float = CLUSTER_CUTOFF) -> None:
+        ''' Group the tickers into clusters of near-identical tickers, whose daily returns all correlate above the
+        cutoff, and cache the assignments for the screener and strategies to remove duplicates. Returns are used
+        whatever compute() correlated, since trending prices correlate on their levels even when unrelated '''
+
+        self.clusters = pd.DataFrame()
+
+        if not self.closes.empty:
+            tickers = pd.Index(self.closes.columns, name='ticker')
+            labels = find_clusters(_get_returns(self.closes.to_numpy(dtype=float)), cutoff=cutoff, dtype=self.dtype)
+
+            self.clusters = pd.DataFrame({'cluster': labels, 'size': np.bincount(labels)[labels]}, index=tickers)
+            self.clusters = self.clusters.sort_values(['size', 'cluster'], ascending=[False, True])
+            cache.dump(self.clusters, self.name, CACHE_TYPE_CLUSTER)
+
+            _logger.info(f'Clustered {len(tickers)} tickers into {labels.max() + 1} clusters')
+        else:
+            _logger.warning('Must first compute correlation')
+
+    def get_pair_correlation(self, ticker1: str, ticker2: str) -> pd.Series:
+        series = pd.Series(dtype=float)
+
+        if self.rolling is not None:
+            series = self.rolling.get_pair(ticker1, ticker2)
+        else:
+            _logger.warning('Must first compute rolling correlation')
+
+        return series
+
     def get_ticker_correlation(self, ticker: str) -> pd.DataFrame:
         ticker = ticker.upper()
         df = pd.DataFrame()
 
         series = pd.Series(dtype=float)
         if not self.results.empty:
-            if ticker in self.results.index:
-                series = self.results[ticker].sort_values(ascending=False)
-                series = series.drop(ticker) # Drop own entry (corr = 1.0)
+            neighbors = self.results[self.results['ticker1'] == ticker]
+            if not neighbors.empty:
+                series = neighbors.set_index('ticker2')['correlation'].sort_values(ascending=False)
+            elif ticker in self.closes:
+                _logger.info(f'No neighbors of {ticker} correlated above cutoff')
             else:
                 _logger.warning(f'Invalid ticker {ticker}')
         else:
@@ -126,12 +201,323 @@ class Correlate(Threaded):
 
         return df
 
+    def _get_closes(self, tickers: list[str], days: int) -> pd.DataFrame:
+        histories = store.get_history_bulk(tickers, days)
+
+        closes = []
+        for ticker in tickers:
+            self.task_ticker = ticker
+            df = histories[ticker.upper()]
+            if not df.empty:
+                closes.append(df.set_index('date')['close'].rename(ticker))
+
+            self.task_completed += 1
+
+        return pd.concat(closes, axis=1).sort_index() if closes else pd.DataFrame()
+
+
+class RollingCorrelation:
+    ''' Correlation of ticker pairs over a rolling window of days. The window's sums (n, Σx, Σy, Σxy, Σx², Σy²)
+    are kept for each pair, so adding a day adds its terms and subtracts those of the day leaving the window,
+    without revisiting the rest of the window. As with pandas rolling().corr(), a correlation needs min_periods
+    days (default the whole window) on which both tickers have a value, and returns are NaN across a gap '''
+
+    def __init__(self, tickers: list[str], pairs: list[tuple[str, str]], window: int = ROLLING_WINDOW, min_periods: int = 0,
+                 returns: bool = False):
+        if window < 2:
+            raise ValueError('Invalid window')
+        if min_periods == 0:
+            min_periods = window
+        elif min_periods < 2 or min_periods > window:
+            raise ValueError('Invalid min_periods')
+
+        index = {ticker: i for i, ticker in enumerate(tickers)}
+        pairs = [pair for pair in pairs if pair[0] in index and pair[1] in index]
+
+        self.tickers: list[str] = list(tickers)
+        self.pairs: list[tuple[str, str]] = pairs
+        self.window: int = window
+        self.min_periods: int = min_periods
+        self.returns: bool = returns
+        self.first: np.ndarray = np.array([index[pair[0]] for pair in pairs], dtype=int)
+        self.second: np.ndarray = np.array([index[pair[1]] for pair in pairs], dtype=int)
+        self.values: np.ndarray = np.full((window, len(tickers)), np.nan)  # Days in the window, oldest overwritten
+        self.offset: np.ndarray = np.full(len(tickers), np.nan)  # First value of each ticker, to keep the sums small
+        self.previous: np.ndarray = np.full(len(tickers), np.nan)  # Previous day's closes, for returns
+        self.sums: np.ndarray = np.zeros((6, len(pairs)))
+        self.count: int = 0
+        self.dates: list = []
+        self.correlations: list[np.ndarray] = []
+
+    def update(self, date: object, values: np.ndarray) -> np.ndarray:
+        ''' Add a day's closes (NaN for tickers without a price) and roll the window forward
+
+        :return: <ndarray> Correlation of each pair over the window, NaN where undefined
+        '''
+
+        values = np.asarray(values, dtype=float)
+        if self.returns:
+            with np.errstate(divide='ignore', invalid='ignore'):
+                self.previous, values = values, values / self.previous - 1.0
+
+        values = np.where(np.isfinite(values), values, np.nan)
+        self.offset = np.where(np.isnan(self.offset), values, self.offset)
+        values = values - self.offset
+
+        slot = self.count % self.window
+        if self.count >= self.window:
+            self.sums -= self._get_terms(self.values[slot])
+
+        self.values[slot] = values
+        self.count += 1
+
+        if self.count % self.window == 0:
+            # Resum the window now and then so rounding errors don't build up
+            self.sums = self._get_terms(self.values).sum(axis=1)
+        else:
+            self.sums += self._get_terms(values)
+
+        correlation = np.where(self.sums[0] >= self.min_periods, _get_correlation(*self.sums), np.nan)
+        self.dates.append(date)
+        self.correlations.append(correlation.astype(np.float32))
+
+        if len(self.dates) > ROLLING_HISTORY:
+            del self.dates[0], self.correlations[0]
+
+        return correlation
+
+    def get_series(self) -> pd.DataFrame:
+        columns = pd.MultiIndex.from_tuples(self.pairs, names=['ticker1', 'ticker2'])
+        data = np.vstack(self.correlations) if self.correlations else np.empty((0, len(self.pairs)))
+        return pd.DataFrame(data, index=self.dates, columns=columns)
+
+    def get_pair(self, ticker1: str, ticker2: str) -> pd.Series:
+        ticker1, ticker2 = sorted((ticker1.upper(), ticker2.upper()))
+        series = pd.Series(dtype=float)
+
+        if (ticker1, ticker2) in self.pairs:
+            column = self.pairs.index((ticker1, ticker2))
+            series = pd.Series([correlation[column] for correlation in self.correlations], index=self.dates, dtype=float)
+            series.name = f'{ticker1}/{ticker2}'
+        else:
+            _logger.warning(f'Invalid pair {ticker1}/{ticker2}')
+
+        return series
+
+    def _get_terms(self, values: np.ndarray) -> np.ndarray:
+        x, y = values[..., self.first], values[..., self.second]
+        valid = ~(np.isnan(x) | np.isnan(y))
+        x, y = np.where(valid, x, 0.0), np.where(valid, y, 0.0)
+
+        return np.stack([valid, x, y, x * y, x * x, y * y])
+
+
+def get_clusters(name: str) -> pd.DataFrame:
+    ''' Cluster assignments cached by Correlate.cluster() today. Older ones are not used, since a stale
+    cluster could drop a ticker that no longer moves with the rest
+
+    :return: <pd.DataFrame> Cluster and cluster size of each ticker. Empty if not available
+    '''
+
+    clusters = pd.DataFrame()
+    if cache.exists(name, CACHE_TYPE_CLUSTER, today_only=True):
+        clusters, _ = cache.load(name, CACHE_TYPE_CLUSTER, today_only=True)
+
+    return clusters if clusters is not None else pd.DataFrame()
+
+
+def remove_duplicates(tickers: list[str], clusters: pd.DataFrame) -> list[str]:
+    ''' Keep only the first of the tickers from each cluster, so callers should order them best first. Tickers
+    not in the clusters are kept
+
+    :return: <list[str]> Tickers without the near-identical ones
+    '''
+
+    if clusters.empty:
+        return list(tickers)
+
+    seen = set()
+    unique = []
+    for ticker in tickers:
+        label = clusters['cluster'].get(ticker.upper())
+        if label is None:
+            unique.append(ticker)
+        elif label not in seen:
+            seen.add(label)
+            unique.append(ticker)
+
+    return unique
+
+
+def find_clusters(values: np.ndarray, cutoff: float = CLUSTER_CUTOFF, top: int = TOP_K, dtype: type = np.float64) -> np.ndarray:
+    ''' Cluster the columns of a (days x tickers) array of returns so that every pair within a cluster correlates
+    above the cutoff. Candidates are the connected components of the graph linking mutual neighbors (each in the
+    other's top-k above the cutoff). Each component is then split by complete linkage on 1 - correlation, so a
+    chain of links never joins tickers that do not themselves correlate.
+
+    :return: <ndarray> Cluster of each ticker, numbered from 0
+    '''
+
+    from scipy.cluster.hierarchy import fcluster, linkage
+    from scipy.sparse import coo_matrix
+    from scipy.sparse.csgraph import connected_components
+    from scipy.spatial.distance import squareform
+
+    values = np.array(values, dtype=dtype, ndmin=2)
+    count = values.shape[1]
+
+    first, second, _ = find_neighbors(values, top=top, cutoff=cutoff, dtype=dtype)
+    mutual = (first < second) & np.isin(first * count + second, second * count + first)
+    graph = coo_matrix((np.ones(mutual.sum(), dtype=np.int8), (first[mutual], second[mutual])), shape=(count, count))
+    _, components = connected_components(graph, directed=False)
+
+    # Components of two are a single mutual link, so only larger ones need splitting
+    splits = np.zeros(count, dtype=int)
+    sizes = np.bincount(components)
+    for component in np.flatnonzero(sizes > 2):
+        members = np.flatnonzero(components == component)
+        correlation = pd.DataFrame(values[:, members]).corr().to_numpy()
+        distance = np.where(np.isnan(correlation), 2.0, 1.0 - correlation)
+        np.fill_diagonal(distance, 0.0)
+
+        tree = linkage(squareform(distance, checks=False), method='complete')
+        splits[members] = fcluster(tree, 1.0 - cutoff, criterion='distance')
+
+    _, labels = np.unique(components * (count + 1) + splits, return_inverse=True)
+
+    return labels
+
+
+def check_clusters(count: int = 2000, days: int = 250, groups: int = 20, seed: int = 0) -> bool:
+    ''' Cluster synthetic prices: independent random walks, which must each stay alone, and groups of three
+    near-copies of a walk, which must each form one cluster
+
+    :return: <bool> True if clustered as expected
+    '''
+
+    rng = np.random.default_rng(seed)
+    returns = rng.normal(0.0, 0.02, (days, count))
+    copies = np.repeat(rng.normal(0.0, 0.02, (days, groups)), 3, axis=1) + rng.normal(0.0, 0.002, (days, groups * 3))
+    prices = 50.0 * np.cumprod(1.0 + np.hstack([returns, copies]), axis=0)
+
+    labels = find_clusters(_get_returns(prices))
+    sizes = np.bincount(labels)[labels]
+
+    unrelated = int((sizes[:count] > 1).sum())
+    together = all(np.unique(labels[count + group * 3:count + group * 3 + 3]).size == 1 for group in range(groups))
+    apart = np.unique(labels[count::3]).size == groups and np.all(sizes[count:] == 3)
+
+    print(f'{unrelated} of {count} unrelated walks clustered, {groups} groups of copies {"kept" if together and apart else "NOT kept"} together')
+
+    return unrelated == 0 and together and apart
+
+
+def find_neighbors(values: np.ndarray, top: int = TOP_K, cutoff: float = CORRELATION_CUTOFF, block: int = BLOCK_SIZE,
+                   dtype: type = np.float64) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    ''' Find each column's most correlated columns in a (days x tickers) array. Correlations are taken a block of
+    tickers at a time, and only the top neighbors above the cutoff kept from each, so memory is bounded by
+    (block x tickers) rather than (tickers x tickers). As with DataFrame.corr(), each pair is correlated over the
+    days both have a value (not NaN).
+
+    :return: <ndarray> Column index of each ticker and of its neighbor, and their correlation, by ticker then
+        descending correlation
+    '''
+
+    values = np.array(values, dtype=dtype, ndmin=2)
+    count = values.shape[1]
+    top = min(top, count - 1)
+
+    # Centering first keeps the sums small, so float32 loses little precision
+    valid = np.isfinite(values)
+    mean = np.divide(np.where(valid, values, 0.0).sum(axis=0), valid.sum(axis=0), out=np.zeros(count, dtype=dtype), where=valid.any(axis=0))
+    values = np.where(valid, values - mean, 0.0).astype(dtype)
+    if valid.all():
+        # Standardize once, so each block is a single matrix product
+        norm = np.sqrt(np.einsum('ij,ij->j', values, values))
+        values = np.divide(values, norm, out=np.full_like(values, np.nan), where=norm > 0.0)
+        valid = None
+    else:
+        valid = valid.astype(dtype)
+
+    tickers, neighbors, correlations = [], [], []
+    if top > 0:
+        for start in range(0, count, block):
+            stop = min(start + block, count)
+            rows = np.arange(start, stop)
+
+            correlation = _correlate_block(values, valid, start, stop)
+            correlation[~np.isfinite(correlation)] = -np.inf
+            correlation[rows - start, rows] = -np.inf  # Drop own entry (corr = 1.0)
+
+            # Top neighbors of each row, unordered, then ordered and cut
+            index = np.argpartition(correlation, -top, axis=1)[:, -top:]
+            value = np.take_along_axis(correlation, index, axis=1)
+            order = np.argsort(-value, axis=1, kind='stable')
+            index = np.take_along_axis(index, order, axis=1)
+            value = np.take_along_axis(value, order, axis=1)
+
+            keep = value >= cutoff
+            tickers.append(np.broadcast_to(rows[:, None], keep.shape)[keep])
+            neighbors.append(index[keep])
+            correlations.append(value[keep].astype(float))
+
+    if tickers:
+        return np.concatenate(tickers), np.concatenate(neighbors), np.concatenate(correlations)
+
+    return np.array([], dtype=int), np.array([], dtype=int), np.array([], dtype=float)
+
+
+def _correlate_block(values: np.ndarray, valid: np.ndarray | None, start: int, stop: int) -> np.ndarray:
+    ''' Correlate columns start:stop against every column. Standardized values (valid is None) need one product;
+    otherwise the sums are taken over each pair's common days, with missing values zeroed
+
+    :return: <ndarray> (block x tickers) Correlations, NaN where undefined
+    '''
+
+    if valid is None:
+        return values[:, start:stop].T @ values
+
+    x, m = values[:, start:stop], valid[:, start:stop]
+    return _get_correlation(m.T @ valid, x.T @ valid, m.T @ values, x.T @ values, (x * x).T @ valid, m.T @ (values * values))
+
+
+def _get_returns(values: np.ndarray) -> np.ndarray:
+    # NaN across a gap, rather than a return over several days
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return values[1:] / values[:-1] - 1.0
+
+
+def _get_correlation(n: np.ndarray, sum_x: np.ndarray, sum_y: np.ndarray, sum_xy: np.ndarray, sum_xx: np.ndarray, sum_yy: np.ndarray) -> np.ndarray:
+    with np.errstate(invalid='ignore', divide='ignore'):
+        covariance = sum_xy - sum_x * sum_y / n
+        variance_x = sum_xx - sum_x * sum_x / n
+        variance_y = sum_yy - sum_y * sum_y / n
+        correlation = covariance / np.sqrt(variance_x * variance_y)
+
+    return np.where((n < 2) | ~np.isfinite(correlation), np.nan, correlation)
+
+
+def _get_pairs(neighbors: pd.DataFrame) -> pd.DataFrame:
+    # Arrange the symbol names so each pair appears once whichever side it was found from
+    ticker1, ticker2 = neighbors['ticker1'].to_numpy(), neighbors['ticker2'].to_numpy()
+    swap = ticker1 > ticker2
+    df = pd.DataFrame({
+        'ticker1': np.where(swap, ticker2, ticker1),
+        'ticker2': np.where(swap, ticker1, ticker2),
+        'correlation': neighbors['correlation'].to_numpy()})
+
+    return df.drop_duplicates(['ticker1', 'ticker2'])
+
 
 if __name__ == '__main__':
+    import sys
     import logging
     import time
     logger.get_logger(logging.INFO)
 
+    if len(sys.argv) > 1 and sys.argv[1] == 'check':
+        sys.exit(0 if check_clusters() else 1)
+
     symbols = store.get_tickers('nyse')
     c = Correlate(symbols, 'nyse')
 
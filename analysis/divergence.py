@@ -1,20 +1,33 @@
 import datetime as dt
 import random
-from concurrent import futures
+import collections
 
 import numpy as np
 import pandas as pd
-from sklearn.preprocessing import MinMaxScaler
-from ta import trend
 
 from analysis.technical import Technical
 from base import Threaded
+from base.executor import Executor
 from data import store as store
 from utils import cache, logger, ui
 
 _logger = logger.get_logger()
 
 CACHE_TYPE = 'div'
+TASK_BATCH = 25  # Tickers per threaded task
+
+divergence_type = collections.namedtuple('divergence_type', [
+    'price_sma',
+    'price_sma_diff',
+    'price_sma_scaled',
+    'price_sma_scaled_diff',
+    'technical_sma',
+    'technical_sma_diff',
+    'technical_sma_scaled',
+    'technical_sma_scaled_diff',
+    'diff',
+    'div',
+    'streak'])
 
 class Divergence(Threaded):
     def __init__(self, tickers: list[str], name: str, window: int = 15, days: int = 100):
@@ -64,14 +77,13 @@ class Divergence(Threaded):
             if len(self.tickers) > 100:
                 _logger.info(f'Running with thread pool. Scaled={scaled}')
 
-                tickers: list[np.ndarray] = np.array_split(self.tickers, self.concurrency)
-                tickers = [i.tolist() for i in tickers]
+                # Threads take small batches from a shared queue, each batch loading its histories in one query
+                executor = Executor(workers=self.concurrency, batch=TASK_BATCH)
+                self.task_futures = executor.futures
 
-                with futures.ThreadPoolExecutor(max_workers=self.concurrency) as executor:
-                    self.task_futures = [executor.submit(self._run, ticker_list) for ticker_list in tickers]
-
-                    for future in futures.as_completed(self.task_futures):
-                        _logger.info(f'Thread completed: {future.result()}')
+                for result in executor.map(self._run, self.tickers):
+                    if result.error is not None:
+                        _logger.error(f'Exception occurred for {", ".join(result.item)}: {result.error}')
 
                 if self.results:
                     cache.dump(self.results, self.cache_name, CACHE_TYPE)
@@ -91,109 +103,156 @@ class Divergence(Threaded):
 
         self.streak = streak
         self.analysis = pd.DataFrame()
-        for result in self.results:
-            idx = result[::-1]['streak'].idxmax()  # Index of most recent largest streak
-            date = result.iloc[idx]['date']
-            max = result.iloc[idx]['streak']
-            if max >= streak:
-                data = [[result.index.name, date, max]]
-                df = pd.DataFrame(data, columns=['ticker', 'date', 'streak'])
-                self.analysis = pd.concat([self.analysis, df], ignore_index=True)
+
+        if self.results:
+            # Most recent largest streak of each result, from the concatenated streaks of all results
+            lengths = np.array([len(result) for result in self.results])
+            offsets = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+            streaks = np.concatenate([result['streak'].to_numpy() for result in self.results])
+            positions = np.arange(len(streaks))
+
+            maximums = np.maximum.reduceat(streaks, offsets)
+            latest = np.maximum.reduceat(np.where(streaks == np.repeat(maximums, lengths), positions, -1), offsets) - offsets
+
+            selected = np.flatnonzero(maximums >= streak)
+            self.analysis = pd.DataFrame({
+                'ticker': [self.results[index].index.name for index in selected],
+                'date': [self.results[index]['date'].iat[latest[index]] for index in selected],
+                'streak': maximums[selected]})
 
         if len(self.analysis) > 0:
             self.analysis = self.analysis.reset_index(drop=True)
             self.analysis = self.analysis.sort_values(by=['streak'], ascending=False)
 
     def _run(self, tickers: list[str]) -> None:
+        histories = store.get_history_bulk(tickers, days=self.days)
+
+        valid = []
+        dates = []
+        prices = []
+        technicals = []
         for ticker in tickers:
-            ta = Technical(ticker, None, self.days)
-            history = ta.history
-            result = pd.DataFrame()
+            history = histories[ticker.upper()]
+            if len(history) > self.interval:
+                ta = Technical(ticker, history, self.days)
+                technical = ta.calc_rsi(self.interval).to_numpy(dtype=float)[self.interval:]
+                price = history['close'].to_numpy(dtype=float)[self.interval:]
+
+                valid += [ticker]
+                dates += [history['date'].to_numpy()[self.interval:]]
+                prices += [price]
+                technicals += [technical if len(technical) == len(price) else np.full(len(price), np.nan)]
+            else:
+                self.task_completed += 1
 
-            # Use scaled & normalized values for comparison
-            scaler = MinMaxScaler(feature_range=(0, 1))
+        if valid:
+            # Run the whole batch through the kernel at once as right-aligned, NaN-padded rows
+            width = max(len(price) for price in prices)
+            price_panel = np.full((len(valid), width), np.nan)
+            technical_panel = np.full((len(valid), width), np.nan)
+            for row, (price, technical) in enumerate(zip(prices, technicals)):
+                price_panel[row, width-len(price):] = price
+                technical_panel[row, width-len(technical):] = technical
 
-            # Base data
-            dates = history['date'][self.interval:].reset_index(drop=True)
-            price = history['close'][self.interval:].reset_index(drop=True)
+            divergence = calculate_divergence(price_panel, technical_panel, self.window, self.periods, scaled=self.scaled)
 
-            if not history.empty and not price.empty:
+            for row, ticker in enumerate(valid):
                 self.task_ticker = ticker
+                columns = slice(width-len(prices[row]), width)
+
+                result = pd.DataFrame({
+                    'date': dates[row],
+                    'price': prices[row],
+                    'price_sma': divergence.price_sma[row, columns],
+                    'price_sma_diff': divergence.price_sma_diff[row, columns],
+                    'price_sma_scaled': divergence.price_sma_scaled[row, columns],
+                    'price_sma_scaled_diff': divergence.price_sma_scaled_diff[row, columns],
+                    self.type: technicals[row],
+                    f'{self.type}_sma': divergence.technical_sma[row, columns],
+                    f'{self.type}_sma_diff': divergence.technical_sma_diff[row, columns],
+                    f'{self.type}_sma_scaled': divergence.technical_sma_scaled[row, columns],
+                    f'{self.type}_sma_scaled_diff': divergence.technical_sma_scaled_diff[row, columns],
+                    'diff': divergence.diff[row, columns],
+                    'div': divergence.div[row, columns],
+                    'streak': divergence.streak[row, columns]})
+                result.index.name = f'{ticker.upper()}'
 
-                # Calculate 0-1 scaled series of day-to-day rsi differences
-                price.name = 'price'
-                price_sma = trend.sma_indicator(price, window=self.window, fillna=True).reset_index(drop=True)
-                price_sma.name = 'price_sma'
-                price_sma_diff = price_sma.diff(periods=self.periods).fillna(0.0)
-                price_sma_diff.name = 'price_sma_diff'
-                scaled = scaler.fit_transform(price_sma.values.reshape(-1, 1))
-                scaled = [value[0] for value in scaled]
-                price_sma_scaled = pd.Series(scaled, name='price_sma_scaled')
-                price_sma_scaled_diff = price_sma_scaled.diff(periods=self.periods).fillna(0.0)
-                price_sma_scaled_diff.name = 'price_sma_scaled_diff'
-
-                # Calculate 0-1 scaled series of day-to-day rsi differences
-                technical = ta.calc_rsi(self.interval)[self.interval:]
-                technical_sma = trend.sma_indicator(technical, window=self.window, fillna=True).reset_index(drop=True)
-                technical_sma.name = f'{self.type}_sma'
-                technical_sma_diff = technical_sma.diff(periods=self.periods).fillna(0.0)
-                technical_sma_diff.name = f'{self.type}_sma_diff'
-                scaled = scaler.fit_transform(technical_sma.values.reshape(-1, 1))
-                scaled = [value[0] for value in scaled]
-                technical_sma_scaled = pd.Series(scaled, name=f'{self.type}_sma_scaled')
-                technical_sma_scaled_diff = technical_sma_scaled.diff(periods=self.periods).fillna(0.0)
-                technical_sma_scaled_diff.name = f'{self.type}_sma_scaled_diff'
-
-                # Calculate differences in the slopes between prices and RSI's
-                if self.scaled:
-                    divergence = technical_sma_scaled_diff - price_sma_scaled_diff
-                else:
-                    divergence = technical_sma_diff - price_sma_diff
-                divergence.name = 'diff'
-
-                # Calculate differences in the slopes between prices and RSI's for opposite slopes only
-                div = []
-                for i in range(len(price_sma_scaled_diff)):
-                    p = price_sma_scaled_diff[i] if self.scaled else price_sma_diff[i]
-                    t = technical_sma_scaled_diff[i] if self.scaled else technical_sma_diff[i]
-                    div += [t - p if p * t < 0.0 else np.NaN]
-                divergence_only = pd.Series(div, name='div')
-
-                # Begin overall result dataframe with the dates
-                result = dates
-
-                # Price data
-                result = pd.concat([result, price], axis=1)
-                result = pd.concat([result, price_sma], axis=1)
-                result = pd.concat([result, price_sma_diff], axis=1)
-                result = pd.concat([result, price_sma_scaled], axis=1)
-                result = pd.concat([result, price_sma_scaled_diff], axis=1)
-
-                # Technical data
-                tech = technical.reset_index(drop=True)
-                result = pd.concat([result, tech], axis=1)
-                result = pd.concat([result, technical_sma], axis=1)
-                result = pd.concat([result, technical_sma_diff], axis=1)
-                result = pd.concat([result, technical_sma_scaled], axis=1)
-                result = pd.concat([result, technical_sma_scaled_diff], axis=1)
-                result = pd.concat([result, divergence], axis=1)
-                result = pd.concat([result, divergence_only], axis=1)
-
-                # Streak data
-                analysis = result.loc[:, ('date', 'div')]
-                analysis['tmp1'] = analysis['div'].notna() == True
-                analysis['tmp2'] = analysis['tmp1'].ne(analysis['tmp1'].shift())
-                analysis['tmp3'] = analysis['tmp2'].cumsum()
-                analysis['tmp4'] = analysis.groupby('tmp3').cumcount() + 1
-                analysis['streak'] = np.where(analysis['tmp1'] == True, analysis['tmp4'], 0)
-                result = pd.concat([result, analysis['streak']], axis=1)
+                self.results.append(result)
+                self.task_completed += 1
 
-                result.index.name = f'{ticker.upper()}'
 
-                if not result.empty:
-                    self.results.append(result)
+def calculate_divergence(price: np.ndarray, technical: np.ndarray, window: int, periods: int, scaled: bool = True) -> divergence_type:
+    ''' Divergence between the slopes of a price and a technical indicator, for one ticker (days) or a stacked
+    panel of tickers (tickers x days, right-aligned with NaN padding). Each series is smoothed with an SMA and
+    0-1 scaled, and the slopes taken over 'periods' days. Divergence is only counted where the slopes have
+    opposite signs, with the streak being the number of consecutive days of divergence.
+
+    :return: <divergence_type> (tickers x days) Arrays of each intermediate series, the divergence and the streaks
+    '''
+
+    price, technical = (np.atleast_2d(np.asarray(values, dtype=float)) for values in (price, technical))
+    padding = np.isnan(price)
+
+    price_sma = _calculate_sma(price, window)
+    price_sma_diff = _calculate_diff(price_sma, periods)
+    price_sma_scaled = _scale(price_sma)
+    price_sma_scaled_diff = _calculate_diff(price_sma_scaled, periods)
+
+    technical_sma = _calculate_sma(technical, window)
+    technical_sma_diff = _calculate_diff(technical_sma, periods)
+    technical_sma_scaled = _scale(technical_sma)
+    technical_sma_scaled_diff = _calculate_diff(technical_sma_scaled, periods)
+
+    # Differences in the slopes between prices and the technical, then for opposite slopes only
+    p = price_sma_scaled_diff if scaled else price_sma_diff
+    t = technical_sma_scaled_diff if scaled else technical_sma_diff
+    diff = t - p
+    div = np.where(p * t < 0.0, diff, np.nan)
+
+    # Length of each run of divergence days
+    days = np.arange(div.shape[1])
+    diverging = ~np.isnan(div)
+    streak = np.where(diverging, days - np.maximum.accumulate(np.where(diverging, -1, days), axis=1), 0)
+
+    # Keep the padding empty
+    for values in (price_sma_diff, price_sma_scaled_diff, technical_sma_diff, technical_sma_scaled_diff, diff):
+        values[padding] = np.nan
+
+    return divergence_type(price_sma, price_sma_diff, price_sma_scaled, price_sma_scaled_diff,
+                           technical_sma, technical_sma_diff, technical_sma_scaled, technical_sma_scaled_diff, diff, div, streak)
+
+
+def _calculate_sma(values: np.ndarray, window: int) -> np.ndarray:
+    ''' Rolling mean along each row, averaging fewer values at the start of each row (ta fillna=True) '''
+
+    sums = np.cumsum(np.nan_to_num(values), axis=1)
+    counts = np.cumsum(~np.isnan(values), axis=1)
+    sums[:, window:] = sums[:, window:] - sums[:, :-window]
+    counts[:, window:] = counts[:, window:] - counts[:, :-window]
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(counts > 0, sums / counts, np.nan)
+
+
+def _calculate_diff(values: np.ndarray, periods: int) -> np.ndarray:
+    ''' Difference over 'periods' days along each row, with 0.0 where not available (pandas diff().fillna(0.0)) '''
+
+    diff = np.zeros_like(values)
+    if periods > 0:
+        diff[:, periods:] = values[:, periods:] - values[:, :-periods]
+
+    return np.nan_to_num(diff, nan=0.0)
+
+
+def _scale(values: np.ndarray) -> np.ndarray:
+    ''' Scale each row to 0-1, computed as sklearn's MinMaxScaler does '''
+
+    with np.errstate(all='ignore'):
+        minimum = np.fmin.reduce(values, axis=1, keepdims=True)
+        span = np.fmax.reduce(values, axis=1, keepdims=True) - minimum
+        scale = 1.0 / np.where(span == 0.0, 1.0, span)
 
-            self.task_completed += 1
+        return values * scale + (0.0 - minimum * scale)
 
 
 if __name__ == '__main__':
@@ -1,11 +1,11 @@
 import datetime as dt
 import random
-from concurrent import futures
 
 import numpy as np
 import pandas as pd
 
 from base import Threaded
+from base.executor import Executor
 from data import store as store
 from utils import cache, logger, ui
 
@@ -17,6 +17,7 @@ THRESHOLD = 0.01
 MINPRICE = 1.0
 MINVOLUME = 500e3
 MINCONCURRENECY = 100
+TASK_BATCH = 25  # Tickers per threaded task
 
 
 class Gap(Threaded):
@@ -46,7 +47,7 @@ class Gap(Threaded):
                 _logger.info('Cached results not used. Different days value')
 
     @Threaded.threaded
-    def calculate(self, use_cache: bool = True) -> None:
+    def calculate(self, use_cache: bool = True, universe: bool = False) -> None:
         if not self.tickers:
             assert ValueError('No valid tickers specified')
 
@@ -62,27 +63,35 @@ class Gap(Threaded):
             self.results = []
             self.analysis = pd.DataFrame()
 
+            if universe:
+                # Scan every ticker held in the panel in one pass, leaving any others to the per-ticker path
+                _logger.info('Running over universe')
+                tickers = self._run_universe(self.tickers)
+            else:
+                tickers = self.tickers
+
             # Break up the tickers and run concurrently if a large list, otherwise just run the single list
-            if len(self.tickers) > MINCONCURRENECY:
+            if not tickers:
+                pass
+            elif len(tickers) > MINCONCURRENECY:
                 _logger.info('Running with thread pool')
 
-                random.shuffle(self.tickers)
-                tickers: list[np.ndarray] = np.array_split(self.tickers, self.concurrency)
-                tickers = [i.tolist() for i in tickers]
-
-                with futures.ThreadPoolExecutor(max_workers=self.concurrency) as executor:
-                    self.task_futures = [executor.submit(self._run, ticker_list) for ticker_list in tickers]
-
-                    for future in futures.as_completed(self.task_futures):
-                        _logger.info(f'Thread completed: {future.result()}')
+                random.shuffle(tickers)
+                # Threads take small batches from a shared queue, each batch loading its histories in one query
+                executor = Executor(workers=self.concurrency, batch=TASK_BATCH)
+                self.task_futures = executor.futures
 
-                if self.results:
-                    cache.dump(self.results, self.cache_name, CACHE_TYPE)
+                for result in executor.map(self._run, tickers):
+                    if result.error is not None:
+                        _logger.error(f'Exception occurred for {", ".join(result.item)}: {result.error}')
             else:
                 _logger.info('Running without thread pool')
 
                 use_cache = False
-                self._run(self.tickers)
+                self._run(tickers)
+
+            if self.results and (universe or len(tickers) > MINCONCURRENECY):
+                cache.dump(self.results, self.cache_name, CACHE_TYPE)
 
         self.task_state = 'Done'
 
@@ -132,54 +141,113 @@ class Gap(Threaded):
         _logger.info(f'Analyzing {len(self.results)} result(s)')
 
     def _run(self, tickers: list[str]) -> None:
+        histories = store.get_history_bulk(tickers, days=self.days)
+
         for ticker in tickers:
             self.task_ticker = ticker
-            history = store.get_history(ticker, days=self.days)
-
-            history['up'] = history['low'] - history['high'].shift(1)
-            history['dn'] = history['low'].shift(1) - history['high']
-
-            # Find relevant gap-ups
-            up = history[history['up'] > (history['close'] * self.threshold)].copy()
-            for result in up.itertuples():
-                df = history.loc[history['date'] >= result.date]
-                high = history.iloc[result.Index-1]['high']
-                low = history.iloc[result.Index]['low']
-                min_low = df['low'].min()
-                up.loc[result.Index, 'index'] = result.Index
-                up.loc[result.Index, 'start'] = high
-                up.loc[result.Index, 'gap'] = low - high
-                if min_low > high:
-                    up.loc[result.Index, 'unfilled'] = min_low - high
-                else:
-                    up.loc[result.Index, 'unfilled'] = 0.0
-
-            # Find relevant gap-downs
-            dn = history[history['dn'] > (history['close'] * self.threshold)].copy()
-            for result in dn.itertuples():
-                df = history.loc[history['date'] >= result.date]
-                low = history.iloc[result.Index-1]['low']
-                high = history.iloc[result.Index]['high']
-                max_high = df['high'].max()
-                dn.loc[result.Index, 'index'] = result.Index
-                dn.loc[result.Index, 'start'] = low
-                dn.loc[result.Index, 'gap'] = high - low
-                if low > max_high:
-                    dn.loc[result.Index, 'unfilled'] = low - max_high
-                else:
-                    dn.loc[result.Index, 'unfilled'] = 0.0
-
-            # Combine the results and do some housekeeping
-            results = pd.concat([up, dn]).sort_index().reset_index(drop=True)
-            if not results.empty:
-                results = results.drop(['open', 'high', 'low'], axis=1)
-                results = results.drop(['up', 'dn'], axis=1)
-                results.index.name = ticker.upper()
-                results.attrs = {'days': self.days, 'threshold': self.threshold, 'last': history.iloc[-1]['date']}
-                self.results.append(results)
+            history = histories[ticker.upper()]
+
+            if not history.empty:
+                gaps, start, gap, unfilled = find_gaps(history['high'].to_numpy(dtype=float), history['low'].to_numpy(dtype=float),
+                                                       history['close'].to_numpy(dtype=float), self.threshold)
+
+                index = np.flatnonzero(gaps[0])
+                if index.size > 0:
+                    results = history.iloc[index].drop(['open', 'high', 'low'], axis=1).reset_index(drop=True)
+                    results['index'] = index.astype(float)
+                    results['start'] = start[0, index]
+                    results['gap'] = gap[0, index]
+                    results['unfilled'] = unfilled[0, index]
+                    results.index.name = ticker.upper()
+                    results.attrs = {'days': self.days, 'threshold': self.threshold, 'last': history.iloc[-1]['date']}
+                    self.results.append(results)
 
             self.task_completed += 1
 
+    def _run_universe(self, tickers: list[str]) -> list[str]:
+        ''' Find the gaps of all tickers held in the price panel with one pass over a (tickers x days) array
+
+        :return: <list[str]> Tickers not in the panel, so still to be run
+        '''
+
+        prices = store.get_panel(current=True)
+        if prices is None:
+            _logger.info('No current panel. Running per ticker')
+            return tickers
+
+        remaining = [ticker for ticker in tickers if ticker not in prices]
+        rows = np.array([prices.get_index(ticker) for ticker in tickers if ticker in prices], dtype=int)
+
+        if rows.size > 0:
+            self.task_message = 'Scanning universe'
+            window = prices.get_window(self.days)
+            dates = prices.dates[window]
+            high, low, close, volume = (prices[field][rows, window] for field in ('high', 'low', 'close', 'volume'))
+
+            gaps, start, gap, unfilled = find_gaps(high, low, close, self.threshold)
+
+            # Position of each day within its ticker's own history, which skips days without a price
+            valid = ~np.isnan(close)
+            position = np.cumsum(valid, axis=1) - 1
+
+            for row, ticker in enumerate(prices.tickers[rows].tolist()):
+                self.task_ticker = ticker
+
+                index = np.flatnonzero(gaps[row])
+                if index.size > 0:
+                    results = pd.DataFrame({
+                        'date': dates[index].astype(object),
+                        'close': close[row, index],
+                        'volume': volume[row, index],
+                        'index': position[row, index].astype(float),
+                        'start': start[row, index],
+                        'gap': gap[row, index],
+                        'unfilled': unfilled[row, index]})
+                    results.index.name = ticker
+                    results.attrs = {'days': self.days, 'threshold': self.threshold, 'last': dates[np.flatnonzero(valid[row])[-1]].astype(object)}
+                    self.results.append(results)
+
+                self.task_completed += 1
+
+            _logger.info(f'Scanned {rows.size} tickers x {len(dates)} days from panel')
+
+        return remaining
+
+
+def find_gaps(high: np.ndarray, low: np.ndarray, close: np.ndarray, threshold: float = THRESHOLD) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    ''' Find the gaps in one ticker's prices (days), or many tickers' at once (tickers x days). Days without a price
+    (NaN) are skipped, so each day is compared against the ticker's previous trading day. Whether a gap has since been
+    filled comes from reverse cumulative min/max of the lows/highs, so each ticker takes one linear pass.
+
+    :return: <ndarray> (tickers x days) Mask of gap days, and the start, gap (negative for gap-downs) and unfilled size of each
+    '''
+
+    high, low, close = (np.atleast_2d(np.asarray(values, dtype=float)) for values in (high, low, close))
+    days = np.arange(close.shape[1])
+    valid = ~np.isnan(close)
+
+    # Column of each ticker's previous trading day (-1 if none)
+    last = np.maximum.accumulate(np.where(valid, days, -1), axis=1)
+    previous = np.full_like(last, -1)
+    previous[:, 1:] = last[:, :-1]
+    high_previous = np.take_along_axis(high, np.maximum(previous, 0), axis=1)
+    low_previous = np.take_along_axis(low, np.maximum(previous, 0), axis=1)
+
+    # Lowest low and highest high from each day onward
+    low_after = np.fmin.accumulate(low[:, ::-1], axis=1)[:, ::-1]
+    high_after = np.fmax.accumulate(high[:, ::-1], axis=1)[:, ::-1]
+
+    with np.errstate(invalid='ignore'):
+        limit = close * threshold
+        up = valid & (previous >= 0) & (low - high_previous > limit)
+        down = valid & (previous >= 0) & (low_previous - high > limit) & ~up
+
+        start = np.where(up, high_previous, np.where(down, low_previous, np.nan))
+        gap = np.where(up, low - high_previous, np.where(down, high - low_previous, np.nan))
+        unfilled = np.where(up, np.maximum(low_after - high_previous, 0.0), np.where(down, np.maximum(low_previous - high_after, 0.0), np.nan))
+
+    return up | down, start, gap, unfilled
+
 
 if __name__ == '__main__':
     import logging
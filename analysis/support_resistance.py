@@ -5,33 +5,36 @@ trendln: https://github.com/GregoryMorse/trendln
 
 import math
 from dataclasses import dataclass, field
+from typing import TYPE_CHECKING
 
-import matplotlib.pyplot as plt
 import pandas as pd
 import numpy as np
-import trendln
 
 from base import Threaded
 from data import store as store
 from utils import math as m
 from utils import ui, logger
 
+if TYPE_CHECKING:
+    import matplotlib.pyplot as plt
+
 
 _logger = logger.get_logger()
 _rounding = 0.075
 
+# Names of trendln method constants. trendln (and matplotlib) are imported where used to keep startup fast
 METHOD = {
-    'NCUBED': trendln.METHOD_NCUBED,
-    'NSQUREDLOGN': trendln.METHOD_NSQUREDLOGN,
-    # 'HOUGHPOINTS': trendln.METHOD_HOUGHPOINTS, # Bug in trendln
-    'HOUGHLINES': trendln.METHOD_HOUGHLINES,
-    'PROBHOUGH': trendln.METHOD_PROBHOUGH
+    'NCUBED': 'METHOD_NCUBED',
+    'NSQUREDLOGN': 'METHOD_NSQUREDLOGN',
+    # 'HOUGHPOINTS': 'METHOD_HOUGHPOINTS', # Bug in trendln
+    'HOUGHLINES': 'METHOD_HOUGHLINES',
+    'PROBHOUGH': 'METHOD_PROBHOUGH'
 }
 
 EXTMETHOD = {
-    'NAIVE': trendln.METHOD_NAIVE,
-    'NAIVECONSEC': trendln.METHOD_NAIVECONSEC,
-    'NUMDIFF': trendln.METHOD_NUMDIFF
+    'NAIVE': 'METHOD_NAIVE',
+    'NAIVECONSEC': 'METHOD_NAIVECONSEC',
+    'NUMDIFF': 'METHOD_NUMDIFF'
 }
 
 MAX_SCALE = 10.0
@@ -184,10 +187,15 @@ class SupportResistance(Threaded):
         if not method in METHOD:
             assert ValueError(f'Invalid method {method}')
 
-        result = trendln.calc_support_resistance((None, self.history['high']), method=METHOD[method], extmethod=EXTMETHOD[extmethod], accuracy=ACCURACY)
+        import trendln
+
+        method_ = getattr(trendln, METHOD[method])
+        extmethod_ = getattr(trendln, EXTMETHOD[extmethod])
+
+        result = trendln.calc_support_resistance((None, self.history['high']), method=method_, extmethod=extmethod_, accuracy=ACCURACY)
         maximaIdxs, pmax, maxtrend, maxwindows = result
 
-        result = trendln.calc_support_resistance((self.history['low'], None), method=METHOD[method], extmethod=EXTMETHOD[extmethod], accuracy=ACCURACY)
+        result = trendln.calc_support_resistance((self.history['low'], None), method=method_, extmethod=extmethod_, accuracy=ACCURACY)
         minimaIdxs, pmin, mintrend, minwindows = result
 
         self.stats.res_slope = pmax[0]
@@ -401,7 +409,9 @@ class SupportResistance(Threaded):
         self.stats.sup_weighted_mean, self.stats.sup_weighted_std, self.stats.sup_level = calculate(True)
         _logger.info(f'Sup: wmean={self.stats.sup_weighted_mean:.2f}, wstd={self.stats.sup_weighted_std:.2f}, level={self.stats.sup_level}')
 
-    def plot(self, **kwargs) -> plt.Figure:
+    def plot(self, **kwargs) -> 'plt.Figure':
+        import matplotlib.pyplot as plt
+
         show = kwargs.get('show', False)
         srlines = kwargs.get('srlines', True)
         ppoints = kwargs.get('ppoints', True)
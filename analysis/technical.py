@@ -2,6 +2,8 @@
 ta: https://technical-analysis-library-in-python.readthedocs.io/en/latest/index.html
 '''
 
+from collections.abc import Callable
+
 import pandas as pd
 from ta import trend, momentum, volatility, volume
 
@@ -12,8 +14,18 @@ _logger = logger.get_logger()
 
 
 class Technical:
+    '''
+    Technical indicators for a ticker's history. Each calculated indicator is memoized by name and
+    parameters, so screens that reference the same indicator repeatedly only calculate it once. Assigning
+    a new history clears the memo. Memoized results are shared with the caller and must not be modified.
+    '''
+
     def __init__(self, ticker: str, history: pd.DataFrame | None, days: int, end: int = 0, live: bool = False):
-        if store.is_ticker(ticker):
+        self._memo: dict[tuple, pd.Series | pd.DataFrame] = {}
+        self.memo_hits = 0
+        self.memo_misses = 0
+
+        if (history is not None and not history.empty) or store.is_ticker(ticker):
             self.ticker = ticker.upper()
             self.days = days
             self.end = end
@@ -31,7 +43,48 @@ class Technical:
     def __str__(self):
         return f'{len(self.history)} items for {self.ticker}'
 
+    @property
+    def history(self) -> pd.DataFrame:
+        return self._history
+
+    @history.setter
+    def history(self, history: pd.DataFrame) -> None:
+        self._history = history
+        self.clear_memo()
+
+    def clear_memo(self) -> None:
+        self._memo = {}
+
+    def _memoize(self, key: tuple, calculate: Callable[[], pd.Series | pd.DataFrame]) -> pd.Series | pd.DataFrame:
+        value = self._memo.get(key)
+        if value is None:
+            value = calculate()
+            self._memo[key] = value
+            self.memo_misses += 1
+        else:
+            self.memo_hits += 1
+
+        return value
+
     def calc_sma(self, interval: int) -> pd.Series:
+        return self._memoize(('sma', interval), lambda: self._calc_sma(interval))
+
+    def calc_ema(self, interval: int) -> pd.Series:
+        return self._memoize(('ema', interval), lambda: self._calc_ema(interval))
+
+    def calc_rsi(self, interval: int = 14) -> pd.Series:
+        return self._memoize(('rsi', interval), lambda: self._calc_rsi(interval))
+
+    def calc_vwap(self) -> pd.Series:
+        return self._memoize(('vwap',), self._calc_vwap)
+
+    def calc_macd(self, slow: int = 26, fast: int = 12, signal: int = 9) -> pd.DataFrame:
+        return self._memoize(('macd', slow, fast, signal), lambda: self._calc_macd(slow, fast, signal))
+
+    def calc_bb(self, interval: int = 14, std: int = 2) -> pd.DataFrame:
+        return self._memoize(('bb', interval, std), lambda: self._calc_bb(interval, std))
+
+    def _calc_sma(self, interval: int) -> pd.Series:
         sr = pd.Series(dtype=float)
         if interval > 5 and interval < self.days:
             sr = trend.sma_indicator(self.history['close'], window=interval, fillna=True)
@@ -40,7 +93,7 @@ class Technical:
 
         return sr
 
-    def calc_ema(self, interval: int) -> pd.Series:
+    def _calc_ema(self, interval: int) -> pd.Series:
         sr = pd.Series(dtype=float)
         if interval > 5 and interval < self.days:
             sr = trend.ema_indicator(self.history['close'], window=interval, fillna=True)
@@ -49,7 +102,7 @@ class Technical:
 
         return sr
 
-    def calc_rsi(self, interval: int = 14) -> pd.Series:
+    def _calc_rsi(self, interval: int = 14) -> pd.Series:
         sr = pd.Series(dtype=float)
         if interval > 5 and interval < self.days:
             sr = momentum.rsi(self.history['close'], window=interval, fillna=True)
@@ -58,14 +111,14 @@ class Technical:
 
         return sr
 
-    def calc_vwap(self) -> pd.Series:
+    def _calc_vwap(self) -> pd.Series:
         sr = pd.Series(dtype=float)
         vwap = volume.VolumeWeightedAveragePrice(self.history['high'], self.history['low'], self.history['close'], self.history['volume'], fillna=True)
         sr = vwap.volume_weighted_average_price()
 
         return sr
 
-    def calc_macd(self, slow: int = 26, fast: int = 12, signal: int = 9) -> pd.DataFrame:
+    def _calc_macd(self, slow: int = 26, fast: int = 12, signal: int = 9) -> pd.DataFrame:
         df = pd.DataFrame()
         macd = trend.MACD(self.history['close'], window_slow=slow, window_fast=fast, window_sign=signal, fillna=True)
         diff = macd.macd_diff()
@@ -77,7 +130,7 @@ class Technical:
 
         return df
 
-    def calc_bb(self, interval: int = 14, std: int = 2) -> pd.DataFrame:
+    def _calc_bb(self, interval: int = 14, std: int = 2) -> pd.DataFrame:
         sr = pd.DataFrame()
         if interval > 5 and interval < self.days:
             bb = volatility.BollingerBands(self.history['close'], window=interval, window_dev=std, fillna=True)
@@ -0,0 +1,140 @@
+import time
+import collections
+from concurrent import futures
+from collections.abc import Callable, Iterable, Iterator
+
+
+WORKERS = 10      # Default number of worker threads
+QUEUE_DEPTH = 2   # Tasks queued per worker ahead of completion
+POLL = 0.10       # Secs between checks for timed out tasks
+
+result_type = collections.namedtuple('result_type', ['item', 'value', 'error'])
+
+
+class Executor:
+    '''
+    Bounded thread pool fed from a single shared queue of small tasks. Idle workers take the next task as
+    soon as they finish, so one slow task only delays itself rather than a whole pre-assigned chunk.
+
+    :param workers: <int> Number of worker threads
+    :param timeout: <float> Secs a task may run before it is abandoned (0.0 for no limit). Threads cannot be
+        interrupted, so an abandoned task keeps its worker until it returns and its result is discarded.
+    :param batch: <int> Items per task. When greater than 1 the function is called with a list of items.
+    '''
+
+    def __init__(self, workers: int = WORKERS, timeout: float = 0.0, batch: int = 1):
+        if workers < 1:
+            raise ValueError('Invalid number of workers')
+        if timeout < 0.0:
+            raise ValueError('Invalid timeout')
+        if batch < 1:
+            raise ValueError('Invalid batch size')
+
+        self.workers = workers
+        self.timeout = timeout
+        self.batch = batch
+        self.futures: list[futures.Future] = []
+
+    def __repr__(self):
+        return f'<Executor ({self.workers} workers, timeout={self.timeout}, batch={self.batch})>'
+
+    def map(self, function: Callable, items: Iterable, ordered: bool = False) -> Iterator[result_type]:
+        ''' Run a function over all items, streaming a result for each task as it completes (or in item order
+        if ordered). Exceptions are returned in the result rather than raised. Leaving the loop early cancels
+        any tasks that have not started.
+
+        :return: <result_type> The task's item (or list of items), the function's return value, and any exception
+        '''
+
+        tasks = enumerate(self._get_tasks(items))
+        inputs = {}
+        started = {}
+        pending: dict[futures.Future, int] = {}
+        completed: dict[int, result_type] = {}
+        following = 0
+        exhausted = False
+        abandoned = False
+
+        def call(index: int, task: any) -> any:
+            started[index] = time.perf_counter()
+            return function(task)
+
+        self.futures.clear()
+        executor = futures.ThreadPoolExecutor(max_workers=self.workers)
+
+        try:
+            while True:
+                # Keep the queue topped up without submitting everything at once
+                while not exhausted and len(pending) < self.workers * QUEUE_DEPTH:
+                    try:
+                        index, task = next(tasks)
+                    except StopIteration:
+                        exhausted = True
+                    else:
+                        inputs[index] = task
+                        future = executor.submit(call, index, task)
+                        pending[future] = index
+                        self.futures.append(future)
+
+                if not pending:
+                    break
+
+                done, _ = futures.wait(pending, timeout=POLL if self.timeout > 0.0 else None, return_when=futures.FIRST_COMPLETED)
+
+                for future in done:
+                    index = pending.pop(future)
+                    started.pop(index, None)
+                    try:
+                        value, error = future.result(), None
+                    except Exception as e:
+                        value, error = None, e
+
+                    completed[index] = result_type(inputs.pop(index), value, error)
+
+                if self.timeout > 0.0:
+                    now = time.perf_counter()
+                    for future, index in list(pending.items()):
+                        if now - started.get(index, now) > self.timeout:
+                            del pending[future]
+                            started.pop(index, None)
+                            abandoned = True
+                            completed[index] = result_type(inputs.pop(index), None, TimeoutError(f'Task timed out after {self.timeout:.1f}s'))
+
+                if ordered:
+                    while following in completed:
+                        yield completed.pop(following)
+                        following += 1
+                else:
+                    for index in list(completed):
+                        yield completed.pop(index)
+        finally:
+            executor.shutdown(wait=not abandoned, cancel_futures=True)
+            self.futures[:] = [future for future in self.futures if not future.cancelled()]
+
+    def _get_tasks(self, items: Iterable) -> Iterator:
+        if self.batch == 1:
+            yield from items
+        else:
+            batch = []
+            for item in items:
+                batch.append(item)
+                if len(batch) == self.batch:
+                    yield batch
+                    batch = []
+
+            if batch:
+                yield batch
+
+
+if __name__ == '__main__':
+    import random
+
+    def work(item: int) -> int:
+        time.sleep(random.random() * 0.05)
+        return item * item
+
+    tic = time.perf_counter()
+    results = [result.value for result in Executor(workers=4).map(work, range(100), ordered=True)]
+    toc = time.perf_counter()
+
+    print(f'{len(results)} tasks in {toc-tic:.2f}s, ordered={results == [i * i for i in range(100)]}')
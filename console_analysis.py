@@ -7,7 +7,6 @@ import webbrowser
 
 import argparse
 import pandas as pd
-import matplotlib.pyplot as plt
 from tabulate import tabulate
 
 import strategies as s
@@ -17,7 +16,7 @@ import screener.screener as screener
 from screener.screener import Screener
 from strategies.strategy import Strategy
 from analysis.support_resistance import SupportResistance
-from analysis.correlate import Correlate
+from analysis.correlate import Correlate, get_clusters
 from analysis.chart import Chart
 from data import store as store
 import etrade.auth as auth
@@ -441,6 +440,13 @@ class Interface:
         if product not in s.ProductType:
             raise ValueError('Invalid product')
 
+        # Clusters from this session's correlation, otherwise today's cached ones
+        if self.correlate is not None and self.correlate.name == self.table and not self.correlate.clusters.empty:
+            clusters = self.correlate.clusters
+        else:
+            clusters = get_clusters(self.table)
+
+        self.screener.remove_duplicates(clusters)
         tickers = [str(result) for result in self.screener.valids[:LISTTOP_SCREEN]]
 
         strategies = []
@@ -460,7 +466,7 @@ class Interface:
             sl.reset()
 
             # Start the working thread
-            self.task = threading.Thread(target=sl.analyze, args=[strategies])
+            self.task = threading.Thread(target=sl.analyze, args=[strategies], kwargs={'clusters': clusters})
             tic = time.perf_counter()
             self.task.start()
 
@@ -497,6 +503,8 @@ class Interface:
 
     def run_support_resistance(self, tickers: list[str]) -> None:
         if tickers:
+            import matplotlib.pyplot as plt
+
             for ticker in tickers:
                 if self.quick:
                     self.trend = SupportResistance(ticker, days=self.days)
@@ -545,6 +553,9 @@ class Interface:
 
                 ui.print_message(f'Correlation completed in {self.correlate.task_time:.1f} seconds', post_creturn=1)
 
+            # Cache the clusters so strategies skip near-identical tickers
+            self.correlate.cluster()
+
             # Start the filtering thread
             valids = [result.company.ticker for result in self.screener.valids]
             self.task = threading.Thread(target=self.correlate.filter, kwargs={'sublist': valids})
@@ -605,6 +616,8 @@ class Interface:
             # Show thread progress. Blocking while thread is active
             self.show_progress_chart()
 
+            import matplotlib.pyplot as plt
+
             figure, _ = self.chart.plot_ohlc()
             plt.figure(figure)
             plt.show()
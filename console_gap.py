@@ -99,7 +99,7 @@ class Interface:
             self.dirty = True
             self.gap = Gap(self.tickers, name=self.table, days=self.days, threshold=self.threshold)
             if len(self.tickers) > 1:
-                self.task = threading.Thread(target=self.gap.calculate, kwargs={'use_cache': self.use_cache})
+                self.task = threading.Thread(target=self.gap.calculate, kwargs={'use_cache': self.use_cache, 'universe': True})
                 self.task.start()
 
                 # Show thread progress. Blocking while thread is active
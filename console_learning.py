@@ -1,19 +1,19 @@
 import logging
 from dataclasses import asdict
+from typing import TYPE_CHECKING
 
 import argparse
-import matplotlib.pyplot as plt
 
 import pandas as pd
-from learning.lstm_base import LSTM_Base, Parameters
-from learning.lstm_predict import LSTM_Predict
-from learning.lstm_test import LSTM_Test
+from learning import Parameters
 
 from data import store as store
 from analysis.technical import Technical
 from utils import ui, logger
 from utils.ui import RangeValue
 
+if TYPE_CHECKING:
+    from learning.lstm_base import LSTM_Base
 
 logger.get_logger(logging.WARNING, logfile='')
 
@@ -27,7 +27,7 @@ class Interface:
         self.days: int = days
         self.exit: bool = exit
         self.parameters: Parameters = Parameters()
-        self.lstm: LSTM_Base
+        self.lstm: 'LSTM_Base'
 
         self.main_menu()
 
@@ -94,6 +94,8 @@ class Interface:
             v.value = value
 
     def run_test_history(self):
+        from learning.lstm_test import LSTM_Test  # keras/TensorFlow are slow to import, so only when needed
+
         history = store.get_history(self.ticker, days=self.days)
         inputs = ['open', 'high', 'low', 'volume', 'close']
         self.lstm = LSTM_Test(self.ticker, history, inputs, self.days, self.parameters)
@@ -101,6 +103,8 @@ class Interface:
         self.plot_test([], 'History')
 
     def run_test_averages(self):
+        from learning.lstm_test import LSTM_Test
+
         history = store.get_history(self.ticker, days=self.days)
         ta = Technical(self.ticker, history, self.days)
         sma15 = ta.calc_sma(15)
@@ -113,6 +117,8 @@ class Interface:
         self.plot_test(inputs, 'Averages')
 
     def run_prediction_history(self):
+        from learning.lstm_predict import LSTM_Predict
+
         history = store.get_history(self.ticker, days=self.days)
         inputs = ['open', 'high', 'low', 'volume', 'close']
         self.lstm = LSTM_Predict(self.ticker, history, inputs, self.days, self.parameters)
@@ -120,6 +126,8 @@ class Interface:
         self.plot_prediction()
 
     def plot_test(self, items:list[str], title: str = 'Plot'):
+        import matplotlib.pyplot as plt
+
         history = self.lstm.history[-self.lstm.test_size:].reset_index()
 
         plt.figure(figsize=(18, 8))
@@ -137,6 +145,8 @@ class Interface:
         plt.show()
 
     def plot_prediction(self, title: str = 'Close'):
+        import matplotlib.pyplot as plt
+
         history = self.lstm.history[-self.lstm.test_size:].reset_index()
         plots = [row for row in self.lstm.prediction.itertuples(index=False)]
 
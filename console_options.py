@@ -15,6 +15,7 @@ from tabulate import tabulate
 
 import data as d
 from data import store
+import pricing as p
 import strategies as s
 from strategies.strategy import Strategy
 from strategies.call import Call
@@ -545,7 +546,7 @@ class Interface():
     def m_select_settings(self) -> None:
         while True:
             menu_items = {
-                '1': f'Pricing Method ({self.strategy.legs[0].pricing_method.title()})',
+                '1': f'Pricing Method ({self.strategy.legs[0].pricing_method.name})',
             }
 
             selection = ui.menu(menu_items, 'Settings', 0, len(menu_items), prompt='Select setting', cancel='Done')
@@ -698,6 +699,7 @@ class Interface():
         menu_items = {
             '1': 'Black-Scholes',
             '2': 'Monte Carlo',
+            '3': 'Binomial Tree',
         }
 
         modified = True
@@ -705,12 +707,17 @@ class Interface():
             selection = ui.menu(menu_items, 'Available Methods', 0, len(menu_items), prompt='Select method', cancel='Done')
 
             if selection == 1:
-                self.strategy.set_pricing_method('black-scholes')
+                self.strategy.set_pricing_method(p.PricingType.BlackScholes)
                 self.dirty_analyze = True
                 break
 
             if selection == 2:
-                self.strategy.set_pricing_method('monte-carlo')
+                self.strategy.set_pricing_method(p.PricingType.MonteCarlo)
+                self.dirty_analyze = True
+                break
+
+            if selection == 3:
+                self.strategy.set_pricing_method(p.PricingType.Binomial)
                 self.dirty_analyze = True
                 break
 
@@ -167,7 +167,7 @@ class Interface:
                 save = (self.backtest == 0)
                 self.valids = []
 
-                self.task = threading.Thread(target=self.screener.run, kwargs={'use_cache': cache, 'save_results': save})
+                self.task = threading.Thread(target=self.screener.run, kwargs={'use_cache': cache, 'save_results': save, 'vectorized': not self.live})
                 self.task.start()
 
                 # Show thread progress. Blocking while thread is active
@@ -1,26 +1,34 @@
+import io
 import time
 import random
 import datetime as dt
-from concurrent import futures
 from pathlib import Path
+from collections.abc import Callable
 from urllib.error import HTTPError
 
-from sqlalchemy import create_engine, inspect, and_, or_
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import create_engine, inspect, insert, func, and_, or_
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import sessionmaker, Session
 from sqlalchemy.exc import IntegrityError
 import numpy as np
 import pandas as pd
 
 from base import Threaded
+from base.executor import Executor
 import data as d
 from data import store as store
 from data import models as models
+from data import panel as panel
 from utils import ui, logger
 
 _logger = logger.get_logger()
 
 
 RETRIES = 2
+TASK_BATCH = 5       # Tickers per task taken from the shared queue
+HISTORY_BATCH = 100  # Tickers per live history request when updating an exchange
+UPDATE_DAYS = 60     # Days of live history fetched for incremental updates (change if severely out of date)
+PRICE_COLUMNS = ['open', 'high', 'low', 'close', 'volume']
 
 class Manager(Threaded):
     def __init__(self):
@@ -68,7 +76,6 @@ class Manager(Threaded):
     @Threaded.threaded
     def populate_exchange(self, exchange: str, log: bool = True) -> None:
         exchange = exchange.upper()
-        running = self._concurrency
 
         def add(tickers):
             for ticker in tickers:
@@ -87,20 +94,11 @@ class Manager(Threaded):
                 self.task_total = len(tickers)
                 self.task_state = 'None'
 
-                with futures.ThreadPoolExecutor(max_workers=self._concurrency) as executor:
-                    random.shuffle(tickers)
-                    if self._concurrency > 1:
-                        if d.DEBUG_DB:
-                            tickers = tickers[::100]
-                        lists = np.array_split(tickers, self._concurrency)
-                        lists = [item.tolist() for item in lists if item.size > 0]
-                        self.task_futures = [executor.submit(add, item) for item in lists]
-                    else:
-                        self.task_futures = [executor.submit(add, tickers)]
+                random.shuffle(tickers)
+                if self._concurrency > 1 and d.DEBUG_DB:
+                    tickers = tickers[::100]
 
-                    for future in futures.as_completed(self.task_futures):
-                        running -= 1
-                        _logger.debug(f'Thread completed: {future.result()}. {running} threads remaining')
+                self._run_tasks(add, tickers)
             else:
                 _logger.warning(f'No symbols for {exchange}')
         else:
@@ -257,36 +255,32 @@ class Manager(Threaded):
                 tickers = self.identify_incomplete_companies(exchange)
 
             self.task_total = len(tickers)
-            concurrency = self._concurrency if self.task_total > self._concurrency else 1
-            running = concurrency
 
             if self.task_total > 0:
-                with futures.ThreadPoolExecutor(max_workers=concurrency) as executor:
-                    if concurrency > 1:
-                        random.shuffle(tickers)
-                        lists = np.array_split(tickers, concurrency)
-                        lists = [item.tolist() for item in lists if item.size > 0]
-                        self.task_futures = [executor.submit(update, item) for item in lists]
-                    else:
-                        self.task_futures = [executor.submit(update, tickers)]
-
-                    for future in futures.as_completed(self.task_futures):
-                        running -= 1
-                        _logger.info(f'Thread completed: {future.result()}. {running} threads remaining')
+                random.shuffle(tickers)
+                self._run_tasks(update, tickers)
 
         self.task_state = 'Done'
 
-    def update_history_ticker(self, ticker: str, inactive: bool = False) -> int:
+    def update_history_ticker(self, ticker: str, inactive: bool = False, history: pd.DataFrame | None = None) -> int:
         ticker = ticker.upper()
         days = -1
 
         if store.is_ticker(ticker, inactive):
             today = dt.date.today()
 
-            history = store.get_history(ticker, inactive=inactive)
-            if history is None:
+            with self.session() as session:
+                q = session.query(models.Security.id, func.max(models.Price.date).label('date')) \
+                    .outerjoin(models.Price, models.Price.security_id == models.Security.id) \
+                    .filter(models.Security.ticker == ticker)
+                if not inactive:
+                    q = q.filter(models.Security.active)
+
+                security = q.group_by(models.Security.id).one_or_none()
+
+            if security is None:
                 _logger.error(f'\'None\' object for {ticker}')
-            elif history.empty:
+            elif security.date is None:
                 if self._add_live_history_to_ticker(ticker):
                     _logger.info(f'Added full price history for {ticker}')
 
@@ -294,53 +288,34 @@ class Manager(Threaded):
                 else:
                     _logger.warning(f'No price history for {ticker}')
             else:
-                date_db = history.iloc[-1]['date']
-                if date_db is None:
-                    date_db = today - dt.date(2000, 1, 1)
-                    _logger.warning(f'No price history for {ticker} in database')
-
+                date_db = security.date
                 delta = (today - date_db).days
                 if delta > 0:
-                    history = store.get_history(ticker, days=60, live=True)  # Change days value if severely out of data
+                    if history is None:
+                        history = store.get_history(ticker, days=UPDATE_DAYS, live=True)
+
                     if history is None:
                         _logger.error(f'\'None\' object for {ticker}')
                     elif history.empty:
                         _logger.warning(f'Empty pricing dataframe for {ticker}')
                     else:
-                        date_cloud = history.iloc[-1]['date'].to_pydatetime().date()
-                        delta = (date_cloud - date_db).days
+                        dates = pd.to_datetime(history['date']).dt.date
+                        date_cloud = dates.iloc[-1]
                         _logger.info(f'Last {ticker} price in database: {date_db:%Y-%m-%d}')
                         _logger.info(f'Last {ticker} price in cloud: {date_cloud:%Y-%m-%d}')
-                        _logger.info(f'{date_cloud:%Y-%m-%d} - {date_db:%Y-%m-%d} = {delta} days')
-                        if delta > 0:
-                            days = delta
-                            history = history[-delta:]
-                            history = history.reset_index()
 
+                        history = history[(dates > date_db).to_numpy()]
+                        if not history.empty:
+                            # Rows already stored (from a concurrent update, say) are skipped by the unique constraint
                             with self.session.begin() as session:
-                                t = session.query(models.Security).filter(models.Security.ticker == ticker).one()
-
-                                # Add any newer price records
-                                for price in history.itertuples():
-                                    date = price.date.to_pydatetime().date()
-                                    if date > date_db:
-                                        q = session.query(models.Price.date).filter(and_(models.Price.security_id == t.id, models.Price.date == date)).one_or_none()
-                                        if q is None:
-                                            p = models.Price()
-                                            p.date = date
-                                            p.open = price.open
-                                            p.high = price.high
-                                            p.low = price.low
-                                            p.close = price.close
-                                            p.volume = price.volume
-
-                                            t.pricing += [p]
+                                days = _upsert_prices(session, security.id, history)
 
                             _logger.info(f'Updated {days} days pricing for {ticker} to {date_cloud:%Y-%m-%d}')
                         else:
                             days = 0
                             _logger.info(f'{ticker} already up to date with cloud data')
                 else:
+                    days = 0
                     _logger.info(f'{ticker} already up to date')
         else:
             _logger.warning(f'Unknown ticker {ticker}')
@@ -348,21 +323,25 @@ class Manager(Threaded):
         return days
 
     @Threaded.threaded
-    def update_history_exchange(self, exchange: str, log: bool = True) -> None:
+    def update_history_exchange(self, exchange: str, log: bool = True, build_panel: bool = True) -> None:
         tickers = store.get_tickers(exchange)
         self.invalid_tickers = []
         self.task_total = len(tickers)
-        running = self._concurrency
 
         def update(tickers: list[str]) -> None:
+            try:
+                histories = store.get_history_bulk(tickers, days=UPDATE_DAYS, live=True)
+            except Exception as e:
+                histories = {}  # Each ticker falls back to fetching its own history
+                _logger.error(f'Unknown exception occurred fetching history for {len(tickers)} tickers: {e}')
+
             for ticker in tickers:
                 tic = time.perf_counter()
                 self.task_ticker = ticker
                 days = -1
 
                 try:
-                    time.sleep(0.05)
-                    days = self.update_history_ticker(ticker)
+                    days = self.update_history_ticker(ticker, history=histories.get(ticker.upper()))
                 except IntegrityError as e:
                     _logger.error(f'IntegrityError exception occurred for {ticker}: {e.__cause__}')
                 except Exception as e:
@@ -386,23 +365,44 @@ class Manager(Threaded):
         if self.task_total > 0:
             self.task_state = 'None'
 
-            with futures.ThreadPoolExecutor(max_workers=self._concurrency) as executor:
-                if self._concurrency > 1:
-                    random.shuffle(tickers)
-                    lists = np.array_split(tickers, self._concurrency)
-                    lists = [item.tolist() for item in lists if item.size > 0]
-                    self.task_futures = [executor.submit(update, item) for item in lists]
-                else:
-                    self.task_futures = [executor.submit(update, tickers)]
+            # Each task fetches its tickers' recent history in a single request
+            random.shuffle(tickers)
+            self._run_tasks(update, tickers, batch=HISTORY_BATCH)
 
-                for future in futures.as_completed(self.task_futures):
-                    running -= 1
-                    _logger.info(f'Thread completed: {future.result()}. {running} threads remaining')
         if log:
             ui.write_tickers_log(self.invalid_tickers)
 
+        if build_panel and self.task_total > 0:
+            self.task_state = 'Building panel'
+            self.build_panel()
+
         self.task_state = 'Done'
 
+    def build_panel(self, dtype: type = np.float64) -> panel.Panel | None:
+        ''' Rebuild the memory-mapped OHLCV panel for every active ticker from the database '''
+
+        prices = None
+
+        tickers = store.get_tickers('every')
+        dates = store.get_price_dates()
+        if tickers and dates:
+            tic = time.perf_counter()
+
+            prices = panel.create(tickers, dates, dtype=dtype)
+            for index in range(0, len(tickers), store.HISTORY_BULK_CHUNK):
+                histories = store.get_history_bulk(tickers[index:index + store.HISTORY_BULK_CHUNK], use_panel=False)
+                for ticker, history in histories.items():
+                    prices.set_history(ticker, history)
+
+            prices = prices.save()
+
+            toc = time.perf_counter()
+            _logger.info(f'{toc-tic:.2f}s to build panel')
+        else:
+            _logger.warning('No pricing available to build panel')
+
+        return prices
+
     def delete_database(self, recreate: bool = False):
         if d.ACTIVE_DB == d.VALID_DBS[1]: # Postfres
             models.Base.metadata.drop_all(self.engine)
@@ -623,22 +623,7 @@ class Manager(Threaded):
             self.task_state = 'None'
 
             random.shuffle(tickers)
-            lists = np.array_split(tickers, self._concurrency)
-            lists = [item.tolist() for item in lists if item.size > 0]
-            running = len(lists)
-            if running < self._concurrency:
-                self._concurrency = running
-
-            with futures.ThreadPoolExecutor(max_workers=self._concurrency) as executor:
-                if self._concurrency > 1:
-                    self.task_futures = [executor.submit(recheck, item) for item in lists]
-                else:
-                    running = 1
-                    self.task_futures = [executor.submit(recheck, tickers)]
-
-                for future in futures.as_completed(self.task_futures):
-                    running -= 1
-                    _logger.info(f'Thread completed: {future.result()}. {running} threads remaining')
+            self._run_tasks(recheck, tickers)
         elif tickers:
             recheck(tickers)
 
@@ -686,7 +671,6 @@ class Manager(Threaded):
     @Threaded.threaded
     def identify_incomplete_pricing(self, table: str , days: int = 7) -> None:
         tickers = store.get_tickers(table.upper())
-        running = self._concurrency
         self.task_total = len(tickers)
         self.task_object: dict = {}
 
@@ -711,18 +695,8 @@ class Manager(Threaded):
         if self.task_total > 0:
             self.task_state = 'None'
 
-            with futures.ThreadPoolExecutor(max_workers=self._concurrency) as executor:
-                if self._concurrency > 1:
-                    random.shuffle(tickers)
-                    lists = np.array_split(tickers, self._concurrency)
-                    lists = [item.tolist() for item in lists if item.size > 0]
-                    self.task_futures = [executor.submit(check, item) for item in lists]
-                else:
-                    self.task_futures = [executor.submit(check, tickers)]
-
-                for future in futures.as_completed(self.task_futures):
-                    running -= 1
-                    _logger.info(f'Thread completed: {future.result()}. {running} threads remaining')
+            random.shuffle(tickers)
+            self._run_tasks(check, tickers)
 
             if len(self.task_object) > 1:
                 last = sorted(self.task_object)[-1]
@@ -794,7 +768,7 @@ class Manager(Threaded):
 
         return c is not None
 
-    def _add_live_history_to_ticker(self, ticker: str, history: pd.DataFrame | None = None) -> bool:
+    def _add_live_history_to_ticker(self, ticker: str, history: pd.DataFrame | None = None, bulk: bool = True) -> bool:
         added = False
 
         try:
@@ -808,21 +782,11 @@ class Manager(Threaded):
                     if history is None:
                         _logger.error(f'\'None\' object for {ticker}')
                     if not history.empty:
-                        for price in history.reset_index().itertuples():
-                            if price.date:
-                                p = models.Price()
-                                p.date = price.date
-                                p.open = price.open
-                                p.high = price.high
-                                p.low = price.low
-                                p.close = price.close
-                                p.volume = price.volume
-
-                                t.pricing += [p]
-                            else:
-                                t.active = False
-                        else:
-                            _logger.info(f'Added pricing information for {ticker}')
+                        valid = _insert_prices_bulk(session, t.id, history) if bulk else _insert_prices_orm(t, history)
+                        if not valid:
+                            t.active = False
+
+                        _logger.info(f'Added pricing information for {ticker}')
                     else:
                         t.active = False
                         _logger.info(f'No pricing information for {ticker}')
@@ -837,6 +801,16 @@ class Manager(Threaded):
 
         return added
 
+    def _run_tasks(self, function: Callable[[list[str]], None], tickers: list[str], batch: int = TASK_BATCH) -> None:
+        ''' Run a function over small batches of tickers taken from a shared queue by the worker threads '''
+
+        executor = Executor(workers=self._concurrency, batch=batch)
+        self.task_futures = executor.futures
+
+        for result in executor.map(function, tickers):
+            if result.error is not None:
+                _logger.error(f'Unknown exception occurred for {", ".join(result.item)}: {result.error}')
+
     def _add_securities_to_index(self, tickers: list[str], index: str) -> None:
         with self.session.begin() as session:
             ind = session.query(models.Index.id).filter(models.Index.abbreviation == index).one()
@@ -859,15 +833,148 @@ class Manager(Threaded):
                 _logger.info(f'Added {t} to index {index}')
 
 
+def _insert_prices_orm(security: models.Security, history: pd.DataFrame) -> bool:
+    ''' Add one Price object per row to the security. Rows without a date are skipped
+
+    :return: <bool> True if every row had a date
+    '''
+
+    valid = True
+    for price in history.reset_index().itertuples():
+        if price.date:
+            p = models.Price()
+            p.date = price.date
+            p.open = price.open
+            p.high = price.high
+            p.low = price.low
+            p.close = price.close
+            p.volume = price.volume
+
+            security.pricing += [p]
+        else:
+            valid = False
+
+    return valid
+
+
+def _insert_prices_bulk(session: Session, security_id: int, history: pd.DataFrame) -> bool:
+    ''' Insert a history frame in one statement on the session's connection: COPY for Postgres (psycopg2),
+    otherwise a Core executemany. Rows without a date are skipped
+
+    :return: <bool> True if every row had a date
+    '''
+
+    prices, valid = _build_price_frame(security_id, history)
+
+    if not prices.empty:
+        connection = session.connection()
+        if connection.dialect.name == 'postgresql' and connection.dialect.driver == 'psycopg2':
+            buffer = io.StringIO()
+            prices.to_csv(buffer, header=False, index=False, na_rep='')
+            buffer.seek(0)
+
+            columns = ', '.join(prices.columns)
+            with connection.connection.driver_connection.cursor() as cursor:
+                cursor.copy_expert(f'COPY {models.Price.__tablename__} ({columns}) FROM STDIN WITH (FORMAT csv)', buffer)
+        else:
+            connection.execute(insert(models.Price.__table__), _build_price_rows(prices))
+
+    return valid
+
+
+def _upsert_prices(session: Session, security_id: int, history: pd.DataFrame) -> int:
+    ''' Insert a history frame in one INSERT ... ON CONFLICT (date, security_id) DO NOTHING statement
+
+    :return: <int> Number of rows inserted
+    '''
+
+    prices, _ = _build_price_frame(security_id, history)
+    if prices.empty:
+        return 0
+
+    connection = session.connection()
+    dialect = postgresql if connection.dialect.name == 'postgresql' else sqlite
+    statement = dialect.insert(models.Price.__table__).values(_build_price_rows(prices))
+    statement = statement.on_conflict_do_nothing(index_elements=['date', 'security_id'])
+
+    return connection.execute(statement).rowcount
+
+
+def _build_price_frame(security_id: int, history: pd.DataFrame) -> tuple[pd.DataFrame, bool]:
+    ''' Price table columns of a history frame, without rows that have no date
+
+    :return: <DataFrame>, <bool> Price rows, and True if every row had a date
+    '''
+
+    prices = history.reset_index()
+    valid = prices['date'].notna()
+    prices = prices.loc[valid, ['date'] + PRICE_COLUMNS]
+    prices['date'] = pd.to_datetime(prices['date']).dt.date
+    prices['security_id'] = security_id
+
+    return prices, bool(valid.all())
+
+
+def _build_price_rows(prices: pd.DataFrame) -> list[dict]:
+    return prices.astype(object).where(prices.notna(), None).to_dict('records')
+
+
+def benchmark_price_insert(rows: int = 5000, tickers: int = 5, uri: str = 'sqlite://') -> dict[str, float]:
+    ''' Time the ORM and bulk price insert paths against a scratch database
+
+    :return: <dict> Rows per second for each path
+    '''
+
+    engine = create_engine(uri, echo=False)
+    models.Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)
+
+    dates = pd.bdate_range(end=dt.date.today(), periods=rows)
+    close = 100.0 * np.exp(np.cumsum(np.random.default_rng().normal(0.0, 0.02, rows)))
+    history = pd.DataFrame({'date': dates, 'open': close, 'high': close * 1.01, 'low': close * 0.99, 'close': close, 'volume': 1.0e6})
+
+    with session.begin() as s:
+        s.add(models.Exchange('BENCH', 'Benchmark'))
+
+    results = {}
+    for method in ('orm', 'bulk'):
+        elapsed = 0.0
+        for index in range(tickers):
+            with session.begin() as s:
+                exchange = s.query(models.Exchange).filter(models.Exchange.abbreviation == 'BENCH').one()
+                security = models.Security(f'{method.upper()}{index}')
+                exchange.securities.append(security)
+                s.flush()
+
+                tic = time.perf_counter()
+                if method == 'bulk':
+                    _insert_prices_bulk(s, security.id, history)
+                else:
+                    _insert_prices_orm(security, history)
+                s.flush()
+                elapsed += time.perf_counter() - tic
+
+        results[method] = (rows * tickers) / elapsed
+
+    models.Base.metadata.drop_all(engine)
+
+    return results
+
+
 if __name__ == '__main__':
     import sys
     import logging
 
     logger.get_logger(logging.DEBUG)
 
-    m = Manager()
-
-    if len(sys.argv) > 1:
-        c = m.add_ticker_to_exchange(sys.argv[1], 'NASDAQ')
+    if len(sys.argv) > 1 and sys.argv[1] == '--benchmark':
+        uri = sys.argv[2] if len(sys.argv) > 2 else 'sqlite://'
+        for method, rate in benchmark_price_insert(uri=uri).items():
+            print(f'{method:5s}: {rate:,.0f} rows/sec')
     else:
-        c = m.add_ticker_to_exchange('AAPL', 'NASDAQ')
+        m = Manager()
+
+        if len(sys.argv) > 1:
+            c = m.add_ticker_to_exchange(sys.argv[1], 'NASDAQ')
+        else:
+            c = m.add_ticker_to_exchange('AAPL', 'NASDAQ')
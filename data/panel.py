@@ -0,0 +1,218 @@
+import os
+import shutil
+import datetime as dt
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from utils import logger
+
+
+_logger = logger.get_logger()
+
+PANEL_BASEPATH = './data/panel'
+PANEL_FIELDS = ('open', 'high', 'low', 'close', 'volume')
+PANEL_TICKERS = 'tickers'
+PANEL_DATES = 'dates'
+PANEL_SUFFIX = 'npy'
+PANEL_CURRENT = 'current'  # File naming the directory of the current panel
+
+
+class Panel:
+    '''
+    Columnar price panel for the whole universe. Each OHLCV field is a (tickers x trading days) array
+    stored as a .npy file and memory-mapped read-only, so reads are zero-copy views that are shared
+    between processes through the page cache. Days without a price for a ticker hold NaN. Each build is
+    written to its own directory, and the current one named in a single pointer file.
+
+    :param path: Directory holding the panel builds
+    :param directory: Directory of this build, within path
+    :param tickers: <ndarray> Ticker of each row
+    :param dates: <ndarray> Trading date (datetime64[D]) of each column
+    :param fields: <dict> Array of each OHLCV field
+    :param version: <float> Modification time of the panel files when loaded
+    '''
+
+    def __init__(self, path: str, directory: str, tickers: np.ndarray, dates: np.ndarray, fields: dict[str, np.ndarray], version: float = 0.0):
+        self.path = path
+        self.directory = directory
+        self.tickers = tickers
+        self.dates = dates
+        self.fields = fields
+        self.version = version
+
+        self._index = {ticker: index for index, ticker in enumerate(tickers.tolist())}
+
+    def __repr__(self):
+        return f'<Panel ({len(self.tickers)} tickers x {len(self.dates)} days)>'
+
+    def __contains__(self, ticker: str) -> bool:
+        return ticker.upper() in self._index
+
+    def __getitem__(self, field: str) -> np.ndarray:
+        return self.fields[field]
+
+    @property
+    def shape(self) -> tuple[int, int]:
+        return len(self.tickers), len(self.dates)
+
+    def get_index(self, ticker: str) -> int:
+        return self._index.get(ticker.upper(), -1)
+
+    def get_window(self, days: int = -1, end: int = 0) -> slice:
+        ''' Columns covering the last 'days' calendar days, ending 'end' trading days before the last date '''
+
+        start = 0
+        if days > 1:
+            # The database compares dates against a datetime, so the first day itself is excluded
+            first = np.datetime64(dt.date.today() - dt.timedelta(days=days) - dt.timedelta(days=end), 'D')
+            start = int(np.searchsorted(self.dates, first, side='right'))
+
+        return slice(start, max(len(self.dates) - end, start))
+
+    def get_field(self, field: str, days: int = -1, end: int = 0) -> np.ndarray:
+        ''' Zero-copy (tickers x days) view of a field '''
+
+        if field not in self.fields:
+            raise ValueError(f'Invalid field: {field}')
+
+        return self.fields[field][:, self.get_window(days, end)]
+
+    def get_row(self, field: str, ticker: str, days: int = -1, end: int = 0) -> np.ndarray:
+        ''' Zero-copy view of a single ticker's field '''
+
+        index = self.get_index(ticker)
+        if index < 0:
+            raise ValueError(f'Ticker not in panel: {ticker}')
+
+        return self.get_field(field, days, end)[index]
+
+    def get_history(self, ticker: str, days: int = -1, end: int = 0) -> pd.DataFrame:
+        ''' Ticker history in the same format (and with the same days/end semantics) as store.get_history '''
+
+        history = pd.DataFrame()
+
+        index = self.get_index(ticker)
+        if index >= 0:
+            window = slice(self.get_window(days, end).start, len(self.dates))
+            valid = ~np.isnan(self.fields['close'][index, window])
+            if valid.any():
+                data = {'date': self.dates[window][valid].astype(object)}
+                data.update({field: self.fields[field][index, window][valid] for field in PANEL_FIELDS})
+                history = pd.DataFrame(data)
+
+                if end > 0:
+                    history = history[:-end]
+
+        return history
+
+    def set_history(self, ticker: str, history: pd.DataFrame) -> bool:
+        ''' Fill a ticker's row from a history frame. Only valid for panels returned by create() '''
+
+        index = self.get_index(ticker)
+        if index < 0 or history.empty:
+            return False
+
+        dates = pd.to_datetime(history['date']).to_numpy().astype('datetime64[D]')
+        positions = np.searchsorted(self.dates, dates)
+        positions = np.minimum(positions, len(self.dates) - 1)
+        matched = self.dates[positions] == dates
+
+        for field in PANEL_FIELDS:
+            self.fields[field][index, positions[matched]] = history[field].to_numpy(dtype=float)[matched]
+
+        return True
+
+    def save(self) -> 'Panel':
+        ''' Flush a panel returned by create() and atomically make it the current panel '''
+
+        for array in self.fields.values():
+            array.flush()
+
+        directory = f'{self.path}/{self.directory}'
+        for name, array in ((PANEL_TICKERS, self.tickers), (PANEL_DATES, self.dates)):
+            np.save(_build_filename(directory, name), array)
+
+        # Switch the pointer in one replace, so readers see either the old files or the new ones, never a mix
+        previous = _get_directory(self.path)
+        pointer = f'{self.path}/{PANEL_CURRENT}'
+        with open(f'{pointer}.tmp', 'w') as f:
+            f.write(self.directory)
+        os.replace(f'{pointer}.tmp', pointer)
+
+        # Keep the previous build for readers that took the pointer just before the switch
+        for item in Path(self.path).iterdir():
+            if item.is_dir() and item.name not in (self.directory, previous):
+                shutil.rmtree(item, ignore_errors=True)
+
+        _logger.info(f'Saved panel of {len(self.tickers)} tickers x {len(self.dates)} days to {directory}')
+
+        return load(self.path)
+
+
+def create(tickers: list[str], dates: list[dt.date], dtype: type = np.float64, path: str = PANEL_BASEPATH) -> Panel:
+    ''' Create an empty, writable panel. Fill it with set_history() then call save() '''
+
+    if not tickers:
+        raise ValueError('Must include tickers')
+    if not dates:
+        raise ValueError('Must include dates')
+
+    directory = dt.datetime.now().strftime('%Y%m%d%H%M%S%f')
+    Path(f'{path}/{directory}').mkdir(parents=True, exist_ok=True)
+
+    tickers_ = np.array([ticker.upper() for ticker in tickers])
+    dates_ = np.unique(np.array(dates, dtype='datetime64[D]'))
+    fields = {}
+    for field in PANEL_FIELDS:
+        filename = _build_filename(f'{path}/{directory}', field)
+        fields[field] = np.lib.format.open_memmap(filename, mode='w+', dtype=dtype, shape=(len(tickers_), len(dates_)))
+        fields[field][:] = np.nan
+
+    return Panel(path, directory, tickers_, dates_, fields)
+
+
+def load(path: str = PANEL_BASEPATH) -> Panel | None:
+    panel = None
+
+    version = get_version(path)
+    directory = _get_directory(path)
+    if version > 0.0 and directory:
+        try:
+            tickers = np.load(_build_filename(f'{path}/{directory}', PANEL_TICKERS))
+            dates = np.load(_build_filename(f'{path}/{directory}', PANEL_DATES))
+            fields = {field: np.load(_build_filename(f'{path}/{directory}', field), mmap_mode='r') for field in PANEL_FIELDS}
+
+            if any(array.shape != (len(tickers), len(dates)) for array in fields.values()):
+                raise ValueError('Field shapes do not match tickers and dates')
+        except (OSError, ValueError) as e:
+            _logger.error(f'Unable to load panel from {path}: {str(e)}')
+        else:
+            panel = Panel(path, directory, tickers, dates, fields, version=version)
+            _logger.info(f'Loaded {panel}')
+    else:
+        _logger.info(f'No panel found at {path}')
+
+    return panel
+
+
+def get_version(path: str = PANEL_BASEPATH) -> float:
+    filename = Path(f'{path}/{PANEL_CURRENT}')
+    return filename.stat().st_mtime if filename.is_file() else 0.0
+
+
+def _get_directory(path: str) -> str:
+    filename = Path(f'{path}/{PANEL_CURRENT}')
+    return filename.read_text().strip() if filename.is_file() else ''
+
+
+def _build_filename(path: str, name: str) -> str:
+    return f'{path}/{name}.{PANEL_SUFFIX}'
+
+
+if __name__ == '__main__':
+    panel_ = load()
+    if panel_ is not None:
+        print(panel_)
+        print(panel_.get_history(panel_.tickers[0], days=30))
@@ -1,20 +1,23 @@
 import datetime as dt
+import threading
 
+import numpy as np
 import pandas as pd
-from sqlalchemy import create_engine, and_, or_
+from sqlalchemy import create_engine, func, and_, or_
 from sqlalchemy.orm import sessionmaker
 
 import data as d
 from fetcher import fetcher as fetcher
-from fetcher.google import Sheet
-from fetcher.google import Google
-from fetcher.excel import Excel
+from fetcher.sheet import Sheet
 from data import models as models
+from data import panel as panel
 from utils import logger
 
 
 _logger = logger.get_logger()
 
+HISTORY_BULK_CHUNK = 500  # Max tickers per bulk history query
+
 
 _master_exchanges: dict = {
     d.EXCHANGES[0]['abbreviation']: set(),
@@ -26,6 +29,9 @@ _master_indexes: dict = {
     d.INDEXES[1]['abbreviation']: set(),
 }
 
+_panel: panel.Panel | None = None
+_panel_lock = threading.Lock()
+
 if d.ACTIVE_DB == 'Postgres':
     _engine = create_engine(d.ACTIVE_URI, echo=False, pool_size=10, max_overflow=20)
     _session = sessionmaker(bind=_engine)
@@ -38,10 +44,21 @@ def is_database_connected() -> bool:
     return bool(d.ACTIVE_URI)
 
 
+def dispose_engine() -> None:
+    ''' Drop pooled connections inherited from a parent process so that a worker process opens its own '''
+
+    if is_database_connected():
+        _engine.dispose(close=False)
+
+
 def is_live_connection() -> bool:
     return fetcher.is_connected()
 
 
+def set_offline(offline: bool = True) -> None:
+    fetcher.set_offline(offline)
+
+
 def is_ticker(ticker: str, inactive: bool = False) -> bool:
     ticker = ticker.upper()
 
@@ -329,6 +346,123 @@ def get_history(ticker: str, days: int = -1, end: int = 0, live: bool = False, i
     return history
 
 
+def get_history_bulk(tickers: list[str], days: int = -1, end: int = 0, live: bool = False, inactive: bool = False, use_panel: bool = True) -> dict[str, pd.DataFrame]:
+    if end < 0:
+        raise ValueError('Invalid value for \'end\'')
+
+    tickers = list(dict.fromkeys(ticker.upper() for ticker in tickers))
+    histories = {ticker: pd.DataFrame() for ticker in tickers}
+    live = True if _session is None else live
+
+    if live:
+        histories.update(fetcher.get_history_live_many(tickers, days))
+
+        if end > 0:
+            _logger.info('\'end\' value ignored for live queries')
+    elif days == 0 or days == 1:
+        _logger.warning('Must specify history days > 1')
+    else:
+        prices = get_panel() if use_panel and not inactive else None
+        if prices is not None and all(ticker in prices for ticker in tickers) and _is_panel_current(prices):
+            # Read straight from the memory-mapped panel
+            for ticker in tickers:
+                histories[ticker] = prices.get_history(ticker, days, end=end)
+
+            _logger.debug(f'Read price history for {len(tickers)} tickers from panel ({end} days prior)')
+        else:
+            # Fetch the tickers in a few large queries rather than one query per ticker
+            for index in range(0, len(tickers), HISTORY_BULK_CHUNK):
+                chunk = tickers[index:index + HISTORY_BULK_CHUNK]
+
+                with _session() as session:
+                    q = session.query(
+                        models.Security.ticker,
+                        models.Price.date,
+                        models.Price.open,
+                        models.Price.high,
+                        models.Price.low,
+                        models.Price.close,
+                        models.Price.volume).join(models.Security, models.Price.security_id == models.Security.id).filter(models.Security.ticker.in_(chunk))
+
+                    if not inactive:
+                        q = q.filter(models.Security.active)
+                    if days > 1:
+                        start = dt.datetime.today() - dt.timedelta(days=days) - dt.timedelta(days=end)
+                        q = q.filter(models.Price.date >= start)
+
+                    q = q.order_by(models.Security.ticker, models.Price.date)
+                    history = pd.read_sql(q.statement, _engine)
+
+                for ticker, group in history.groupby('ticker', sort=False):
+                    group = group.drop('ticker', axis=1).reset_index(drop=True)
+                    if end > 0:
+                        group = group[:-end]
+
+                    histories[ticker] = group
+
+                _logger.debug(f'Fetched {len(history)} items of price history for {len(chunk)} tickers from {d.ACTIVE_DB} ({end} days prior)')
+
+        empty = [ticker for ticker, history in histories.items() if history.empty]
+        if empty:
+            _logger.info(f'No history found for {len(empty)} of {len(tickers)} tickers')
+
+    return histories
+
+
+async def get_history_many(tickers: list[str], days: int = -1) -> dict[str, pd.DataFrame]:
+    ''' Fetch live price histories concurrently, overlapping the network waits rather than serializing them
+
+    :return: <dict> History of each ticker. Empty if not available.
+    '''
+
+    tickers = list(dict.fromkeys(ticker.upper() for ticker in tickers))
+    histories = {ticker: pd.DataFrame() for ticker in tickers}
+    histories.update(await fetcher.get_history_live_many_async(tickers, days))
+
+    return histories
+
+
+def get_price_dates(days: int = -1) -> list[dt.date]:
+    dates = []
+
+    if _session is not None:
+        with _session() as session:
+            q = session.query(models.Price.date).distinct()
+            if days > 1:
+                start = dt.datetime.today() - dt.timedelta(days=days)
+                q = q.filter(models.Price.date >= start)
+
+            dates = [price.date for price in q.order_by(models.Price.date).all()]
+
+    return dates
+
+
+def get_panel(current: bool = False) -> panel.Panel | None:
+    ''' Get the memory-mapped price panel, optionally only if it holds the latest prices in the database '''
+
+    global _panel
+
+    # Reload only when the panel files have been rebuilt
+    with _panel_lock:
+        if _panel is None or _panel.version != panel.get_version():
+            _panel = panel.load()
+
+        prices = _panel
+
+    if current and prices is not None and not _is_panel_current(prices):
+        _logger.info('Panel is out of date')
+        prices = None
+
+    return prices
+
+
+def _is_panel_current(prices: panel.Panel) -> bool:
+    with _session() as session:
+        latest = session.query(func.max(models.Price.date)).scalar()
+
+    return latest is not None and len(prices.dates) > 0 and prices.dates[-1] >= np.datetime64(latest, 'D')
+
+
 def get_company(ticker: str, live: bool = False, extra: bool = False) -> dict:
     ticker = ticker.upper()
     live = True if _session is None else live
@@ -457,9 +591,12 @@ def get_exchange_tickers_master(exchange: str, type: str = 'google') -> list[str
         if len(_master_exchanges[exchange]) > 0:
             symbols = _master_exchanges[exchange]
         else:
+            # Spreadsheet clients are slow to import and only needed here
             if type == 'google':
+                from fetcher.google import Google
                 table = Google(d.GOOGLE_SHEETNAME_EXCHANGES)
             elif type == 'excel':
+                from fetcher.excel import Excel
                 table = Excel(d.EXCEL_SHEETNAME_EXCHANGES)
             else:
                 raise ValueError(f'Invalid table type: {type}')
@@ -484,9 +621,12 @@ def get_index_tickers_master(index: str, type: str = 'google') -> list[str]:
         if len(_master_indexes[index]) > 0:
             symbols = _master_indexes[index]
         else:
+            # Spreadsheet clients are slow to import and only needed here
             if type == 'google':
+                from fetcher.google import Google
                 table = Google(d.GOOGLE_SHEETNAME_INDEXES)
             elif type == 'excel':
+                from fetcher.excel import Excel
                 table = Excel(d.EXCEL_SHEETNAME_INDEXES)
             else:
                 raise ValueError(f'Invalid spreadsheet type: {type}')
@@ -510,6 +650,15 @@ def get_option_chain(ticker: str, expiry: dt.datetime) -> pd.DataFrame:
     return fetcher.get_option_chain(ticker, expiry)
 
 
+async def get_option_chains_many(chains: list[tuple[str, dt.datetime]]) -> dict[tuple[str, dt.datetime], pd.DataFrame]:
+    ''' Fetch the option chains of many (ticker, expiry) pairs concurrently, e.g. for the top screened tickers
+
+    :return: <dict> Chain of each (ticker, expiry). Empty if not available.
+    '''
+
+    return await fetcher.get_option_chains_many_async(chains)
+
+
 def get_treasury_rate(ticker: str = 'DTB3') -> float:
     # DTB3: Default to 3-Month Treasury Rate
     return fetcher.get_treasury_rate(ticker)
@@ -99,7 +99,7 @@ class Options:
 
             chain = pd.concat([calls_table, puts_table], axis=0)
 
-            # E*Trade does not include impliedVolatility. Add for compatability with yfinance. This will force calculated volatility to be used
+            # E*Trade does not include impliedVolatility. Add for compatability with yfinance. Legs solve it from the chain prices
             chain['impliedVolatility'] = -1.0
 
         return chain
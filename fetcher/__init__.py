@@ -1,7 +1,14 @@
-THROTTLE_FETCH = 0.05  # Min secs between calls to fetch pricing
-THROTTLE_ERROR = 1.00  # Min secs between calls after error
 RETRIES = 2            # Number of fetch retries after error
 
+# Requests/sec and burst size of each data source (see fetcher.limiter)
+RATE_LIMITS = {
+    'yfinance': (20.0, 20),
+    'marketdata': (5.0, 10),
+    'quandl': (20.0, 20),
+    'etrade': (4.0, 4),
+}
+RATE_LIMIT_DEFAULT = (5.0, 5)
+
 
 RATINGS = {
     'strongsell': 5,
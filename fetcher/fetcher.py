@@ -1,25 +1,74 @@
+import copy
 import time
 import socket
+import asyncio
+import weakref
+import threading
+import collections
 import datetime as dt
+from concurrent import futures
+from collections.abc import Callable
 
 import pandas as pd
 
 import data as d
-from fetcher import source_yfinance as yf
-from fetcher import source_marketdata as md
-from fetcher import source_etrade as et
-from fetcher import source_quandl as qd
+from fetcher import limiter
 from utils import logger
 
 
 _logger = logger.get_logger()
 
-THROTTLE_FETCH = 0.05  # Min secs between calls to fetch pricing
+# The source_* modules (and the clients they wrap) are imported where first used to keep startup fast
 
-_elapsed = 0.0
+ASYNC_CONCURRENCY = 8     # Max requests in flight from the async fetchers
+CONNECTION_TTL = 300.0    # Secs a successful connectivity check remains valid
+CONNECTION_RETRY = 10.0   # Secs a failed connectivity check remains valid
 
+flight_type = collections.namedtuple('flight_type', ['requests', 'coalesced'])
 
-def is_connected(hostname: str = 'google.com') -> bool:
+_flights: dict[tuple, futures.Future] = {}
+_flights_lock = threading.Lock()
+_flight_requests = 0
+_flight_coalesced = 0
+
+
+_offline = False
+_connected = False
+_connected_checked = 0.0
+_connected_lock = threading.Lock()
+
+
+def is_connected(hostname: str = 'google.com', refresh: bool = False) -> bool:
+    ''' Check for an internet connection. The check is made on first use rather than at import, and the result
+    reused for CONNECTION_TTL secs (CONNECTION_RETRY secs if not connected). Always False in offline mode.
+    '''
+
+    global _connected, _connected_checked
+
+    if _offline:
+        return False
+
+    with _connected_lock:
+        ttl = CONNECTION_TTL if _connected else CONNECTION_RETRY
+        if refresh or not _connected_checked or (time.monotonic() - _connected_checked) > ttl:
+            _connected = _probe_connection(hostname)
+            _connected_checked = time.monotonic()
+
+            _logger.info(f'Internet connection {"available" if _connected else "not available"}')
+
+        return _connected
+
+
+def set_offline(offline: bool = True) -> None:
+    ''' Disable (or re-enable) all live fetching without probing the network '''
+
+    global _offline
+
+    _offline = offline
+    _logger.info(f'Offline mode {"enabled" if offline else "disabled"}')
+
+
+def _probe_connection(hostname: str) -> bool:
     try:
         host = socket.gethostbyname(hostname)
         s = socket.create_connection((host, 80), 2)
@@ -30,30 +79,96 @@ def is_connected(hostname: str = 'google.com') -> bool:
         return True
 
 
-_connected = is_connected()
-
-
 def validate_ticker(ticker: str) -> bool:
+    from fetcher import source_yfinance as yf
+
     return yf.validate_ticker(ticker)
 
 
 def get_history_live(ticker: str, days: int = -1) -> pd.DataFrame:
-    if not _connected:
+    if not is_connected():
         raise ConnectionError('No internet connection')
 
-    global _elapsed
+    def fetch() -> pd.DataFrame:
+        # Throttle requests to help avoid being cut off by data provider
+        source = limiter.get_limiter(d.ACTIVE_HISTORYDATASOURCE)
+        source.acquire()
+
+        history = _get_history(ticker, days)
+        source.report(not history.empty, empty=history.empty)
 
-    # Throttle requests to help avoid being cut off by data provider
-    while (time.perf_counter() - _elapsed) < THROTTLE_FETCH:
-        time.sleep(THROTTLE_FETCH)
+        return history
 
-    _elapsed = time.perf_counter()
+    return _single_flight((d.ACTIVE_HISTORYDATASOURCE, 'history', ticker.upper(), days), fetch)
+
+
+def get_history_live_many(tickers: list[str], days: int = -1) -> dict[str, pd.DataFrame]:
+    ''' Fetch many histories, in grouped downloads where the data source supports them
+
+    :return: <dict> History of each ticker. Empty if not available.
+    '''
+
+    if not is_connected():
+        raise ConnectionError('No internet connection')
 
     if d.ACTIVE_HISTORYDATASOURCE == 'yfinance':
+        # Grouped downloads are throttled and reported per batch by the data source
+        from fetcher import source_yfinance as yf
+        histories = yf.get_history_batch(tickers, days=days)
+        _logger.info(f'Fetched {sum(not history.empty for history in histories.values())} of {len(histories)} histories from {d.ACTIVE_HISTORYDATASOURCE}')
+    else:
+        histories = {ticker.upper(): get_history_live(ticker, days=days) for ticker in tickers}
+
+    return histories
+
+
+async def get_history_live_async(ticker: str, days: int = -1) -> pd.DataFrame:
+    if not is_connected():
+        raise ConnectionError('No internet connection')
+
+    return await _fetch_async((d.ACTIVE_HISTORYDATASOURCE, 'history', ticker.upper(), days), d.ACTIVE_HISTORYDATASOURCE, _get_history, ticker, days)
+
+
+async def get_history_live_many_async(tickers: list[str], days: int = -1) -> dict[str, pd.DataFrame]:
+    ''' Fetch many histories concurrently, overlapping the network waits. Grouped downloads are used where the
+    data source supports them.
+
+    :return: <dict> History of each ticker. Empty if not available.
+    '''
+
+    if not is_connected():
+        raise ConnectionError('No internet connection')
+
+    tickers = list(dict.fromkeys(ticker.upper() for ticker in tickers))
+    histories = {}
+
+    if d.ACTIVE_HISTORYDATASOURCE == 'yfinance':
+        from fetcher import source_yfinance as yf
+        batches = [tickers[index:index + yf.HISTORY_BATCH] for index in range(0, len(tickers), yf.HISTORY_BATCH)]
+        results = await asyncio.gather(*[
+            _fetch_async((d.ACTIVE_HISTORYDATASOURCE, 'history_batch', tuple(batch), days), '', yf.get_history_batch, batch, days)
+            for batch in batches])
+
+        for result in results:
+            histories.update(result)
+    else:
+        results = await asyncio.gather(*[get_history_live_async(ticker, days=days) for ticker in tickers])
+        histories = dict(zip(tickers, results))
+
+    _logger.info(f'Fetched {sum(not history.empty for history in histories.values())} of {len(tickers)} histories from {d.ACTIVE_HISTORYDATASOURCE}')
+
+    return histories
+
+
+def _get_history(ticker: str, days: int) -> pd.DataFrame:
+    if d.ACTIVE_HISTORYDATASOURCE == 'yfinance':
+        from fetcher import source_yfinance as yf
         history = yf.get_history(ticker, days=days)
     elif d.ACTIVE_HISTORYDATASOURCE == 'marketdata':
+        from fetcher import source_marketdata as md
         history = md.get_history(ticker, days=days)
     elif d.ACTIVE_HISTORYDATASOURCE == 'quandl':
+        from fetcher import source_quandl as qd
         history = qd.get_history(ticker, days=days)
     else:
         raise ValueError('Invalid data source')
@@ -70,45 +185,97 @@ def get_history_live(ticker: str, days: int = -1) -> pd.DataFrame:
 
 
 def get_company_live(ticker: str) -> dict:
-    company = {}
+    def fetch() -> dict:
+        company = {}
 
-    try:
-        c = yf.get_company(ticker)
-        if c is not None:
-            company = c.info
-    except Exception as e:
-        _logger.warning(f'Yfinance exception for ticker {ticker}: {e}')
-    else:
-        company['market_cap'] = c.info.get('market_cap', 0)
+        source = limiter.get_limiter('yfinance')
+        source.acquire()
+
+        try:
+            from fetcher import source_yfinance as yf
+            c = yf.get_company(ticker)
+            if c is not None:
+                company = c.info
+        except Exception as e:
+            source.report(False, throttled=limiter.is_throttled(e))
+            _logger.warning(f'Yfinance exception for ticker {ticker}: {e}')
+        else:
+            source.report(bool(company), empty=not company)
+            company['market_cap'] = c.info.get('market_cap', 0)
 
-    return company
+        return company
+
+    return _single_flight(('yfinance', 'company', ticker.upper()), fetch)
 
 
 def get_option_expiry(ticker: str) -> tuple[str]:
-    if not _connected:
+    if not is_connected():
         raise ConnectionError('No internet connection')
 
-    if d.ACTIVE_OPTIONDATASOURCE == 'yfinance':
-        expiry = yf.get_option_expiry(ticker)
-    elif d.ACTIVE_OPTIONDATASOURCE == 'etrade':
-        expiry = et.get_option_expiry_etrade(ticker)
-    else:
-        raise ValueError('Invalid data source')
+    def fetch() -> tuple[str]:
+        limiter.get_limiter(d.ACTIVE_OPTIONDATASOURCE).acquire()
+
+        if d.ACTIVE_OPTIONDATASOURCE == 'yfinance':
+            from fetcher import source_yfinance as yf
+            expiry = yf.get_option_expiry(ticker)
+        elif d.ACTIVE_OPTIONDATASOURCE == 'etrade':
+            from fetcher import source_etrade as et
+            expiry = et.get_option_expiry(ticker)
+        else:
+            raise ValueError('Invalid data source')
+
+        _logger.debug(f'Expiries: {expiry}')
 
-    _logger.debug(f'Expiries: {expiry}')
+        return expiry
 
-    return expiry
+    return _single_flight((d.ACTIVE_OPTIONDATASOURCE, 'expiry', ticker.upper()), fetch)
 
 
 def get_option_chain(ticker: str, expiry: dt.datetime) -> pd.DataFrame:
-    if not _connected:
+    if not is_connected():
         raise ConnectionError('No internet connection')
 
-    chain = pd.DataFrame()
+    def fetch() -> pd.DataFrame:
+        source = limiter.get_limiter(d.ACTIVE_OPTIONDATASOURCE)
+        source.acquire()
+
+        chain = _get_option_chain(ticker, expiry)
+        source.report(not chain.empty, empty=chain.empty)
+
+        return chain
+
+    return _single_flight((d.ACTIVE_OPTIONDATASOURCE, 'chain', ticker.upper(), expiry), fetch)
+
+
+async def get_option_chain_async(ticker: str, expiry: dt.datetime) -> pd.DataFrame:
+    if not is_connected():
+        raise ConnectionError('No internet connection')
+
+    return await _fetch_async((d.ACTIVE_OPTIONDATASOURCE, 'chain', ticker.upper(), expiry), d.ACTIVE_OPTIONDATASOURCE, _get_option_chain, ticker, expiry)
+
+
+async def get_option_chains_many_async(chains: list[tuple[str, dt.datetime]]) -> dict[tuple[str, dt.datetime], pd.DataFrame]:
+    ''' Fetch many option chains concurrently, overlapping the network waits
+
+    :return: <dict> Chain of each (ticker, expiry). Empty if not available.
+    '''
+
+    if not is_connected():
+        raise ConnectionError('No internet connection')
+
+    chains = list(dict.fromkeys(chains))
+    results = await asyncio.gather(*[get_option_chain_async(ticker, expiry) for ticker, expiry in chains])
+
+    return dict(zip(chains, results))
+
+
+def _get_option_chain(ticker: str, expiry: dt.datetime) -> pd.DataFrame:
     if d.ACTIVE_OPTIONDATASOURCE == 'yfinance':
+        from fetcher import source_yfinance as yf
         chain = yf.get_option_chain(ticker, expiry)
     elif d.ACTIVE_OPTIONDATASOURCE == 'etrade':
-        chain = et.get_option_chain_etrade(ticker, expiry)
+        from fetcher import source_etrade as et
+        chain = et.get_option_chain(ticker, expiry)
     else:
         raise ValueError('Invalid data source')
 
@@ -117,10 +284,110 @@ def get_option_chain(ticker: str, expiry: dt.datetime) -> pd.DataFrame:
     return chain
 
 
+def get_flight_counts() -> flight_type:
+    ''' Get the number of live requests made through the single-flight layer, and how many of them were
+    coalesced into an identical request already in flight
+
+    :return: <flight_type> Counts since the last reset
+    '''
+
+    with _flights_lock:
+        return flight_type(_flight_requests, _flight_coalesced)
+
+
+def reset_flight_counts() -> None:
+    global _flight_requests, _flight_coalesced
+
+    with _flights_lock:
+        _flight_requests = 0
+        _flight_coalesced = 0
+
+
+def _single_flight(key: tuple, function: Callable) -> any:
+    ''' Call a fetch function, unless an identical request (same source, method and arguments) is already in
+    flight on another thread, in which case wait for and share its result. Followers get a copy so that
+    callers may modify what they are given.
+    '''
+
+    global _flight_requests, _flight_coalesced
+
+    with _flights_lock:
+        _flight_requests += 1
+        future = _flights.get(key)
+        leader = future is None
+        if leader:
+            future = futures.Future()
+            _flights[key] = future
+        else:
+            _flight_coalesced += 1
+            _logger.debug(f'Coalesced request {key}')
+
+    if leader:
+        try:
+            future.set_result(function())
+        except Exception as e:
+            future.set_exception(e)
+        finally:
+            with _flights_lock:
+                del _flights[key]
+
+        return future.result()
+
+    return copy.copy(future.result())
+
+
+_async_states: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+
+
+async def _fetch_async(key: tuple, source: str, function: Callable, *args) -> any:
+    ''' Run a blocking fetch on a worker thread, bounded by ASYNC_CONCURRENCY and throttled by the data source's
+    limiter, which is told the outcome once (none if source is empty, for functions that throttle themselves).
+    A request identical to one already in flight waits on that fetch rather than making its own. Coalesced
+    callers share the result, so must copy it before modifying.
+    '''
+
+    global _flight_requests, _flight_coalesced
+
+    # Semaphores and tasks belong to a single event loop, so keep them per loop
+    loop = asyncio.get_running_loop()
+    if loop not in _async_states:
+        _async_states[loop] = (asyncio.Semaphore(ASYNC_CONCURRENCY), {})
+
+    semaphore, inflight = _async_states[loop]
+
+    with _flights_lock:
+        _flight_requests += 1
+        if key in inflight:
+            _flight_coalesced += 1
+
+    if key not in inflight:
+        async def fetch() -> any:
+            async with semaphore:
+                if not source:
+                    return await asyncio.to_thread(function, *args)
+
+                source_ = limiter.get_limiter(source)
+                await source_.acquire_async()
+
+                result = await asyncio.to_thread(function, *args)
+                source_.report(not result.empty, empty=result.empty)
+
+                return result
+
+        task = asyncio.ensure_future(fetch())
+        task.add_done_callback(lambda _: inflight.pop(key, None))
+        inflight[key] = task
+
+    # Shield the shared task so that one caller being cancelled does not cancel the others
+    return await asyncio.shield(inflight[key])
+
+
 def get_ratings(ticker: str) -> list[int]:
-    if not _connected:
+    if not is_connected():
         raise ConnectionError('No internet connection')
 
+    from fetcher import source_yfinance as yf
+
     ratings = yf.get_ratings(ticker)
     if not ratings:
         ratings = [3.0]
@@ -129,9 +396,11 @@ def get_ratings(ticker: str) -> list[int]:
 
 
 def get_treasury_rate(ticker: str) -> float:
-    if not _connected:
+    if not is_connected():
         raise ConnectionError('No internet connection')
 
+    from fetcher import source_quandl as qd
+
     return qd.get_treasury_rate(ticker)
 
 
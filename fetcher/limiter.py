@@ -0,0 +1,171 @@
+import time
+import asyncio
+import threading
+
+import fetcher as f
+from utils import logger
+
+
+_logger = logger.get_logger()
+
+BACKOFF_FAILURES = 3    # Consecutive failed requests before slowing down
+BACKOFF_EMPTY = 10      # Consecutive empty responses before slowing down (some are delisted tickers)
+BACKOFF_FACTOR = 2.0    # Rate divisor applied on each backoff
+BACKOFF_MAX = 32.0      # Largest total rate divisor
+RECOVERY_FACTOR = 1.1   # Rate divisor removed on each successful response
+
+
+class RateLimiter:
+    '''
+    Thread-safe token bucket for a single data source. Tokens refill at 'rate' per second up to 'burst', and
+    each request takes one, waiting for it if the bucket is empty. Throttled (HTTP 429) responses, or a run of
+    failed or empty requests, divide the rate by BACKOFF_FACTOR; successful responses gradually restore it.
+    Providers often throttle by returning empty responses, but a delisted ticker returns one too, so a longer
+    run of them is needed before slowing down.
+
+    :param name: Name of the data source
+    :param rate: <float> Sustained requests per second
+    :param burst: <int> Requests allowed back-to-back after an idle period
+    '''
+
+    def __init__(self, name: str, rate: float, burst: int = 1):
+        if rate <= 0.0:
+            raise ValueError('Invalid rate')
+        if burst < 1:
+            raise ValueError('Invalid burst')
+
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+        self.penalty = 1.0
+        self.failures = 0
+        self.empties = 0
+
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return f'<RateLimiter {self.name} ({self.current_rate:.2f}/s, burst={self.burst})>'
+
+    @property
+    def current_rate(self) -> float:
+        return self.rate / self.penalty
+
+    def acquire(self, tokens: int = 1) -> float:
+        ''' Block until a request (or a batch making 'tokens' requests) may be made
+
+        :return: <float> Secs waited
+        '''
+
+        delay = self._reserve(tokens)
+        if delay > 0.0:
+            time.sleep(delay)
+
+        return delay
+
+    async def acquire_async(self, tokens: int = 1) -> float:
+        ''' Wait, without blocking the event loop, until a request may be made
+
+        :return: <float> Secs waited
+        '''
+
+        delay = self._reserve(tokens)
+        if delay > 0.0:
+            await asyncio.sleep(delay)
+
+        return delay
+
+    def report(self, success: bool, throttled: bool = False, empty: bool = False) -> None:
+        ''' Record the outcome of a request to adapt the rate. Report each request once, after any retries '''
+
+        with self._lock:
+            if success:
+                self.failures = 0
+                self.empties = 0
+                self.penalty = max(self.penalty / RECOVERY_FACTOR, 1.0)
+            elif empty:
+                self.empties += 1
+                if self.empties >= BACKOFF_EMPTY:
+                    self.empties = 0
+                    self._slow_down()
+            else:
+                self.failures += 1
+                if throttled or self.failures >= BACKOFF_FAILURES:
+                    self.failures = 0
+                    self._slow_down()
+
+    def backoff(self, error: Exception | None = None) -> float:
+        ''' Wait for the next token before retrying. A throttled attempt slows the rate straight away, but is not
+        counted as the request's outcome, which is reported once when the request completes
+
+        :return: <float> Secs waited
+        '''
+
+        if is_throttled(error):
+            with self._lock:
+                self._slow_down()
+
+        return self.acquire()
+
+    def _slow_down(self) -> None:
+        ''' Divide the rate by BACKOFF_FACTOR. Call with the lock held '''
+
+        self.penalty = min(self.penalty * BACKOFF_FACTOR, BACKOFF_MAX)
+        self._tokens = min(self._tokens, 0.0)  # Pause before the next request
+
+        _logger.warning(f'Backing off {self.name} requests to {self.current_rate:.2f}/s')
+
+    def _reserve(self, tokens: int = 1) -> float:
+        ''' Take tokens, going into debt if not enough are available
+
+        :return: <float> Secs until the token is covered
+        '''
+
+        with self._lock:
+            now = time.monotonic()
+            rate = self.current_rate
+            self._tokens = min(self._tokens + (now - self._updated) * rate, float(self.burst))
+            self._updated = now
+            self._tokens -= float(tokens)
+
+            return max(-self._tokens / rate, 0.0)
+
+
+def is_throttled(error: Exception | None) -> bool:
+    if error is None:
+        return False
+
+    message = str(error).lower()
+    return '429' in message or 'too many requests' in message or 'rate limit' in message
+
+
+_limiters: dict[str, RateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(source: str) -> RateLimiter:
+    ''' Get the shared limiter for a data source, creating it from fetcher.RATE_LIMITS if needed '''
+
+    with _limiters_lock:
+        if source not in _limiters:
+            rate, burst = f.RATE_LIMITS.get(source, f.RATE_LIMIT_DEFAULT)
+            _limiters[source] = RateLimiter(source, rate, burst)
+
+        return _limiters[source]
+
+
+if __name__ == '__main__':
+    limiter = RateLimiter('test', rate=20.0, burst=5)
+
+    def work():
+        for _ in range(10):
+            limiter.acquire()
+
+    tic = time.perf_counter()
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    [thread.start() for thread in threads]
+    [thread.join() for thread in threads]
+    toc = time.perf_counter()
+
+    print(f'40 requests in {toc-tic:.2f}s (expected {(40 - 5) / 20.0:.2f}s)')
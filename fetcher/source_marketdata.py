@@ -7,6 +7,7 @@ from pathlib import Path
 import configparser
 import datetime as dt
 import requests
+from requests.adapters import HTTPAdapter
 import json
 
 import pandas as pd
@@ -17,6 +18,9 @@ from utils import logger
 
 _logger = logger.get_logger()
 
+POOL_SIZE = 10   # Keep-alive connections held open to the API
+TIMEOUT = 10.0   # Secs to wait for a response
+
 
 # Credentials
 CREDENTIALS = Path(__file__).resolve().parent / 'marketdata.ini'
@@ -25,6 +29,11 @@ config.read(CREDENTIALS)
 api_key = config['DEFAULT']['APIKEY']
 HEADER = {'Authorization': f'Token {api_key}'}
 
+# One shared session so that requests reuse pooled keep-alive connections rather than a new TCP+TLS handshake each
+_session = requests.Session()
+_session.headers.update(HEADER)
+_session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE))
+
 
 def get_history(ticker: int, days: int, resolution: str = 'D', index=False) -> pd.DataFrame:
     """
@@ -49,7 +58,7 @@ def get_history(ticker: int, days: int, resolution: str = 'D', index=False) -> p
 
     path = f'{resolution}/{ticker}/?countback={days}&dateformat=unix'
     final_url = url + path
-    response = requests.get(final_url, headers=HEADER)
+    response = _session.get(final_url, timeout=TIMEOUT)
     code = response.status_code
 
     history = pd.DataFrame()
@@ -102,7 +111,7 @@ def get_option_chain_live(symbol):
     headers = {'Authorization': api_key.API_KEY}
     path = f'{symbol}/??dateformat=timestamp'
     final_url = url + path
-    chain_expr = requests.get(final_url, headers=headers)
+    chain_expr = _session.get(final_url, headers=headers, timeout=TIMEOUT)
 
     return chain_expr.text
 
@@ -124,7 +133,7 @@ def get_options_chain_from(symbol, from_date):
     path = f'{symbol}/?date={from_date}&dateformat=timestamp'
 
     final_url = url + path
-    chain_expr = requests.get(final_url, headers=headers)
+    chain_expr = _session.get(final_url, headers=headers, timeout=TIMEOUT)
 
     return chain_expr.text
 
@@ -146,7 +155,7 @@ def get_options_chain_expr(symbol, expiry_date):
     path = f'{symbol}/?expiration={expiry_date}&dateformat=timestamp'
 
     final_url = url + path
-    chain_expr = requests.get(final_url, headers=headers)
+    chain_expr = _session.get(final_url, headers=headers, timeout=TIMEOUT)
 
     return chain_expr.text
 
@@ -166,7 +175,7 @@ def get_options_chain_weekly(symbol):
     path = f'{symbol}/?monthly=false&dateformat=timestamp'
 
     final_url = url + path
-    chain_expr = requests.get(final_url, headers=headers)
+    chain_expr = _session.get(final_url, headers=headers, timeout=TIMEOUT)
     return chain_expr.text
 
 
@@ -184,7 +193,7 @@ def get_options_chain_monthly(symbol):
     path = f'{symbol}/?monthly=true&dateformat=timestamp'
 
     final_url = url + path
-    chain_expr = requests.get(final_url, headers=headers)
+    chain_expr = _session.get(final_url, headers=headers, timeout=TIMEOUT)
     return chain_expr.text
 
 
@@ -203,7 +212,7 @@ def get_options_chain_year(symbol, year):
     path = f'{symbol}/?year={year}&dateformat=timestamp'
 
     final_url = url + path
-    chain_expr = requests.get(final_url, headers=headers)
+    chain_expr = _session.get(final_url, headers=headers, timeout=TIMEOUT)
     return chain_expr.text
 
 
@@ -222,7 +231,7 @@ def get_options_chain_strike(symbol, strike):
     path = f'{symbol}/?strike={strike}&dateformat=timestamp'
 
     final_url = url + path
-    chain_expr = requests.get(final_url, headers=headers)
+    chain_expr = _session.get(final_url, headers=headers, timeout=TIMEOUT)
     return chain_expr.text
 
 
@@ -255,7 +264,7 @@ def get_hist_quotes_from_to(symbol_list, from_date, to_date):
         final_url = url + path
         # Make the request
 
-        response = requests.get(final_url, headers=headers)
+        response = _session.get(final_url, headers=headers, timeout=TIMEOUT)
         # Extract the data from the response
         data = response.json()
 
@@ -310,7 +319,7 @@ def get_hist_quotes_from(symbol_list, from_date):
         final_url = url + path
         # Make the request
 
-        response = requests.get(final_url, headers=headers)
+        response = _session.get(final_url, headers=headers, timeout=TIMEOUT)
         # Extract the data from the response
         data = response.json()
 
@@ -361,7 +370,7 @@ def get_options_quote_live(symbol, expiry_date, option_type, strike_price):
     path = f'{option_symbol}/?dateformat=timestamp'
     final_url = url + path
 
-    chain_response = requests.get(final_url, headers=headers)
+    chain_response = _session.get(final_url, headers=headers, timeout=TIMEOUT)
     return chain_response.text
 
     # print(final_url)
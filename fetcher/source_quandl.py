@@ -1,4 +1,3 @@
-import time
 import datetime as dt
 import configparser
 from pathlib import Path
@@ -8,10 +7,12 @@ import pandas as pd
 
 import fetcher as f
 import data as d
+from fetcher import limiter
 from utils import logger
 
 
 _logger = logger.get_logger()
+_limiter = limiter.get_limiter('quandl')
 
 
 # Credentials
@@ -40,10 +41,10 @@ def get_history(ticker: str, days: int = -1) -> pd.DataFrame:
                 if history is None:
                     history = pd.DataFrame()
                     _logger.warning(f'{d.ACTIVE_HISTORYDATASOURCE} history for {ticker} is None ({retry+1})')
-                    time.sleep(f.THROTTLE_ERROR)
+                    _limiter.backoff()
                 elif history.empty:
                     _logger.info(f'{d.ACTIVE_HISTORYDATASOURCE} history for {ticker} is empty ({retry+1})')
-                    time.sleep(f.THROTTLE_ERROR)
+                    _limiter.backoff()
                 else:
                     history = history.reset_index()
 
@@ -57,7 +58,7 @@ def get_history(ticker: str, days: int = -1) -> pd.DataFrame:
             except Exception as e:
                 _logger.error(f'Exception: {e}: Retry {retry} to fetch history of {ticker} from {d.ACTIVE_HISTORYDATASOURCE}')
                 history = pd.DataFrame()
-                time.sleep(f.THROTTLE_ERROR)
+                _limiter.backoff(e)
 
     return history
 
@@ -3,26 +3,31 @@ yfinance: https://github.com/ranaroussi/yfinance
 '''
 
 import time
+import threading
+import collections
 import datetime as dt
 
 import pandas as pd
 import yfinance as yf
 
 import data as d
+from fetcher import limiter
 from utils import ui, logger
 
 
 YAHOO_INFO_DISABLED = True
 
-THROTTLE_FETCH = 0.05  # Min secs between calls to fetch pricing
-THROTTLE_ERROR = 1.00  # Min secs between calls after error
 RETRIES = 2            # Number of fetch retries after error
+HISTORY_BATCH = 100    # Symbols per multi-ticker history download (Yahoo handles 50-200 well)
+COMPANY_CACHE = 256    # Max Ticker objects held in the company cache
+COMPANY_TTL = 900.0    # Secs a cached Ticker object remains valid
 
 
 _logger = logger.get_logger()
+_limiter = limiter.get_limiter('yfinance')
 
-_last_company: pd.DataFrame = pd.DataFrame()
-_last_ticker: str = ''
+_companies: collections.OrderedDict[str, tuple[float, yf.Ticker]] = collections.OrderedDict()
+_companies_lock = threading.Lock()
 
 
 def validate_ticker(ticker: str) -> bool:
@@ -38,22 +43,35 @@ def validate_ticker(ticker: str) -> bool:
     return valid
 
 
-def get_company(ticker: str) -> yf.Ticker:
-    global _last_company, _last_ticker
+def get_company(ticker: str) -> yf.Ticker | None:
+    ''' Get the Ticker object of a company, from a bounded LRU cache shared by all threads if fetched within
+    COMPANY_TTL secs
+    '''
 
-    if ticker == _last_ticker:
-        company = _last_company
-        _logger.info(f'Using cached company information for {ticker} from Yahoo')
+    ticker = ticker.upper()
+    now = time.monotonic()
+
+    with _companies_lock:
+        cached = _companies.get(ticker)
+        if cached is not None and now - cached[0] < COMPANY_TTL:
+            _companies.move_to_end(ticker)
+            _logger.info(f'Using cached company information for {ticker} from Yahoo')
+
+            return cached[1]
+
+    try:
+        company = yf.Ticker(ticker)
+    except Exception as e:
+        company = None
+        _logger.error(f'yfinance exception creating Ticker: {e}: {ticker}')
     else:
-        try:
-            company = yf.Ticker(ticker)
-        except Exception as e:
-            _logger.error(f'yfinance exception creating Ticker: {e}: {ticker}')
-        else:
-            _logger.info(f'Fetched company information for {ticker} from Yahoo')
+        _logger.info(f'Fetched company information for {ticker} from Yahoo')
 
-    _last_company = company
-    _last_ticker = ticker
+        with _companies_lock:
+            _companies[ticker] = (now, company)
+            _companies.move_to_end(ticker)
+            while len(_companies) > COMPANY_CACHE:
+                _companies.popitem(last=False)
 
     return company
 
@@ -79,14 +97,14 @@ def get_history(ticker: str, days: int = -1) -> pd.DataFrame:
                     if history is None:
                         history = pd.DataFrame()
                         _logger.warning(f'{d.ACTIVE_HISTORYDATASOURCE} history for {ticker} is None ({retry+1})')
-                        time.sleep(THROTTLE_ERROR)
+                        _limiter.backoff()
                     elif history.empty:
                         _logger.warning(f'{d.ACTIVE_HISTORYDATASOURCE} history for {ticker} is empty ({retry+1})')
-                        time.sleep(THROTTLE_ERROR)
+                        _limiter.backoff()
                     elif history.shape[1] == 0:
                         history = pd.DataFrame()
                         _logger.warning(f'{d.ACTIVE_HISTORYDATASOURCE} history for {ticker} has no columns ({retry+1})')
-                        time.sleep(THROTTLE_ERROR)
+                        _limiter.backoff()
                     else:
                         days = history.shape[0]
                         history = history.reset_index()
@@ -101,11 +119,75 @@ def get_history(ticker: str, days: int = -1) -> pd.DataFrame:
                 except Exception as e:
                     _logger.error(f'Error during attempt {retry+1} to fetch history of {ticker} from {d.ACTIVE_HISTORYDATASOURCE}: {e}')
                     history = pd.DataFrame()
-                    time.sleep(THROTTLE_ERROR)
+                    _limiter.backoff(e)
 
     return history
 
 
+def get_history_batch(tickers: list[str], days: int = -1) -> dict[str, pd.DataFrame]:
+    ''' Fetch the histories of many tickers with one grouped download per HISTORY_BATCH symbols
+
+    :return: <dict> History of each ticker, in the same format as get_history(). Empty if not available.
+    '''
+
+    tickers = list(dict.fromkeys(ticker.upper() for ticker in tickers))
+    histories = {ticker: pd.DataFrame() for ticker in tickers}
+
+    if days < 0:
+        days = 7300  # 20 years
+
+    if days > 0:
+        end = dt.datetime.today()
+        start = end - dt.timedelta(days=days)
+
+        for index in range(0, len(tickers), HISTORY_BATCH):
+            batch = tickers[index:index + HISTORY_BATCH]
+
+            # Yahoo serves a grouped download with one request per symbol, so charge the limiter for each
+            _limiter.acquire(tokens=len(batch))
+
+            error = None
+            for retry in range(RETRIES):
+                try:
+                    error = None
+                    download = yf.download(batch, start=start, end=end, interval='1d', group_by='ticker', auto_adjust=True,
+                                           back_adjust=True, threads=False, progress=False, timeout=10.0)
+                except Exception as e:
+                    _logger.error(f'Error during attempt {retry+1} to fetch history of {len(batch)} tickers from {d.ACTIVE_HISTORYDATASOURCE}: {e}')
+                    error = e
+                    _limiter.backoff(e)
+                else:
+                    if download is None or download.empty:
+                        _logger.warning(f'{d.ACTIVE_HISTORYDATASOURCE} history for {len(batch)} tickers is empty ({retry+1})')
+                        _limiter.backoff()
+                        continue
+
+                    # Single-symbol downloads are not grouped by ticker
+                    if not isinstance(download.columns, pd.MultiIndex):
+                        download = pd.concat({batch[0]: download}, axis=1)
+
+                    for ticker in batch:
+                        if ticker in download.columns.get_level_values(0):
+                            history = download[ticker].dropna(how='all')
+                            if not history.empty:
+                                # Make colums consistent with Postgres column names
+                                history = history.reset_index()
+                                history.columns = history.columns.str.lower()
+                                history = history.sort_values('date', ascending=True).reset_index(drop=True)
+                                histories[ticker] = history
+
+                    _logger.info(f'Fetched live history of {len(batch)} tickers starting {start:%Y-%m-%d}')
+                    break
+
+            # One outcome per batch, after any retries
+            if any(not histories[ticker].empty for ticker in batch):
+                _limiter.report(True)
+            else:
+                _limiter.report(False, empty=error is None)
+
+    return histories
+
+
 def get_option_expiry(ticker: str) -> tuple[str]:
     expiry = ('',)
     for retry in range(RETRIES):
@@ -115,7 +197,7 @@ def get_option_expiry(ticker: str) -> tuple[str]:
             break
         else:
             _logger.warning(f'Retry {retry} to fetch option expiry for {ticker} using yfinance')
-            time.sleep(THROTTLE_ERROR)
+            _limiter.backoff()
 
     return expiry
 
@@ -125,10 +207,10 @@ def get_option_chain(ticker: str, expiry: dt.datetime) -> pd.DataFrame:
     for retry in range(RETRIES):
         company = get_company(ticker)
         if company is not None:
-            chain_c = company.option_chain(expiry.strftime(ui.DATE_FORMAT_YMD)).calls
-            chain_c['type'] = 'call'
-            chain_p = company.option_chain(expiry.strftime(ui.DATE_FORMAT_YMD)).puts
-            chain_p['type'] = 'put'
+            # One request per expiry returns both sides of the chain
+            options = company.option_chain(expiry.strftime(ui.DATE_FORMAT_YMD))
+            chain_c = options.calls.assign(type='call')
+            chain_p = options.puts.assign(type='put')
             chain = pd.concat([chain_c, chain_p], axis=0)
 
             order = [
@@ -146,7 +228,7 @@ def get_option_chain(ticker: str, expiry: dt.datetime) -> pd.DataFrame:
             break
         else:
             _logger.warning(f'Retry {retry} to fetch option chain for {ticker}')
-            time.sleep(THROTTLE_ERROR)
+            _limiter.backoff()
 
     return chain
 
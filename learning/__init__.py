@@ -0,0 +1,14 @@
+from dataclasses import dataclass
+
+from utils.ui import RangeValue
+
+
+# Kept apart from lstm_base so that parameters can be edited without importing keras/TensorFlow
+@dataclass
+class Parameters:
+    EPOCHS: RangeValue = RangeValue(20, 5, 100)
+    BATCH_SIZE: RangeValue = RangeValue(32, 5, 100)
+    PCT_TRAINING: RangeValue = RangeValue(0.15, 0.10, 0.50)
+    PCT_VALIDATION: RangeValue = RangeValue(0.15, 0.10, 0.50)
+    NEURONS: RangeValue = RangeValue(50, 10, 100)
+    DROPOUT: RangeValue = RangeValue(0.20, 0.01, 0.50)
@@ -1,5 +1,4 @@
 import os
-from dataclasses import dataclass
 from abc import ABC
 import abc
 
@@ -15,7 +14,7 @@ import pandas as pd
 
 from data import store as store
 from base import Threaded
-from utils.ui import RangeValue
+from learning import Parameters
 from utils import logger
 
 
@@ -24,16 +23,6 @@ _logger = logger.get_logger()
 CACHE_FILE: str = './cache/model.h5'
 
 
-@dataclass
-class Parameters:
-    EPOCHS: RangeValue = RangeValue(20, 5, 100)
-    BATCH_SIZE: RangeValue = RangeValue(32, 5, 100)
-    PCT_TRAINING: RangeValue = RangeValue(0.15, 0.10, 0.50)
-    PCT_VALIDATION: RangeValue = RangeValue(0.15, 0.10, 0.50)
-    NEURONS: RangeValue = RangeValue(50, 10, 100)
-    DROPOUT: RangeValue = RangeValue(0.20, 0.01, 0.50)
-
-
 class LSTM_Base(ABC, Threaded):
     def __init__(self, ticker: str, history: pd.DataFrame, inputs: list[str], days: int, parameters: Parameters):
         if not store.is_ticker(ticker):
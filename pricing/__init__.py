@@ -4,3 +4,4 @@ from enum import IntEnum
 class PricingType(IntEnum):
     BlackScholes = 0
     MonteCarlo = 1
+    Binomial = 2
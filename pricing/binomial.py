@@ -0,0 +1,275 @@
+import datetime as dt
+
+import numpy as np
+
+import pricing
+from .context import MarketContext
+from .pricing import Pricing
+from utils import logger
+
+_logger = logger.get_logger()
+
+
+class Binomial(Pricing):
+    '''
+    This class uses a Cox-Ross-Rubinstein binomial tree to calculate prices for American (or European) Call and Put options.
+
+    Backward induction is vectorized across the nodes of each tree level, and whole arrays of spot prices, strikes,
+    maturities and volatilities are priced together in one pass through the tree.
+
+    :param ticker: Ticker of the Underlying Stock asset, ex. 'AAPL', 'TSLA', 'GOOGL', etc.
+    :param expiry_date: <datetime.date> ExpiryDate for the option -must be in the future
+    :param strike: <float> Strike price of the option. This is the price option holder plans to
+    buy underlying asset (for call option) or sell underlying asset (for put option).
+    :param dividend: <float> If the underlying asset is paying dividend to stock-holders.
+    :param context: <MarketContext> Optional shared market data snapshot. Fetched per pricer if not provided.
+    :param steps: <int> Number of time steps in the tree
+    :param american: <bool> Allow early exercise. Set False to price European options.
+    '''
+
+    STEPS = 200                # Default number of time steps in the tree
+    VOLATILITY_BUMP = 0.01     # Absolute volatility bump for vega
+    RATE_BUMP = 0.0001         # Absolute rate bump for rho
+
+    def __init__(self, ticker: str, expiry: dt.datetime, strike: float, dividend: float=0.0, context: MarketContext | None = None, steps: int = STEPS, american: bool = True):
+        if steps < 2:
+            raise ValueError('Invalid number of steps')
+
+        super().__init__(ticker, expiry, strike, dividend=dividend, context=context)
+
+        self.name = pricing.PricingType.Binomial
+        self.steps = steps
+        self.american = american
+
+    def calculate_price(self, spot_price: float = -1.0, time_to_maturity: float = -1.0, volatility: float = -1.0) -> tuple[float, float]:
+        ''' Calculate Call and Put option prices by backward induction through the tree.
+        At each node the option value is the discounted risk-neutral expectation of its two children,
+        or the exercise value if higher (American options only):
+
+            u = exp(σ√Δt), d = 1/u, p = (exp((r−q)Δt) − d) / (u − d)
+            V = max(exp(−rΔt) * (p*Vu + (1−p)*Vd), Payoff)
+
+        :return: <float>, <float> Calculated price of Call & Put options
+        '''
+
+        price_call, price_put = self.calculate_price_table(spot_price, time_to_maturity, volatility)
+
+        self.price_call = float(price_call)
+        self.price_put = float(price_put)
+
+        return self.price_call, self.price_put
+
+    def calculate_price_table(self,
+                              spot_price: np.ndarray | float,
+                              time_to_maturity: np.ndarray | float,
+                              volatility: np.ndarray | float = -1.0,
+                              strike: np.ndarray | float = -1.0) -> tuple[np.ndarray, np.ndarray]:
+        ''' Calculate Call and Put option prices for arrays of spot prices, times to maturity, volatilities and strikes.
+        All inputs are broadcast against each other and priced together in one pass through the tree.
+        Strikes <= 0.0 are replaced with the pricer's strike price.
+
+        :return: <ndarray>, <ndarray> Calculated prices of Call & Put options
+        '''
+
+        spot_price, time_to_maturity, volatility = self._prepare_inputs(spot_price, time_to_maturity, volatility)
+        strike = np.asarray(strike, dtype=float)
+        strike = np.where(strike > 0.0, strike, self.strike_price)
+
+        call, put = self._calculate_tree(spot_price, strike, time_to_maturity, volatility, self.risk_free_rate)
+
+        return call[0], put[0]
+
+    def calculate_delta(self, spot_price: float = -1.0, time_to_maturity: float = -1.0, volatility: float = -1.0) -> tuple[float, float]:
+        ''' Calculate Call and Put option delta from the first level of the tree
+
+            delta = (Vu − Vd) / (S*u − S*d)
+
+        :return: <float>, <float> Calculated delta of Call & Put options
+        '''
+
+        spot_price, time_to_maturity, volatility = self._prepare_inputs(spot_price, time_to_maturity, volatility)
+        call, put = self._calculate_tree(spot_price, self.strike_price, time_to_maturity, volatility, self.risk_free_rate)
+        up, down = self._calculate_moves(time_to_maturity, volatility)
+
+        change = spot_price * (up - down)
+        self.delta_call = float((call[1][..., 1] - call[1][..., 0]) / change)
+        self.delta_put = float((put[1][..., 1] - put[1][..., 0]) / change)
+
+        return self.delta_call, self.delta_put
+
+    def calculate_gamma(self, spot_price: float = -1.0, time_to_maturity: float = -1.0, volatility: float = -1.0) -> tuple[float, float]:
+        ''' Calculate Call and Put option gamma from the second level of the tree
+
+            gamma = ((Vuu − Vud) / (S*u² − S) − (Vud − Vdd) / (S − S*d²)) / (0.5 * (S*u² − S*d²))
+
+        :return: <float>, <float> Calculated gamma of Call & Put options
+        '''
+
+        spot_price, time_to_maturity, volatility = self._prepare_inputs(spot_price, time_to_maturity, volatility)
+        call, put = self._calculate_tree(spot_price, self.strike_price, time_to_maturity, volatility, self.risk_free_rate)
+        up, down = self._calculate_moves(time_to_maturity, volatility)
+
+        high = spot_price * up ** 2
+        low = spot_price * down ** 2
+
+        def gamma(values: np.ndarray) -> float:
+            upper = (values[..., 2] - values[..., 1]) / (high - spot_price)
+            lower = (values[..., 1] - values[..., 0]) / (spot_price - low)
+            return float((upper - lower) / (0.5 * (high - low)))
+
+        self.gamma_call = gamma(call[2])
+        self.gamma_put = gamma(put[2])
+
+        return self.gamma_call, self.gamma_put
+
+    def calculate_theta(self, spot_price: float = -1.0, time_to_maturity: float = -1.0, volatility: float = -1.0) -> tuple[float, float]:
+        ''' Calculate Call and Put option theta from the middle node of the second level of the tree
+
+            theta = (Vud − V) / (2Δt)
+
+        :return: <float>, <float> Calculated theta (per day) of Call & Put options
+        '''
+
+        spot_price, time_to_maturity, volatility = self._prepare_inputs(spot_price, time_to_maturity, volatility)
+        call, put = self._calculate_tree(spot_price, self.strike_price, time_to_maturity, volatility, self.risk_free_rate)
+
+        elapsed = 2.0 * time_to_maturity / self.steps
+        self.theta_call = float((call[2][..., 1] - call[0]) / elapsed / 365.0)
+        self.theta_put = float((put[2][..., 1] - put[0]) / elapsed / 365.0)
+
+        return self.theta_call, self.theta_put
+
+    def calculate_vega(self, spot_price: float = -1.0, time_to_maturity: float = -1.0, volatility: float = -1.0) -> tuple[float, float]:
+        ''' Calculate Call and Put option vega by central difference on the volatility
+
+        :return: <float>, <float> Calculated vega (per 1% volatility) of Call & Put options
+        '''
+
+        spot_price, time_to_maturity, volatility = self._prepare_inputs(spot_price, time_to_maturity, volatility)
+        bump = np.minimum(self.VOLATILITY_BUMP, volatility / 2.0)
+
+        volatilities = np.array([volatility - bump, volatility + bump])
+        call, put = self._calculate_tree(spot_price, self.strike_price, time_to_maturity, volatilities, self.risk_free_rate)
+
+        self.vega_call = float((call[0][1] - call[0][0]) / (2.0 * bump) / 100.0)
+        self.vega_put = float((put[0][1] - put[0][0]) / (2.0 * bump) / 100.0)
+
+        return self.vega_call, self.vega_put
+
+    def calculate_rho(self, spot_price: float = -1.0, time_to_maturity: float = -1.0, volatility: float = -1.0) -> tuple[float, float]:
+        ''' Calculate Call and Put option rho by central difference on the risk-free rate
+
+        :return: <float>, <float> Calculated rho (per 1% rate) of Call & Put options
+        '''
+
+        spot_price, time_to_maturity, volatility = self._prepare_inputs(spot_price, time_to_maturity, volatility)
+        bump = self.RATE_BUMP
+
+        rates = np.array([self.risk_free_rate - bump, self.risk_free_rate + bump])
+        call, put = self._calculate_tree(spot_price, self.strike_price, time_to_maturity, volatility, rates)
+
+        self.rho_call = float((call[0][1] - call[0][0]) / (2.0 * bump) / 100.0)
+        self.rho_put = float((put[0][1] - put[0][0]) / (2.0 * bump) / 100.0)
+
+        return self.rho_call, self.rho_put
+
+    def _calculate_moves(self, time_to_maturity: np.ndarray, volatility: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        up = np.exp(volatility * np.sqrt(time_to_maturity / self.steps))
+        return up, 1.0 / up
+
+    def _calculate_tree(self,
+                        spot_price: np.ndarray,
+                        strike: np.ndarray | float,
+                        time_to_maturity: np.ndarray,
+                        volatility: np.ndarray,
+                        risk_free_rate: np.ndarray | float) -> tuple[list[np.ndarray], list[np.ndarray]]:
+        ''' Backward induction through the tree for every (broadcast) input at once.
+        Node j of level i holds the asset price S*u^(2j−i), so each level is a strided slice of one
+        precomputed column of powers of u. Nodes run along the first axis and contracts along the second,
+        so each level update is a handful of whole-array operations.
+
+        :return: <list>, <list> Call & Put option values at levels 0, 1 and 2 of the tree
+        '''
+
+        spot_price, strike, time_to_maturity, volatility, risk_free_rate = np.broadcast_arrays(spot_price, strike, time_to_maturity, volatility, risk_free_rate)
+        shape = spot_price.shape
+        steps = self.steps
+
+        spot_price = spot_price.reshape(1, -1)
+        strike = strike.reshape(1, -1)
+        time_to_maturity = time_to_maturity.reshape(1, -1)
+        volatility = volatility.reshape(1, -1)
+        risk_free_rate = risk_free_rate.reshape(1, -1)
+
+        delta_t = time_to_maturity / steps
+        up, down = self._calculate_moves(time_to_maturity, volatility)
+        probability = (np.exp((risk_free_rate - self.dividend) * delta_t) - down) / (up - down)
+        probability = np.clip(probability, 0.0, 1.0)
+        discount = np.exp(-risk_free_rate * delta_t)
+        weight_up = discount * probability
+        weight_down = discount * (1.0 - probability)
+
+        # Exercise values for every asset price in the tree
+        prices = spot_price * up ** np.arange(-steps, steps + 1)[:, np.newaxis]
+        exercise_call = prices - strike
+        exercise_put = strike - prices
+
+        # Early exercise of a call is never optimal without a dividend
+        american_call = self.american and self.dividend > 0.0
+        american_put = self.american
+
+        # Payoffs at expiry
+        call = np.maximum(exercise_call[0::2], 0.0)
+        put = np.maximum(exercise_put[0::2], 0.0)
+
+        calls = [np.empty(0)] * 3
+        puts = [np.empty(0)] * 3
+        for level in range(steps - 1, -1, -1):
+            call = weight_up * call[1:] + weight_down * call[:-1]
+            put = weight_up * put[1:] + weight_down * put[:-1]
+
+            nodes = slice(steps - level, steps + level + 1, 2)
+            if american_call:
+                np.maximum(call, exercise_call[nodes], out=call)
+            if american_put:
+                np.maximum(put, exercise_put[nodes], out=put)
+
+            if level <= 2:
+                calls[level] = call.T.reshape(shape + (level + 1,))
+                puts[level] = put.T.reshape(shape + (level + 1,))
+
+        calls[0] = calls[0][..., 0]
+        puts[0] = puts[0][..., 0]
+
+        return calls, puts
+
+
+if __name__ == '__main__':
+    # Convergence benchmark of European tree prices against Black-Scholes
+    import time
+    from .blackscholes import BlackScholes
+
+    ticker = 'AAPL'
+    expiry = dt.datetime.today() + dt.timedelta(days=90)
+
+    bs = BlackScholes(ticker, expiry, 1.0)
+    strikes = np.round(bs.spot_price * np.linspace(0.8, 1.2, 41), 2)
+    times = np.array([30.0, 60.0, 90.0, 180.0]) / 365.0
+    strike_grid = strikes[:, np.newaxis]
+    time_grid = times[np.newaxis, :]
+
+    call_bs = np.empty((strikes.size, times.size))
+    put_bs = np.empty((strikes.size, times.size))
+    for index, strike in enumerate(strikes):
+        bs.strike_price = strike
+        call_bs[index], put_bs[index] = bs.calculate_price_table(bs.spot_price, times)
+
+    for steps in (25, 50, 100, 200, 400, 800):
+        tree = Binomial(ticker, expiry, 1.0, steps=steps, american=False)
+
+        tic = time.perf_counter()
+        call, put = tree.calculate_price_table(tree.spot_price, time_grid, strike=strike_grid)
+        toc = time.perf_counter()
+
+        error = max(np.abs(call - call_bs).max(), np.abs(put - put_bs).max())
+        print(f'steps={steps:4d}: max error={error:.5f}, {1e6 * (toc - tic) / call.size:8.1f}us/contract')
@@ -1,10 +1,11 @@
 import datetime as dt
 
 import numpy as np
-import scipy.stats as stats
+from scipy.special import ndtr
 
 import pricing
-from .pricing import Pricing
+from .context import MarketContext
+from .pricing import Pricing, greeks_type
 from utils import logger
 
 _logger = logger.get_logger()
@@ -19,10 +20,11 @@ class BlackScholes(Pricing):
     :param strike: <float> Strike price of the option. This is the price option holder plans to
     buy underlying asset (for call option) or sell underlying asset (for put option).
     :param dividend: <float> If the underlying asset is paying dividend to stock-holders.
+    :param context: <MarketContext> Optional shared market data snapshot. Fetched per pricer if not provided.
     '''
 
-    def __init__(self, ticker: str, expiry: dt.datetime, strike: float, dividend: float=0.0):
-        super().__init__(ticker, expiry, strike, dividend=dividend)
+    def __init__(self, ticker: str, expiry: dt.datetime, strike: float, dividend: float=0.0, context: MarketContext | None = None):
+        super().__init__(ticker, expiry, strike, dividend=dividend, context=context)
 
         self.name = pricing.PricingType.BlackScholes
 
@@ -35,25 +37,48 @@ class BlackScholes(Pricing):
         :return: <float>, <float> Calculated price of Call & Put options
         '''
 
-        if spot_price <= 0.0:
-            spot_price = self.spot_price
+        price_call, price_put = self.calculate_price_table(spot_price, time_to_maturity, volatility)
 
-        if time_to_maturity <= 0.0:
-            time_to_maturity = self.time_to_maturity
+        self.price_call = float(price_call)
+        self.price_put = float(price_put)
 
-        if volatility <= 0.0:
-            volatility = self.volatility
+        return self.price_call, self.price_put
 
-        d1 = self._calculate_d1(spot_price, time_to_maturity, volatility)
-        d2 = self._calculate_d2(spot_price, time_to_maturity, volatility)
+    def calculate_price_table(self, spot_price: np.ndarray | float, time_to_maturity: np.ndarray | float, volatility: np.ndarray | float = -1.0) -> tuple[np.ndarray, np.ndarray]:
+        ''' Calculate Call and Put option prices for arrays of spot prices, times to maturity and volatilities
+        in a single broadcast pass. A column of spot prices against a row of maturities yields a full price grid.
 
-        self.price_call = ((spot_price * np.exp(-1 * self.dividend * time_to_maturity)) * stats.norm.cdf(d1, 0.0, 1.0) -
-                           (self.strike_price * np.exp(-1 * self.risk_free_rate * time_to_maturity) * stats.norm.cdf(d2, 0.0, 1.0)))
+        :return: <ndarray>, <ndarray> Calculated prices of Call & Put options
+        '''
 
-        self.price_put = (self.strike_price * np.exp(-1 * self.risk_free_rate * time_to_maturity) * stats.norm.cdf(-1 * d2, 0.0, 1.0) -
-                          (spot_price * np.exp(-1 * self.dividend * time_to_maturity)) * stats.norm.cdf(-1 * d1, 0.0, 1.0))
+        spot_price, time_to_maturity, volatility = self._prepare_inputs(spot_price, time_to_maturity, volatility)
+        d1, d2 = self._calculate_d1_d2(spot_price, time_to_maturity, volatility)
 
-        return self.price_call, self.price_put
+        spot_discounted = spot_price * np.exp(-self.dividend * time_to_maturity)
+        strike_discounted = self.strike_price * np.exp(-self.risk_free_rate * time_to_maturity)
+
+        price_call = spot_discounted * ndtr(d1) - strike_discounted * ndtr(d2)
+        price_put = strike_discounted * ndtr(-d2) - spot_discounted * ndtr(-d1)
+
+        return price_call, price_put
+
+    def calculate_greeks_table(self, spot_price: np.ndarray | float, time_to_maturity: np.ndarray | float, volatility: np.ndarray | float = -1.0) -> greeks_type:
+        ''' Calculate all Call and Put option Greeks for arrays of spot prices, times to maturity and volatilities
+        in a single broadcast pass. Uses the same equations and scaling as the individual calculate_* methods.
+
+        :return: <greeks_type> Named tuple of Call & Put Greek arrays
+        '''
+
+        spot_price, time_to_maturity, volatility = self._prepare_inputs(spot_price, time_to_maturity, volatility)
+        d1, d2 = self._calculate_d1_d2(spot_price, time_to_maturity, volatility)
+
+        delta_call, delta_put = self._delta(spot_price, time_to_maturity, volatility, d1, d2)
+        gamma_call, gamma_put = self._gamma(spot_price, time_to_maturity, volatility, d1, d2)
+        theta_call, theta_put = self._theta(spot_price, time_to_maturity, volatility, d1, d2)
+        vega_call, vega_put = self._vega(spot_price, time_to_maturity, volatility, d1, d2)
+        rho_call, rho_put = self._rho(spot_price, time_to_maturity, volatility, d1, d2)
+
+        return greeks_type(delta_call, delta_put, gamma_call, gamma_put, theta_call, theta_put, vega_call, vega_put, rho_call, rho_put)
 
     def calculate_delta(self, spot_price: float = -1.0, time_to_maturity: float = -1.0, volatility: float = -1.0) -> tuple[float, float]:
         ''' Calculate Call and Put option delta based on the below equations from Black-Scholes.
@@ -65,19 +90,10 @@ class BlackScholes(Pricing):
         :return: <float>, <float> Calculated delta of Call & Put options
         '''
 
-        if spot_price <= 0.0:
-            spot_price = self.spot_price
+        delta_call, delta_put = self._calculate_greek(self._delta, spot_price, time_to_maturity, volatility)
 
-        if time_to_maturity <= 0.0:
-            time_to_maturity = self.time_to_maturity
-
-        if volatility <= 0.0:
-            volatility = self.volatility
-
-        d1 = self._calculate_d1(spot_price, time_to_maturity, volatility)
-
-        self.delta_call = np.exp(-self.dividend * time_to_maturity) * stats.norm.cdf(d1, 0.0, 1.0)
-        self.delta_put = -np.exp(-self.dividend * time_to_maturity) * stats.norm.cdf(-d1, 0.0, 1.0)
+        self.delta_call = float(delta_call)
+        self.delta_put = float(delta_put)
 
         return self.delta_call, self.delta_put
 
@@ -90,19 +106,10 @@ class BlackScholes(Pricing):
         :return: <float>, <float> Calculated delta of Call & Put options
         '''
 
-        if spot_price <= 0.0:
-            spot_price = self.spot_price
-
-        if time_to_maturity <= 0.0:
-            time_to_maturity = self.time_to_maturity
-
-        if volatility <= 0.0:
-            volatility = self.volatility
-
-        d1 = self._calculate_d1(spot_price, time_to_maturity, volatility)
-        gamma = np.exp(-self.dividend * time_to_maturity) * stats.norm.pdf(d1, 0.0, 1.0) / spot_price * volatility * np.sqrt(time_to_maturity)
+        gamma_call, gamma_put = self._calculate_greek(self._gamma, spot_price, time_to_maturity, volatility)
 
-        self.gamma_call = self.gamma_put = gamma * 365.0
+        self.gamma_call = float(gamma_call)
+        self.gamma_put = float(gamma_put)
 
         return self.gamma_call, self.gamma_put
 
@@ -126,28 +133,10 @@ class BlackScholes(Pricing):
         :return: <float>, <float> Calculated delta of Call & Put options
         '''
 
-        if spot_price <= 0.0:
-            spot_price = self.spot_price
-
-        if time_to_maturity <= 0.0:
-            time_to_maturity = self.time_to_maturity
-
-        if volatility <= 0.0:
-            volatility = self.volatility
-
-        d1 = self._calculate_d1(spot_price, time_to_maturity, volatility)
-        d2 = self._calculate_d2(spot_price, time_to_maturity, volatility)
-
-        theta_call = (-np.exp(-self.dividend * time_to_maturity) * spot_price * stats.norm.cdf(d1, 0.0, 1.0) * volatility / (2 * np.sqrt(time_to_maturity))) - \
-                     (self.risk_free_rate * self.strike_price * np.exp(-self.risk_free_rate * time_to_maturity) * stats.norm.cdf(d2, 0.0, 1.0)) + \
-                     (self.dividend * spot_price * np.exp(-self.dividend * time_to_maturity) * stats.norm.cdf(d1, 0.0, 1.0))
-
-        theta_put = (-np.exp(-self.dividend * time_to_maturity) * spot_price * stats.norm.cdf(d1, 0.0, 1.0) * volatility / (2 * np.sqrt(time_to_maturity))) + \
-            (self.risk_free_rate * self.strike_price * np.exp(-self.risk_free_rate * time_to_maturity) * stats.norm.cdf(-d2, 0.0, 1.0)) - \
-            (self.dividend * spot_price * np.exp(-self.dividend * time_to_maturity) * stats.norm.cdf(-d1, 0.0, 1.0))
+        theta_call, theta_put = self._calculate_greek(self._theta, spot_price, time_to_maturity, volatility)
 
-        self.theta_call = theta_call / 365.0
-        self.theta_put = theta_put / 365.0
+        self.theta_call = float(theta_call)
+        self.theta_put = float(theta_put)
 
         return self.theta_call, self.theta_put
 
@@ -159,20 +148,11 @@ class BlackScholes(Pricing):
 
         :return: <float>, <float> Calculated delta of Call & Put options
         '''
-        if spot_price <= 0.0:
-            spot_price = self.spot_price
 
-        if time_to_maturity <= 0.0:
-            time_to_maturity = self.time_to_maturity
+        vega_call, vega_put = self._calculate_greek(self._vega, spot_price, time_to_maturity, volatility)
 
-        if volatility <= 0.0:
-            volatility = self.volatility
-
-        d1 = self._calculate_d1(spot_price, time_to_maturity, volatility)
-
-        vega = 1 / np.sqrt(2 * np.pi) * spot_price * np.exp(-self.dividend * time_to_maturity) * np.exp(-d1 ** 2 * 0.5) * np.sqrt(time_to_maturity)
-
-        self.vega_call = self.vega_put = vega / 100.0
+        self.vega_call = float(vega_call)
+        self.vega_put = float(vega_put)
 
         return self.vega_call, self.vega_put
 
@@ -184,77 +164,78 @@ class BlackScholes(Pricing):
 
         :return: <float>, <float> Calculated delta of Call & Put options
         '''
-        if spot_price <= 0.0:
-            spot_price = self.spot_price
 
-        if time_to_maturity <= 0.0:
-            time_to_maturity = self.time_to_maturity
+        rho_call, rho_put = self._calculate_greek(self._rho, spot_price, time_to_maturity, volatility)
 
-        if volatility <= 0.0:
-            volatility = self.volatility
+        self.rho_call = float(rho_call)
+        self.rho_put = float(rho_put)
 
-        d2 = self._calculate_d2(spot_price, time_to_maturity, volatility)
+        return self.rho_call, self.rho_put
 
-        rho_call = self.strike_price * time_to_maturity * np.exp(-self.risk_free_rate * time_to_maturity) * stats.norm.cdf(d2, 0.0, 1.0)
-        rho_put = -self.strike_price * time_to_maturity * np.exp(-self.risk_free_rate * time_to_maturity) * stats.norm.cdf(-d2, 0.0, 1.0)
+    def _calculate_greek(self, greek, spot_price: np.ndarray | float, time_to_maturity: np.ndarray | float, volatility: np.ndarray | float) -> tuple[np.ndarray, np.ndarray]:
+        spot_price, time_to_maturity, volatility = self._prepare_inputs(spot_price, time_to_maturity, volatility)
+        d1, d2 = self._calculate_d1_d2(spot_price, time_to_maturity, volatility)
 
-        self.rho_call = rho_call / 100.0
-        self.rho_put = rho_put / 100.0
+        return greek(spot_price, time_to_maturity, volatility, d1, d2)
 
-        return self.rho_call, self.rho_put
+    def _delta(self, spot_price: np.ndarray, time_to_maturity: np.ndarray, volatility: np.ndarray, d1: np.ndarray, d2: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        delta_call = np.exp(-self.dividend * time_to_maturity) * ndtr(d1)
+        delta_put = -np.exp(-self.dividend * time_to_maturity) * ndtr(-d1)
 
-    def _calculate_d1(self, spot_price: float = -1.0, time_to_maturity: float = -1.0, volatility: float = -1.0) -> float:
-        ''' Famous d1 variable from Black-Scholes model calculated as shown in:
-                https://en.wikipedia.org/wiki/Black%E2%80%93Scholes_model
+        return delta_call, delta_put
 
-            d1 = (np.log(S / K) + (r - q + 0.5 * sigma ** 2) * T) / (sigma * np.sqrt(T))
-        :return: <float>
-        '''
+    def _gamma(self, spot_price: np.ndarray, time_to_maturity: np.ndarray, volatility: np.ndarray, d1: np.ndarray, d2: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        gamma = np.exp(-self.dividend * time_to_maturity) * _pdf(d1) / spot_price * volatility * np.sqrt(time_to_maturity)
+        gamma = gamma * 365.0
 
-        if spot_price <= 0.0:
-            spot_price = self.spot_price
+        return gamma, gamma
 
-        if time_to_maturity <= 0.0:
-            time_to_maturity = self.time_to_maturity
+    def _theta(self, spot_price: np.ndarray, time_to_maturity: np.ndarray, volatility: np.ndarray, d1: np.ndarray, d2: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        decay = -np.exp(-self.dividend * time_to_maturity) * spot_price * ndtr(d1) * volatility / (2 * np.sqrt(time_to_maturity))
+        strike_discounted = self.risk_free_rate * self.strike_price * np.exp(-self.risk_free_rate * time_to_maturity)
+        spot_discounted = self.dividend * spot_price * np.exp(-self.dividend * time_to_maturity)
 
-        if volatility <= 0.0:
-            volatility = self.volatility
+        theta_call = decay - (strike_discounted * ndtr(d2)) + (spot_discounted * ndtr(d1))
+        theta_put = decay + (strike_discounted * ndtr(-d2)) - (spot_discounted * ndtr(-d1))
 
-        if volatility <= 0.0:
-            _logger.error(f'D1: {volatility=}')
+        return theta_call / 365.0, theta_put / 365.0
 
-        if self.strike_price <= 0.0:
-            _logger.error(f'D1: {self.strike_price=}')
+    def _vega(self, spot_price: np.ndarray, time_to_maturity: np.ndarray, volatility: np.ndarray, d1: np.ndarray, d2: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        vega = spot_price * np.exp(-self.dividend * time_to_maturity) * _pdf(d1) * np.sqrt(time_to_maturity)
+        vega = vega / 100.0
 
-        d1 = (np.log(spot_price / self.strike_price) +
-              (self.risk_free_rate - self.dividend + 0.5 * volatility ** 2) * time_to_maturity) / (volatility * np.sqrt(time_to_maturity))
+        return vega, vega
 
-        return d1
+    def _rho(self, spot_price: np.ndarray, time_to_maturity: np.ndarray, volatility: np.ndarray, d1: np.ndarray, d2: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        strike_discounted = self.strike_price * time_to_maturity * np.exp(-self.risk_free_rate * time_to_maturity)
 
-    def _calculate_d2(self, spot_price: float = -1.0, time_to_maturity: float = -1.0, volatility: float = -1.0) -> float:
-        ''' Famous d2 variable from Black-Scholes model calculated as shown in:
-                https://en.wikipedia.org/wiki/Black%E2%80%93Scholes_model
+        rho_call = strike_discounted * ndtr(d2)
+        rho_put = -strike_discounted * ndtr(-d2)
 
-            d2 = (np.log(S / K) + (r - q - 0.5 * sigma ** 2) * T) / (sigma * np.sqrt(T))
-        :return: <float>
-        '''
+        return rho_call / 100.0, rho_put / 100.0
 
-        if spot_price <= 0.0:
-            spot_price = self.spot_price
-
-        if time_to_maturity <= 0.0:
-            time_to_maturity = self.time_to_maturity
+    def _calculate_d1_d2(self, spot_price: np.ndarray, time_to_maturity: np.ndarray, volatility: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        ''' Famous d1 and d2 variables from Black-Scholes model calculated as shown in:
+                https://en.wikipedia.org/wiki/Black%E2%80%93Scholes_model
 
-        if volatility <= 0.0:
-            volatility = self.volatility
+            d1 = (np.log(S / K) + (r - q + 0.5 * sigma ** 2) * T) / (sigma * np.sqrt(T))
+            d2 = d1 - sigma * np.sqrt(T)
+        :return: <ndarray>, <ndarray>
+        '''
 
-        if volatility <= 0.0:
+        if np.any(volatility <= 0.0):
             _logger.error(f'D1: {volatility=}')
 
         if self.strike_price <= 0.0:
             _logger.error(f'D1: {self.strike_price=}')
 
-        d2 = (np.log(spot_price / self.strike_price) +
-              (self.risk_free_rate - self.dividend - 0.5 * volatility ** 2) * time_to_maturity) / (volatility * np.sqrt(time_to_maturity))
+        deviation = volatility * np.sqrt(time_to_maturity)
+        d1 = (np.log(spot_price / self.strike_price) +
+              (self.risk_free_rate - self.dividend + 0.5 * volatility ** 2) * time_to_maturity) / deviation
+        d2 = d1 - deviation
+
+        return d1, d2
+
 
-        return d2
+def _pdf(x: np.ndarray) -> np.ndarray:
+    return np.exp(-0.5 * x ** 2) / np.sqrt(2.0 * np.pi)
@@ -0,0 +1,124 @@
+import time
+import threading
+import collections
+
+import numpy as np
+import pandas as pd
+
+from data import store as store
+from utils import logger
+
+
+_logger = logger.get_logger()
+
+CONTEXT_TTL = 900.0   # Secs before a cached value is refetched
+CONTEXT_DAYS = 365    # Days of history used for spot price and realized volatility
+
+underlying_type = collections.namedtuple('underlying_type', ['history', 'spot_price', 'volatility', 'time'])
+
+
+class MarketContext:
+    '''
+    Snapshot of the market data shared by all pricers in a run. The risk-free rate is fetched once and the
+    history, spot price and realized volatility are loaded once per ticker, then reused until the TTL expires.
+    Safe to share across threads; concurrent requests for the same ticker wait on a single load.
+
+    :param ttl: <float> Seconds before a cached value is considered stale and refetched
+    :param days: <int> Days of history to load for each ticker
+    '''
+
+    def __init__(self, ttl: float = CONTEXT_TTL, days: int = CONTEXT_DAYS):
+        if ttl <= 0.0:
+            raise ValueError('Invalid TTL')
+        if days < 2:
+            raise ValueError('Invalid number of days')
+
+        self.ttl = ttl
+        self.days = days
+
+        self._risk_free_rate = 0.0
+        self._risk_free_rate_time = 0.0
+        self._underlying: dict[str, underlying_type] = {}
+        self._lock = threading.Lock()
+        self._locks: dict[str, threading.Lock] = {}
+
+    def __repr__(self):
+        return f'<MarketContext ({len(self._underlying)} tickers, ttl={self.ttl:.0f}s)>'
+
+    def get_risk_free_rate(self) -> float:
+        with self._get_lock('__rate__'):
+            if self._is_expired(self._risk_free_rate_time):
+                self._risk_free_rate = store.get_treasury_rate()
+                self._risk_free_rate_time = time.monotonic()
+
+                _logger.info(f'Fetched risk-free rate = {self._risk_free_rate:.4f}')
+
+        return self._risk_free_rate
+
+    def get_history(self, ticker: str) -> pd.DataFrame:
+        return self._get_underlying(ticker).history
+
+    def get_spot_price(self, ticker: str) -> float:
+        return self._get_underlying(ticker).spot_price
+
+    def get_volatility(self, ticker: str) -> float:
+        return self._get_underlying(ticker).volatility
+
+    def load(self, tickers: list[str]) -> None:
+        self.get_risk_free_rate()
+        for ticker in tickers:
+            self._get_underlying(ticker)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._risk_free_rate = 0.0
+            self._risk_free_rate_time = 0.0
+            self._underlying = {}
+
+    def _get_underlying(self, ticker: str) -> underlying_type:
+        ticker = ticker.upper()
+
+        with self._get_lock(ticker):
+            underlying = self._underlying.get(ticker)
+            if underlying is None or self._is_expired(underlying.time):
+                underlying = self._load_underlying(ticker)
+                self._underlying[ticker] = underlying
+
+        return underlying
+
+    def _load_underlying(self, ticker: str) -> underlying_type:
+        history = store.get_history(ticker, days=self.days)
+        if history.empty:
+            s = f'Unable to get historical stock data for {ticker}'
+            _logger.error(s)
+            raise IOError(s)
+
+        close = history['close']
+        log_returns = np.log(close / close.shift(1))
+        volatility = np.std(log_returns) * np.sqrt(252.0)
+        spot_price = close.iloc[-1]
+
+        _logger.info(f'Loaded {ticker} context: spot={spot_price:.2f}, volatility={volatility:.4f}')
+
+        return underlying_type(history, spot_price, volatility, time.monotonic())
+
+    def _get_lock(self, key: str) -> threading.Lock:
+        with self._lock:
+            if key not in self._locks:
+                self._locks[key] = threading.Lock()
+
+            return self._locks[key]
+
+    def _is_expired(self, loaded: float) -> bool:
+        return loaded <= 0.0 or (time.monotonic() - loaded) > self.ttl
+
+
+if __name__ == '__main__':
+    import sys
+
+    ticker = sys.argv[1].upper() if len(sys.argv) > 1 else 'AAPL'
+
+    context = MarketContext()
+    print(f'{context.get_risk_free_rate()=}')
+    print(f'{context.get_spot_price(ticker)=}')
+    print(f'{context.get_volatility(ticker)=}')
@@ -0,0 +1,268 @@
+import time
+import threading
+import collections
+
+import numpy as np
+import pandas as pd
+from scipy.optimize import brentq
+from scipy.special import ndtr
+
+from utils import logger
+
+
+_logger = logger.get_logger()
+
+SURFACE_TTL = 900.0        # Secs before a solved expiry is considered stale
+VOLATILITY_MIN = 0.001     # Lower bound of the solver bracket
+VOLATILITY_MAX = 5.0       # Upper bound of the solver bracket
+NEWTON_ITERATIONS = 20     # Newton iterations before falling back to Brent's method
+TOLERANCE = 1.0e-6         # Volatility tolerance for convergence
+VEGA_MIN = 1.0e-8          # Vega below which a Newton step is considered unreliable
+
+smile_type = collections.namedtuple('smile_type', ['time_to_maturity', 'strikes', 'volatilities', 'time'])
+side_type = collections.namedtuple('side_type', ['strikes', 'volatilities', 'otm', 'time'])
+
+
+def calculate_implied_volatility(price: np.ndarray | float,
+                                 spot_price: np.ndarray | float,
+                                 strike: np.ndarray | float,
+                                 time_to_maturity: np.ndarray | float,
+                                 risk_free_rate: np.ndarray | float,
+                                 dividend: np.ndarray | float = 0.0,
+                                 call: np.ndarray | bool = True) -> np.ndarray:
+    ''' Invert Black-Scholes for the volatility that reproduces each option price. All inputs are broadcast
+    against each other and solved together with vectorized Newton iterations. Any element that fails to
+    converge falls back to Brent's method on [VOLATILITY_MIN, VOLATILITY_MAX].
+
+    :return: <ndarray> Implied volatilities. NaN where the price is outside the no-arbitrage bounds.
+    '''
+
+    price, spot_price, strike, time_to_maturity, risk_free_rate, dividend, call = \
+        [np.array(value, dtype=float) for value in np.broadcast_arrays(price, spot_price, strike, time_to_maturity, risk_free_rate, dividend, call)]
+    call = call.astype(bool)
+
+    # Prices must lie within the no-arbitrage bounds to have a solution
+    forward = spot_price * np.exp(-dividend * time_to_maturity)
+    discounted = strike * np.exp(-risk_free_rate * time_to_maturity)
+    lower = np.where(call, np.maximum(forward - discounted, 0.0), np.maximum(discounted - forward, 0.0))
+    upper = np.where(call, forward, discounted)
+    valid = (time_to_maturity > 0.0) & (strike > 0.0) & (spot_price > 0.0) & (price > lower) & (price < upper)
+
+    # Neutral inputs where there is no solution so the iterations stay finite
+    spot_price = np.where(valid, spot_price, 1.0)
+    strike = np.where(valid, strike, 1.0)
+    time_to_maturity = np.where(valid, time_to_maturity, 1.0)
+
+    # Brenner-Subrahmanyam approximation as the starting point
+    volatility = np.clip(np.sqrt(2.0 * np.pi / time_to_maturity) * price / spot_price, 0.05, 2.0)
+
+    active = valid.copy()
+    for _ in range(NEWTON_ITERATIONS):
+        value, vega = _calculate_price_vega(spot_price, strike, time_to_maturity, volatility, risk_free_rate, dividend, call)
+
+        step = np.divide(value - price, vega, out=np.full_like(vega, np.inf), where=active & (vega > VEGA_MIN))
+        volatility = np.where(active & np.isfinite(step), np.clip(volatility - step, VOLATILITY_MIN, VOLATILITY_MAX), volatility)
+
+        active &= np.isfinite(step) & (np.abs(step) > TOLERANCE)
+        if not active.any():
+            break
+
+    # Anything that did not converge (or stalled on a flat vega) is solved by bracketing
+    value, vega = _calculate_price_vega(spot_price, strike, time_to_maturity, volatility, risk_free_rate, dividend, call)
+    unsolved = valid & (active | (np.abs(value - price) > TOLERANCE * np.maximum(vega, 1.0)))
+    for index in zip(*np.nonzero(unsolved)):
+        def objective(sigma: float) -> float:
+            return float(_calculate_price_vega(spot_price[index], strike[index], time_to_maturity[index], sigma,
+                         risk_free_rate[index], dividend[index], call[index])[0] - price[index])
+
+        try:
+            volatility[index] = brentq(objective, VOLATILITY_MIN, VOLATILITY_MAX, xtol=TOLERANCE)
+        except ValueError:
+            valid[index] = False
+
+    if unsolved.any():
+        _logger.info(f'Solved {np.count_nonzero(unsolved)} of {np.count_nonzero(valid)} implied volatilities by bracketing')
+
+    return np.where(valid, volatility, np.nan)
+
+
+def calculate_chain_volatility(chain: pd.DataFrame,
+                               spot_price: float,
+                               time_to_maturity: float,
+                               risk_free_rate: float,
+                               dividend: float = 0.0) -> np.ndarray:
+    ''' Solve implied volatilities for a whole option chain (one expiry) from its last traded prices
+
+    :return: <ndarray> Implied volatilities in chain row order. NaN where no solution exists.
+    '''
+
+    if chain.empty:
+        return np.empty(0)
+
+    return calculate_implied_volatility(chain['lastPrice'].to_numpy(dtype=float),
+                                        spot_price,
+                                        chain['strike'].to_numpy(dtype=float),
+                                        time_to_maturity,
+                                        risk_free_rate,
+                                        dividend,
+                                        (chain['type'] == 'call').to_numpy())
+
+
+class VolatilitySurface:
+    '''
+    Implied volatility surface (strike x expiry) for a single ticker. Each expiry holds a smile solved from
+    the out-of-the-money contracts of its chain, with calls and puts added separately merged into the one
+    smile. Volatilities are interpolated linearly in strike within an
+    expiry and linearly in total variance between expiries. Smiles older than the TTL are ignored.
+
+    :param ticker: Ticker of the Underlying Stock asset
+    :param ttl: <float> Seconds before a solved expiry is considered stale
+    '''
+
+    def __init__(self, ticker: str, ttl: float = SURFACE_TTL):
+        if ttl <= 0.0:
+            raise ValueError('Invalid TTL')
+
+        self.ticker = ticker.upper()
+        self.ttl = ttl
+
+        self._smiles: dict[float, smile_type] = {}
+        self._sides: dict[float, dict[str, side_type]] = {}
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return f'<VolatilitySurface {self.ticker} ({len(self._smiles)} expiries)>'
+
+    def add_chain(self, chain: pd.DataFrame, spot_price: float, time_to_maturity: float, risk_free_rate: float, dividend: float = 0.0) -> bool:
+        volatilities = calculate_chain_volatility(chain, spot_price, time_to_maturity, risk_free_rate, dividend)
+        if volatilities.size == 0:
+            return False
+
+        # Out-of-the-money contracts carry the most time value and give the most reliable solutions
+        strikes = chain['strike'].to_numpy(dtype=float)
+        types = chain['type'].to_numpy(dtype=str)
+        otm = np.where(types == 'call', strikes >= spot_price, strikes < spot_price)
+        loaded = time.monotonic()
+        key = round(time_to_maturity, 6)
+
+        with self._lock:
+            # Keep the current side of the smile from a chain holding only the other product
+            sides = {type: side for type, side in self._sides.get(key, {}).items() if not self._is_expired(side.time)}
+            for type in np.unique(types):
+                side = types == type
+                sides[type] = side_type(strikes[side], volatilities[side], otm[side], loaded)
+            self._sides[key] = sides
+
+            smile = _build_smile(time_to_maturity, list(sides.values()), loaded)
+            if smile is None:
+                _logger.info(f'No implied volatilities solved for {self.ticker}')
+                return False
+
+            self._smiles[key] = smile
+
+        _logger.info(f'Added {len(smile.strikes)} implied volatilities at T={time_to_maturity:.4f} to {self.ticker} surface')
+
+        return True
+
+    def has_expiry(self, time_to_maturity: float, type: str = '') -> bool:
+        ''' Whether a current smile exists for the expiry, and if a type ('call' or 'put') is given, whether that
+        side of it came from a chain '''
+
+        key = round(time_to_maturity, 6)
+        with self._lock:
+            smile = self._sides.get(key, {}).get(type) if type else self._smiles.get(key)
+
+        return smile is not None and not self._is_expired(smile.time)
+
+    def get_volatility(self, strike: float, time_to_maturity: float) -> float:
+        ''' Interpolate the implied volatility at a strike and time to maturity
+
+        :return: <float> Implied volatility, or -1.0 if the surface has no current expiries
+        '''
+
+        with self._lock:
+            smiles = sorted((smile for smile in self._smiles.values() if not self._is_expired(smile.time)), key=lambda smile: smile.time_to_maturity)
+
+        if not smiles:
+            return -1.0
+
+        times = np.array([smile.time_to_maturity for smile in smiles])
+        variances = np.array([np.interp(strike, smile.strikes, smile.volatilities) ** 2 * smile.time_to_maturity for smile in smiles])
+
+        if time_to_maturity <= times[0]:
+            volatility = np.sqrt(variances[0] / times[0])
+        elif time_to_maturity >= times[-1]:
+            volatility = np.sqrt(variances[-1] / times[-1])
+        else:
+            volatility = np.sqrt(np.interp(time_to_maturity, times, variances) / time_to_maturity)
+
+        return float(volatility)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._smiles = {}
+            self._sides = {}
+
+    def _is_expired(self, loaded: float) -> bool:
+        return (time.monotonic() - loaded) > self.ttl
+
+
+_surfaces: dict[str, VolatilitySurface] = {}
+_surfaces_lock = threading.Lock()
+
+
+def get_surface(ticker: str) -> VolatilitySurface:
+    ''' Get the cached volatility surface for a ticker, creating an empty one if needed '''
+
+    ticker = ticker.upper()
+
+    with _surfaces_lock:
+        if ticker not in _surfaces:
+            _surfaces[ticker] = VolatilitySurface(ticker)
+
+        return _surfaces[ticker]
+
+
+def _build_smile(time_to_maturity: float, sides: list[side_type], loaded: float) -> smile_type | None:
+    strikes = np.concatenate([side.strikes for side in sides])
+    volatilities = np.concatenate([side.volatilities for side in sides])
+    otm = np.concatenate([side.otm for side in sides])
+
+    keep = otm & np.isfinite(volatilities)
+    if not keep.any():
+        keep = np.isfinite(volatilities)
+    if not keep.any():
+        return None
+
+    # One volatility per strike, so the smile interpolates over increasing strikes
+    strikes, index = np.unique(strikes[keep], return_index=True)
+    volatilities = volatilities[keep][index]
+
+    return smile_type(time_to_maturity, strikes, volatilities, loaded)
+
+
+def _calculate_price_vega(spot_price: np.ndarray,
+                          strike: np.ndarray,
+                          time_to_maturity: np.ndarray,
+                          volatility: np.ndarray,
+                          risk_free_rate: np.ndarray,
+                          dividend: np.ndarray,
+                          call: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    root = volatility * np.sqrt(time_to_maturity)
+    d1 = (np.log(spot_price / strike) + (risk_free_rate - dividend + 0.5 * volatility ** 2) * time_to_maturity) / root
+    d2 = d1 - root
+
+    forward = spot_price * np.exp(-dividend * time_to_maturity)
+    discounted = strike * np.exp(-risk_free_rate * time_to_maturity)
+
+    price_call = forward * ndtr(d1) - discounted * ndtr(d2)
+    price = np.where(call, price_call, price_call - forward + discounted)  # Put-call parity
+    vega = forward * np.exp(-0.5 * d1 ** 2) / np.sqrt(2.0 * np.pi) * np.sqrt(time_to_maturity)
+
+    return price, vega
+
+
+if __name__ == '__main__':
+    strikes_ = np.arange(80.0, 121.0, 5.0)
+    prices_ = np.array([21.2, 16.5, 12.1, 8.2, 5.0, 2.7, 1.3, 0.55, 0.2])
+    print(calculate_implied_volatility(prices_, 100.0, strikes_, 0.25, 0.045))
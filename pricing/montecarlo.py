@@ -1,9 +1,9 @@
 import datetime as dt
-from random import gauss
 
 import numpy as np
 
 import pricing
+from .context import MarketContext
 from .pricing import Pricing
 from utils import logger
 
@@ -12,25 +12,38 @@ _logger = logger.get_logger()
 
 class MonteCarlo(Pricing):
     '''
-    This class uses Monte-Carlo simulation to calculate prices for American Call and Put Options.
+    This class uses Monte-Carlo simulation to calculate prices for European Call and Put Options.
+
+    Simulations are vectorized with NumPy and streamed in chunks so memory stays bounded. Antithetic variates
+    and a control variate (the discounted terminal asset price, whose expectation is known exactly under
+    Black-Scholes dynamics) reduce the variance of the estimates. Each pricer owns a fixed seed, so every
+    revaluation uses common random numbers and the bump-and-revalue Greeks are stable.
 
     :param ticker: Ticker of the Underlying Stock asset, ex. 'AAPL', 'TSLA', 'GOOGL', etc.
     :param expiry_date: <datetime.date> ExpiryDate for the option -must be in the future
     :param strike: <float> Strike price of the option. This is the price option holder plans to
     buy underlying asset (for call option) or sell underlying asset (for put option).
     :param dividend: <float> If the underlying asset is paying dividend to stock-holders.
-
-    TODO: Create a separate class to calculate prices using Binomial Trees
+    :param context: <MarketContext> Optional shared market data snapshot. Fetched per pricer if not provided.
+    :param seed: <int> Seed for the random number generator. A random seed is chosen if not provided.
     '''
 
-    SIMULATION_COUNT = 100000  # Number of Simulations to be performed for Brownian motion
+    SIMULATION_COUNT = 100000       # Number of Simulations to be performed for Brownian motion
+    TABLE_SIMULATION_COUNT = 10000  # Number of Simulations per point when pricing tables
+    CHUNK_ELEMENTS = 2 ** 22        # Max simulated prices held in memory at once
 
-    def __init__(self, ticker: str, expiry: dt.datetime, strike: float, dividend: float=0.0):
-        super().__init__(ticker, expiry, strike, dividend=dividend)
+    SPOT_BUMP = 0.01                # Relative spot price bump for delta and gamma
+    VOLATILITY_BUMP = 0.01          # Absolute volatility bump for vega
+    RATE_BUMP = 0.0001              # Absolute rate bump for rho
+    TIME_BUMP = 1.0 / 365.0         # One day bump for theta
+
+    def __init__(self, ticker: str, expiry: dt.datetime, strike: float, dividend: float=0.0, context: MarketContext | None = None, seed: int | None = None):
+        super().__init__(ticker, expiry, strike, dividend=dividend, context=context)
 
         self.name = pricing.PricingType.MonteCarlo
+        self.seed = seed if seed is not None else int(np.random.SeedSequence().entropy % (2 ** 32))
 
-    def calculate_price(self, spot_price=-1.0, time_to_maturity=-1.0):
+    def calculate_price(self, spot_price: float = -1.0, time_to_maturity: float = -1.0, volatility: float = -1.0) -> tuple[float, float]:
         ''' Calculate present-value of of expected payoffs and their average becomes the price of the respective option.
         Calculations are performed based on below equations:
 
@@ -41,85 +54,187 @@ class MonteCarlo(Pricing):
         :return: <float>, <float> Calculated price of Call & Put options
         '''
 
-        if spot_price <= 0.0:
-            spot_price = self.spot_price
-
-        call_payoffs, put_payoffs = self._generate_simulations(spot_price)
-        discount_factor = np.exp(-1 * self.risk_free_rate * self.time_to_maturity)
+        spot_price, time_to_maturity, volatility = self._prepare_inputs(spot_price, time_to_maturity, volatility)
+        price_call, price_put = self._simulate(spot_price, time_to_maturity, volatility, self.risk_free_rate, self.SIMULATION_COUNT)
 
-        self.price_call = discount_factor * (sum(call_payoffs) / len(call_payoffs))
-        self.price_put = discount_factor * (sum(put_payoffs) / len(put_payoffs))
+        self.price_call = float(price_call)
+        self.price_put = float(price_put)
 
         return self.price_call, self.price_put
 
-    def calculate_delta(self, spot_price=-1.0, time_to_maturity=-1.0):
-        '''TODO'''
-        return 0.0, 0.0
+    def calculate_price_table(self, spot_price: np.ndarray | float, time_to_maturity: np.ndarray | float, volatility: np.ndarray | float = -1.0) -> tuple[np.ndarray, np.ndarray]:
+        ''' Calculate Call and Put option prices for arrays of spot prices, times to maturity and volatilities.
+        Every point is priced from the same simulated paths, so the resulting table is smooth.
+
+        :return: <ndarray>, <ndarray> Calculated prices of Call & Put options
+        '''
+
+        spot_price, time_to_maturity, volatility = self._prepare_inputs(spot_price, time_to_maturity, volatility)
 
-    def calculate_gamma(self, spot_price=-1.0, time_to_maturity=-1.0):
-        '''TODO'''
-        return 0.0, 0.0
+        return self._simulate(spot_price, time_to_maturity, volatility, self.risk_free_rate, self.TABLE_SIMULATION_COUNT)
 
-    def calculate_theta(self, spot_price=-1.0, time_to_maturity=-1.0):
-        '''TODO'''
-        return 0.0, 0.0
+    def calculate_delta(self, spot_price: float = -1.0, time_to_maturity: float = -1.0, volatility: float = -1.0) -> tuple[float, float]:
+        ''' Calculate Call and Put option delta by central difference on the spot price
 
-    def calculate_vega(self, spot_price=-1.0, time_to_maturity=-1.0):
-        '''TODO'''
-        return 0.0, 0.0
+        :return: <float>, <float> Calculated delta of Call & Put options
+        '''
+
+        spot_price, time_to_maturity, volatility = self._prepare_inputs(spot_price, time_to_maturity, volatility)
+        bump = spot_price * self.SPOT_BUMP
 
-    def calculate_rho(self, spot_price=-1.0, time_to_maturity=-1.0):
-        '''TODO'''
-        return 0.0, 0.0
+        spots = np.array([spot_price - bump, spot_price + bump])
+        calls, puts = self._simulate(spots, time_to_maturity, volatility, self.risk_free_rate, self.SIMULATION_COUNT)
 
-    def _generate_asset_price(self, spot_price):
-        ''' Calculate predicted Asset Price at the time of Option Expiry date.
-        It used a random variable based on Gaus model and then calculate price using the below equation.
+        self.delta_call = float((calls[1] - calls[0]) / (2.0 * bump))
+        self.delta_put = float((puts[1] - puts[0]) / (2.0 * bump))
 
-            St = S * exp((r− 0.5*σ^2)(T−t)+σT−t√ϵ)
+        return self.delta_call, self.delta_put
 
-        :return: <float> Expected Asset Price
+    def calculate_gamma(self, spot_price: float = -1.0, time_to_maturity: float = -1.0, volatility: float = -1.0) -> tuple[float, float]:
+        ''' Calculate Call and Put option gamma by second-order central difference on the spot price
+
+        :return: <float>, <float> Calculated gamma of Call & Put options
         '''
-        expected_price = spot_price * np.exp(
-            (self.risk_free_rate - 0.5 * self.volatility ** 2) * self.time_to_maturity +
-            self.volatility * np.sqrt(self.time_to_maturity) * gauss(0.0, 1.0))
 
-        return expected_price
+        spot_price, time_to_maturity, volatility = self._prepare_inputs(spot_price, time_to_maturity, volatility)
+        bump = spot_price * self.SPOT_BUMP
+
+        spots = np.array([spot_price - bump, spot_price, spot_price + bump])
+        calls, puts = self._simulate(spots, time_to_maturity, volatility, self.risk_free_rate, self.SIMULATION_COUNT)
 
-    def _call_payoff(self, expected_price):
-        ''' Calculate payoff of the call option at Option Expiry Date assuming the asset price
-        is equal to expected price. This calculation is based on below equation:
+        self.gamma_call = float((calls[2] - 2.0 * calls[1] + calls[0]) / (bump ** 2))
+        self.gamma_put = float((puts[2] - 2.0 * puts[1] + puts[0]) / (bump ** 2))
 
-            Payoff at T = max(0,ExpectedPrice−Strike)
+        return self.gamma_call, self.gamma_put
 
-        :param expected_price: <float> Expected price of the underlying asset on Expiry Date
-        :return: <float> payoff
+    def calculate_theta(self, spot_price: float = -1.0, time_to_maturity: float = -1.0, volatility: float = -1.0) -> tuple[float, float]:
+        ''' Calculate Call and Put option theta as the change in value over one day
+
+        :return: <float>, <float> Calculated theta (per day) of Call & Put options
         '''
-        return max(0, expected_price - self.strike_price)
 
-    def _put_payoff(self, expected_price):
-        ''' Calculate payoff of the put option at Option Expiry Date assuming the asset price
-        is equal to expected price. This calculation is based on below equation:
+        spot_price, time_to_maturity, volatility = self._prepare_inputs(spot_price, time_to_maturity, volatility)
+        bump = np.minimum(self.TIME_BUMP, time_to_maturity / 2.0)
+
+        times = np.array([time_to_maturity, time_to_maturity - bump])
+        calls, puts = self._simulate(spot_price, times, volatility, self.risk_free_rate, self.SIMULATION_COUNT)
+
+        self.theta_call = float((calls[1] - calls[0]) / bump / 365.0)
+        self.theta_put = float((puts[1] - puts[0]) / bump / 365.0)
 
-            Payoff at T = max(0,Strike-ExpectedPrice)
+        return self.theta_call, self.theta_put
 
-        :param expected_price: <float> Expected price of the underlying asset on Expiry Date
-        :return: <float> payoff
+    def calculate_vega(self, spot_price: float = -1.0, time_to_maturity: float = -1.0, volatility: float = -1.0) -> tuple[float, float]:
+        ''' Calculate Call and Put option vega by central difference on the volatility
+
+        :return: <float>, <float> Calculated vega (per 1% volatility) of Call & Put options
         '''
-        return max(0, self.strike_price - expected_price)
 
-    def _generate_simulations(self, spot_price):
-        ''' Perform Brownian motion simulation to get the Call & Put option payouts on Expiry Date
+        spot_price, time_to_maturity, volatility = self._prepare_inputs(spot_price, time_to_maturity, volatility)
+        bump = np.minimum(self.VOLATILITY_BUMP, volatility / 2.0)
+
+        volatilities = np.array([volatility - bump, volatility + bump])
+        calls, puts = self._simulate(spot_price, time_to_maturity, volatilities, self.risk_free_rate, self.SIMULATION_COUNT)
+
+        self.vega_call = float((calls[1] - calls[0]) / (2.0 * bump) / 100.0)
+        self.vega_put = float((puts[1] - puts[0]) / (2.0 * bump) / 100.0)
+
+        return self.vega_call, self.vega_put
+
+    def calculate_rho(self, spot_price: float = -1.0, time_to_maturity: float = -1.0, volatility: float = -1.0) -> tuple[float, float]:
+        ''' Calculate Call and Put option rho by central difference on the risk-free rate
+
+        :return: <float>, <float> Calculated rho (per 1% rate) of Call & Put options
+        '''
+
+        spot_price, time_to_maturity, volatility = self._prepare_inputs(spot_price, time_to_maturity, volatility)
+        bump = self.RATE_BUMP
+
+        rates = np.array([self.risk_free_rate - bump, self.risk_free_rate + bump])
+        calls, puts = self._simulate(spot_price, time_to_maturity, volatility, rates, self.SIMULATION_COUNT)
+
+        self.rho_call = float((calls[1] - calls[0]) / (2.0 * bump) / 100.0)
+        self.rho_put = float((puts[1] - puts[0]) / (2.0 * bump) / 100.0)
+
+        return self.rho_call, self.rho_put
+
+    def _simulate(self,
+                  spot_price: np.ndarray,
+                  time_to_maturity: np.ndarray,
+                  volatility: np.ndarray,
+                  risk_free_rate: np.ndarray | float,
+                  simulations: int) -> tuple[np.ndarray, np.ndarray]:
+        ''' Perform Brownian motion simulation to get the discounted Call & Put option payouts on Expiry Date.
+        Inputs are broadcast against each other and every point is priced from the same random draws.
+        The asset price at expiry is calculated from a standard normal variable ϵ:
+
+            St = S * exp((r−q−0.5*σ^2)(T−t)+σ√(T−t)ϵ)
 
-        :return: <list of call-option payoffs>, <list of put-option payoffs>
+        :return: <ndarray>, <ndarray> Calculated prices of Call & Put options
         '''
-        call_payoffs, put_payoffs = [], []
-        for _ in range(self.SIMULATION_COUNT):
-            expected_asset_price = self._generate_asset_price(spot_price)
-            call_payoffs.append(self._call_payoff(expected_asset_price))
-            put_payoffs.append(self._put_payoff(expected_asset_price))
 
-        return call_payoffs, put_payoffs
+        spot_price, time_to_maturity, volatility, risk_free_rate = np.broadcast_arrays(spot_price, time_to_maturity, volatility, risk_free_rate)
+        shape = spot_price.shape
+
+        spot_price = spot_price.reshape(-1, 1)
+        time_to_maturity = time_to_maturity.reshape(-1, 1)
+        volatility = volatility.reshape(-1, 1)
+        risk_free_rate = risk_free_rate.reshape(-1, 1)
+
+        drift = (risk_free_rate - self.dividend - 0.5 * volatility ** 2) * time_to_maturity
+        diffusion = volatility * np.sqrt(time_to_maturity)
+        discount = np.exp(-risk_free_rate * time_to_maturity)
+        forward = spot_price * np.exp(-self.dividend * time_to_maturity)  # Known mean of the discounted terminal price
+
+        points = spot_price.shape[0]
+        pairs = max(simulations // 2, 1)
+        chunk = max(self.CHUNK_ELEMENTS // (2 * points), 1)
+
+        sum_call = np.zeros(points)
+        sum_put = np.zeros(points)
+        sum_control = np.zeros(points)
+        sum_control_sq = np.zeros(points)
+        sum_call_control = np.zeros(points)
+        sum_put_control = np.zeros(points)
+
+        generator = np.random.default_rng(self.seed)
+        remaining = pairs
+        while remaining > 0:
+            count = min(chunk, remaining)
+            epsilon = generator.standard_normal(count)
+            epsilon = np.concatenate([epsilon, -epsilon])  # Antithetic variates
+
+            expected_price = spot_price * np.exp(drift + diffusion * epsilon)
+            call = discount * np.maximum(expected_price - self.strike_price, 0.0)
+            put = discount * np.maximum(self.strike_price - expected_price, 0.0)
+            control = discount * expected_price - forward
+
+            sum_call += call.sum(axis=1)
+            sum_put += put.sum(axis=1)
+            sum_control += control.sum(axis=1)
+            sum_control_sq += (control ** 2).sum(axis=1)
+            sum_call_control += (call * control).sum(axis=1)
+            sum_put_control += (put * control).sum(axis=1)
+
+            remaining -= count
+
+        # Apply the control variate using the sample-optimal coefficient
+        count = 2.0 * pairs
+        mean_call = sum_call / count
+        mean_put = sum_put / count
+        mean_control = sum_control / count
+        var_control = sum_control_sq / count - mean_control ** 2
+        cov_call = sum_call_control / count - mean_call * mean_control
+        cov_put = sum_put_control / count - mean_put * mean_control
+
+        valid = var_control > 0.0
+        beta_call = np.divide(cov_call, var_control, out=np.zeros(points), where=valid)
+        beta_put = np.divide(cov_put, var_control, out=np.zeros(points), where=valid)
+
+        price_call = mean_call - beta_call * mean_control
+        price_put = mean_put - beta_put * mean_control
+
+        return price_call.reshape(shape), price_put.reshape(shape)
 
 
 if __name__ == '__main__':
@@ -6,19 +6,33 @@ Greeks calculation based on https://aaronschlegel.me/measure-sensitivity-derivat
 import abc
 from abc import ABC
 import datetime as dt
+import collections
 
 import numpy as np
 import pandas as pd
 
 from data import store as store
+from pricing.context import MarketContext
 from utils import logger
 
 
 _logger = logger.get_logger()
 
+greeks_type = collections.namedtuple('greeks_type', [
+    'delta_call',
+    'delta_put',
+    'gamma_call',
+    'gamma_put',
+    'theta_call',
+    'theta_put',
+    'vega_call',
+    'vega_put',
+    'rho_call',
+    'rho_put'])
+
 
 class Pricing(ABC):
-    def __init__(self, ticker: str, expiry: dt.datetime, strike: float, dividend: float):
+    def __init__(self, ticker: str, expiry: dt.datetime, strike: float, dividend: float, context: MarketContext | None = None):
         if not store.is_ticker(ticker):
             raise ValueError(f'Invalid ticker {ticker.upper()}')
 
@@ -34,6 +48,7 @@ class Pricing(ABC):
         self.risk_free_rate = 0.0
         self.spot_price = 0.0
         self.dividend = dividend or 0.0
+        self.context = context
         self.price_call = 0.0
         self.price_put = 0.0
 
@@ -61,6 +76,25 @@ class Pricing(ABC):
     def calculate_price(self, spot_price: float = -1.0, time_to_maturity: float = -1.0, volatility: float = -1.0) -> tuple[float, float]:
         pass
 
+    def calculate_price_table(self, spot_price: np.ndarray | float, time_to_maturity: np.ndarray | float, volatility: np.ndarray | float = -1.0) -> tuple[np.ndarray, np.ndarray]:
+        '''
+        Calculate Call and Put option prices for arrays of spot prices, times to maturity and volatilities.
+        The inputs are broadcast against each other, so a column of spot prices and a row of maturities
+        produce a full price grid. Values <= 0.0 are replaced with the pricer's own value.
+        Pricers with a closed form should override this; the default prices each element individually.
+
+        :return: <ndarray>, <ndarray> Calculated prices of Call & Put options
+        '''
+        spot_price, time_to_maturity, volatility = np.broadcast_arrays(*self._prepare_inputs(spot_price, time_to_maturity, volatility))
+
+        price_call = np.empty(spot_price.shape)
+        price_put = np.empty(spot_price.shape)
+        for index in np.ndindex(spot_price.shape):
+            price_call[index], price_put[index] = self.calculate_price(
+                spot_price=spot_price[index], time_to_maturity=time_to_maturity[index], volatility=volatility[index])
+
+        return price_call, price_put
+
     def is_call_put_parity_maintained(self, call_price: float, put_price: float) -> bool:
         ''' Verify is the Put-Call Pairty is maintained by the two option prices calculated
 
@@ -79,7 +113,11 @@ class Pricing(ABC):
         '''
         Scan through the web to get historical prices of the underlying asset.
         '''
-        if self.underlying_asset_data.empty:
+        if not self.underlying_asset_data.empty:
+            pass
+        elif self.context is not None:
+            self.underlying_asset_data = self.context.get_history(self.ticker)
+        else:
             self.underlying_asset_data = store.get_history(self.ticker, days=365)
 
             if self.underlying_asset_data.empty:
@@ -91,7 +129,10 @@ class Pricing(ABC):
         '''
         Fetch 3-month Treasury Bill Rate
         '''
-        self.risk_free_rate = store.get_treasury_rate()
+        if self.context is not None:
+            self.risk_free_rate = self.context.get_risk_free_rate()
+        else:
+            self.risk_free_rate = store.get_treasury_rate()
 
         _logger.info(f'Risk-free rate = {self.risk_free_rate:.4f}')
 
@@ -112,13 +153,16 @@ class Pricing(ABC):
         '''
         Using historical prices of the underlying asset, calculate volatility.
         '''
-        self.calculate_underlying_asset_data()
-        self.underlying_asset_data = self.underlying_asset_data.reset_index()
-        self.underlying_asset_data = self.underlying_asset_data.set_index('date')
-        self.underlying_asset_data['log_returns'] = np.log(self.underlying_asset_data['close'] / self.underlying_asset_data['close'].shift(1))
+        if self.context is not None:
+            self.volatility = self.context.get_volatility(self.ticker)
+        else:
+            self.calculate_underlying_asset_data()
+            self.underlying_asset_data = self.underlying_asset_data.reset_index()
+            self.underlying_asset_data = self.underlying_asset_data.set_index('date')
+            self.underlying_asset_data['log_returns'] = np.log(self.underlying_asset_data['close'] / self.underlying_asset_data['close'].shift(1))
 
-        daily_std = np.std(self.underlying_asset_data['log_returns'])
-        self.volatility = daily_std * np.sqrt(252.0)
+            daily_std = np.std(self.underlying_asset_data['log_returns'])
+            self.volatility = daily_std * np.sqrt(252.0)
 
         _logger.info(f'Calculated volatility = {self.volatility:.4f}')
 
@@ -126,8 +170,11 @@ class Pricing(ABC):
         '''
         Get latest price of the underlying asset.
         '''
-        self.calculate_underlying_asset_data()
-        self.spot_price = self.underlying_asset_data['close'][-1]
+        if self.context is not None:
+            self.spot_price = self.context.get_spot_price(self.ticker)
+        else:
+            self.calculate_underlying_asset_data()
+            self.spot_price = self.underlying_asset_data['close'][-1]
 
         _logger.info(f'Spot price = {self.spot_price:.2f}')
 
@@ -138,6 +185,21 @@ class Pricing(ABC):
         self.calculate_vega(spot_price=spot_price, time_to_maturity=time_to_maturity, volatility=volatility)
         self.calculate_rho(spot_price=spot_price, time_to_maturity=time_to_maturity, volatility=volatility)
 
+    def _prepare_inputs(self, spot_price: np.ndarray | float, time_to_maturity: np.ndarray | float, volatility: np.ndarray | float) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        '''
+        Convert inputs to float arrays, substituting the pricer's own values wherever an input is <= 0.0
+        '''
+        spot_price = np.asarray(spot_price, dtype=float)
+        spot_price = np.where(spot_price > 0.0, spot_price, self.spot_price)
+
+        time_to_maturity = np.asarray(time_to_maturity, dtype=float)
+        time_to_maturity = np.where(time_to_maturity > 0.0, time_to_maturity, self.time_to_maturity)
+
+        volatility = np.asarray(volatility, dtype=float)
+        volatility = np.where(volatility > 0.0, volatility, self.volatility)
+
+        return spot_price, time_to_maturity, volatility
+
     @abc.abstractmethod
     def calculate_delta(self, spot_price: float = -1.0, time_to_maturity: float = -1.0, volatility: float = -1.0) -> tuple[float, float]:
         return 0.0, 0.0
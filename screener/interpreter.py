@@ -1,3 +1,4 @@
+import numpy as np
 import pandas as pd
 
 from analysis.company import Company
@@ -8,6 +9,21 @@ _logger = logger.get_logger()
 VALID_TECHNICALS = ('high', 'low', 'close', 'volume', 'sma', 'rsi', 'beta', 'rating', 'mcap', 'value', 'true')
 VALID_CONDITIONALS = ('le', 'eq', 'ge')
 VALID_SERIES = ('min', 'max', 'none')
+VALID_PRICES = VALID_TECHNICALS[:4]
+VALID_INFORMATION = VALID_TECHNICALS[6:9]
+
+
+def validate_filter(filter: dict) -> None:
+    if filter['base']['technical'] not in VALID_TECHNICALS:
+        raise SyntaxError('Invalid "base technical" specified in script')
+    if filter['base']['series'] not in VALID_SERIES:
+        raise SyntaxError('Invalid "base series" specified in script')
+    if filter['conditional'] not in VALID_CONDITIONALS:
+        raise SyntaxError('Invalid "conditional" specified in script')
+    if filter['criteria']['technical'] not in VALID_TECHNICALS:
+        raise SyntaxError('Invalid "criteria technical" specified in script')
+    if filter['criteria']['series'] not in VALID_SERIES:
+        raise SyntaxError('Invalid "criteria series" specified in script')
 
 
 class Interpreter:
@@ -41,16 +57,7 @@ class Interpreter:
         return self.description
 
     def run(self) -> bool:
-        if self.filter['base']['technical'] not in VALID_TECHNICALS:
-            raise SyntaxError('Invalid "base technical" specified in script')
-        if self.filter['base']['series'] not in VALID_SERIES:
-            raise SyntaxError('Invalid "base series" specified in script')
-        if self.filter['conditional'] not in VALID_CONDITIONALS:
-            raise SyntaxError('Invalid "conditional" specified in script')
-        if self.filter['criteria']['technical'] not in VALID_TECHNICALS:
-            raise SyntaxError('Invalid "criteria technical" specified in script')
-        if self.filter['criteria']['series'] not in VALID_SERIES:
-            raise SyntaxError('Invalid "criteria series" specified in script')
+        validate_filter(self.filter)
 
         self.note = self.filter['note']
         self.weight = self.filter.get('weight', 1.0)
@@ -296,3 +303,252 @@ class Interpreter:
         if self.company.ta is not None:
             value = self.company.ta.calc_sma(int(self.criteria_length))[sl]
         return value
+
+
+class PanelInterpreter:
+    '''
+    Evaluates screen filters for a whole list of companies at once, giving the same successes, scores and
+    descriptions as running an Interpreter per company. Histories are held as right-aligned (ticker x day)
+    arrays padded with NaN on the left, so the last day of every ticker is the last column and a filter's
+    start/stop become per-row column bounds. Technicals are computed once per (technical, length) for all
+    tickers.
+
+    :param companies: <list> Companies to screen. Histories are loaded if not already available.
+    :param days: <int> Days of history the companies were loaded with (limits technical lengths)
+    '''
+
+    def __init__(self, companies: list[Company], days: int):
+        self.companies = companies
+        self.days = days
+        self.tickers = [company.ticker for company in companies]
+        self.fields: dict[str, np.ndarray] = {}
+
+        for company in companies:
+            if company.history.empty:
+                company.get_close()  # Loads the history if available
+
+        histories = [company.history for company in companies]
+        self.lengths = np.array([len(history) for history in histories], dtype=int)
+        self.width = max(int(self.lengths.max(initial=0)), 1)
+
+        for field in VALID_PRICES:
+            array = np.full((len(companies), self.width), np.nan)
+            for row, history in enumerate(histories):
+                if not history.empty:
+                    array[row, self.width - len(history):] = history[field].to_numpy(dtype=float)
+
+            self.fields[field] = array
+
+        self._technicals: dict[tuple[str, int], np.ndarray] = {}
+        self._information: dict[str, np.ndarray] = {}
+
+    def __repr__(self):
+        return f'<PanelInterpreter ({len(self.tickers)} tickers x {self.width} days)>'
+
+    def run(self, filter: dict) -> tuple[np.ndarray, np.ndarray, list[str]]:
+        ''' Evaluate one filter for every company
+
+        :return: <ndarray>, <ndarray>, <list> Success, score and description of each company
+        '''
+
+        validate_filter(filter)
+
+        count = len(self.tickers)
+        base = filter['base']
+        criteria = filter['criteria']
+        conditional = filter['conditional']
+        weight = filter.get('weight', 1.0)
+
+        if base['technical'] == VALID_TECHNICALS[10]:  # true
+            return np.ones(count, dtype=bool), np.ones(count), [''] * count
+
+        # Base value
+        if base['technical'] in VALID_TECHNICALS[2:6]:  # close, volume, sma, rsi
+            base_values, base_valid = self._reduce(base['technical'], base['length'], base['start'], base['stop'], VALID_SERIES[2])
+        elif base['technical'] in VALID_INFORMATION:  # beta, rating, mcap
+            base_values, base_valid = self._get_information(base['technical']), np.ones(count, dtype=bool)
+        else:
+            raise SyntaxError('Invalid "base technical" specified in screen file')
+
+        # Criteria value
+        series = VALID_SERIES[0] if conditional == VALID_CONDITIONALS[1] else criteria['series']  # eq always uses min
+        if criteria['technical'] == VALID_TECHNICALS[9]:  # value
+            criteria_values, criteria_valid = np.full(count, float(criteria['value'])), np.ones(count, dtype=bool)
+        elif criteria['technical'] in VALID_TECHNICALS[:5]:  # high, low, close, volume, sma
+            criteria_values, criteria_valid = self._reduce(criteria['technical'], criteria['length'], criteria['start'], criteria['stop'], series)
+        else:
+            raise SyntaxError('Invalid "criteria technical" specified in screen file')
+
+        base_values = base_values * base['factor']
+        criteria_values = criteria_values * criteria['factor']
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            if conditional == VALID_CONDITIONALS[0]:  # le
+                successes = base_values <= criteria_values
+                scores = np.where(base_values > 0, criteria_values / base_values, 1.0)
+            elif conditional == VALID_CONDITIONALS[1]:  # eq
+                successes = base_values == criteria_values
+                scores = np.ones(count)
+            else:  # ge
+                successes = base_values >= criteria_values
+                scores = np.where(criteria_values > 0, base_values / criteria_values, 1.0)
+
+        successes &= criteria_valid
+        scores = np.where(criteria_valid, scores, 1.0)
+        scores = scores * weight if weight > 0.0 else np.ones(count)
+
+        # Companies without a base value fail without weighting
+        successes &= base_valid
+        scores = np.where(base_valid, scores, 1.0)
+        criteria_values = np.where(criteria_valid, criteria_values, 0.0)
+
+        descriptions = [
+            self._describe(filter, ticker, success, score, base_value if valid else None, criteria_value)
+            for ticker, success, score, base_value, valid, criteria_value
+            in zip(self.tickers, successes.tolist(), scores.tolist(), base_values.tolist(), base_valid.tolist(), criteria_values.tolist())
+        ]
+
+        return successes, scores, descriptions
+
+    def get_last_close(self) -> np.ndarray:
+        return np.where(self.lengths > 0, self.fields['close'][:, -1], 0.0)
+
+    def _get_series(self, technical: str, length: int) -> np.ndarray | None:
+        if technical in VALID_PRICES:
+            return self.fields[technical]
+
+        length = int(length)
+        if length <= 5 or length >= self.days:
+            _logger.warning(f'Invalid interval for {technical.upper()}')
+            return None
+
+        key = (technical, length)
+        if key not in self._technicals:
+            if technical == VALID_TECHNICALS[4]:  # sma
+                self._technicals[key] = _calculate_sma(self.fields['close'], length)
+            else:  # rsi
+                self._technicals[key] = _calculate_rsi(self.fields['close'], length)
+
+        return self._technicals[key]
+
+    def _reduce(self, technical: str, length: int, start: int, stop: int, series: str) -> tuple[np.ndarray, np.ndarray]:
+        ''' Apply each company's [start:stop] slice to a series and reduce it to one value per company
+
+        :return: <ndarray>, <ndarray> Reduced values, and whether each company's slice was non-empty
+        '''
+
+        count = len(self.tickers)
+        array = self._get_series(technical, length)
+        if array is None:
+            return np.full(count, np.nan), np.zeros(count, dtype=bool)
+
+        first, last = self._get_bounds(start, stop)
+        valid = last > first
+
+        if series == VALID_SERIES[2]:  # none
+            columns = np.clip(last - 1, 0, self.width - 1)
+            values = np.take_along_axis(array, columns[:, np.newaxis], axis=1)[:, 0]
+        else:
+            columns = np.arange(self.width)
+            inside = (columns >= first[:, np.newaxis]) & (columns < last[:, np.newaxis])
+            masked = np.where(inside, array, np.nan)
+            reduce = np.fmin.reduce if series == VALID_SERIES[0] else np.fmax.reduce  # Skip NaN like pandas min/max
+            values = reduce(masked, axis=1)
+
+        return np.where(valid, values, np.nan), valid
+
+    def _get_bounds(self, start: int, stop: int) -> tuple[np.ndarray, np.ndarray]:
+        ''' Column bounds of each company's series[start:stop], with 0 meaning open-ended as in Interpreter '''
+
+        lengths = self.lengths
+
+        if start == 0:
+            first = np.zeros_like(lengths)
+        elif start < 0:
+            first = np.maximum(lengths + start, 0)
+        else:
+            first = np.minimum(start, lengths)
+
+        if stop == 0:
+            last = lengths.copy()
+        elif stop < 0:
+            last = np.maximum(lengths + stop, 0)
+        else:
+            last = np.minimum(stop, lengths)
+
+        offset = self.width - lengths
+        return first + offset, np.maximum(last, first) + offset
+
+    def _get_information(self, technical: str) -> np.ndarray:
+        if technical not in self._information:
+            values = []
+            for company in self.companies:
+                if technical == VALID_TECHNICALS[6]:  # beta
+                    values.append(company.get_beta())
+                elif technical == VALID_TECHNICALS[7]:  # rating
+                    values.append(company.get_rating())
+                else:  # mcap
+                    values.append(float(company.get_marketcap()))
+
+            self._information[technical] = np.array(values, dtype=float)
+
+        return self._information[technical]
+
+    @staticmethod
+    def _describe(filter: dict, ticker: str, success: bool, score: float, base: float | None, criteria: float) -> str:
+        pf = 'Pass' if success else 'Fail'
+        base_ = filter['base']
+        criteria_ = filter['criteria']
+        weight = filter.get('weight', 1.0)
+
+        if base is not None:
+            basef = f'{base:.2f}' if base < 1e5 else f'{base:.1e}'
+            criteriaf = f'{criteria:.2f}' if criteria < 1e5 else f'{criteria:.1e}'
+        else:
+            basef = '***'
+            criteriaf = '***'
+
+        return \
+            f'{ticker:6s} {pf} {score:6.2f}: {filter["note"]:18s}: ' + \
+            f'{base_["technical"]}({base_["length"]})/{basef}@{base_["factor"]:.2f} ' + \
+            f'{filter["conditional"]} ' + \
+            f'{criteria_["technical"]}({criteria_["length"]})/{criteria_["start"]}/{criteria_["series"]}/{criteriaf}@{criteria_["factor"]:.2f} ' + \
+            f'w={weight:.1f}'
+
+
+def _calculate_sma(close: np.ndarray, length: int) -> np.ndarray:
+    ''' Rolling mean of right-aligned rows, averaging fewer values at the start of each row (ta fillna=True) '''
+
+    values = np.nan_to_num(close)
+    counts = (~np.isnan(close)).astype(float)
+
+    sums = np.cumsum(values, axis=1)
+    totals = np.cumsum(counts, axis=1)
+    sums[:, length:] = sums[:, length:] - sums[:, :-length]
+    totals[:, length:] = totals[:, length:] - totals[:, :-length]
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return sums / totals
+
+
+def _calculate_rsi(close: np.ndarray, length: int) -> np.ndarray:
+    ''' Wilder RSI of right-aligned rows matching ta.momentum.rsi(fillna=True) '''
+
+    difference = np.diff(close, axis=1, prepend=np.nan)
+    up = np.where(difference > 0.0, difference, 0.0)
+    down = np.where(difference < 0.0, -difference, 0.0)
+
+    # Exponential averages as computed by pandas ewm(adjust=False). Leading padding stays at zero
+    alpha = 1.0 / length
+    old = 1.0 - alpha
+    total = old + alpha
+    average_up = np.empty_like(up)
+    average_down = np.empty_like(down)
+    average_up[:, 0] = up[:, 0]
+    average_down[:, 0] = down[:, 0]
+    for column in range(1, up.shape[1]):
+        average_up[:, column] = (old * average_up[:, column - 1] + alpha * up[:, column]) / total
+        average_down[:, column] = (old * average_down[:, column - 1] + alpha * down[:, column]) / total
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(average_down == 0.0, 100.0, 100.0 - (100.0 / (1.0 + average_up / average_down)))
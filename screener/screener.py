@@ -1,17 +1,21 @@
+import os
 import json
 import random
 import datetime as dt
 from pathlib import Path
 from concurrent import futures
 from dataclasses import dataclass
+from collections import namedtuple
 
 import numpy as np
 import pandas as pd
 
 from base import Threaded
+from base.executor import Executor
 from analysis.company import Company
+from analysis.correlate import remove_duplicates
 from data import store as store
-from .interpreter import Interpreter
+from .interpreter import Interpreter, PanelInterpreter
 from utils import ui, cache, logger
 
 
@@ -23,6 +27,11 @@ SCREEN_INIT_NAME = 'init'
 
 CACHE_TYPE = 'scr'
 
+SCREEN_BATCH = 10   # Companies per threaded task
+PROCESS_CHUNKS = 4  # Ticker chunks per worker process
+
+record_type = namedtuple('record_type', ['ticker', 'successes', 'scores', 'descriptions', 'price', 'information'])
+
 
 @dataclass
 class Result:
@@ -111,7 +120,7 @@ class Screener(Threaded):
         return f'{self.table} - {self.screen}'
 
     @Threaded.threaded
-    def run(self, use_cache: bool = True, save_results: bool = True) -> None:
+    def run(self, use_cache: bool = True, save_results: bool = True, vectorized: bool = False, processes: bool = False) -> None:
         self.task_total = len(self.companies)
 
         if use_cache and self.cache_available:
@@ -139,23 +148,48 @@ class Screener(Threaded):
             self.valids = []
             self.errors = []
             self.task_state = 'None'
-            self.concurrency = 10 if len(self.companies) > 10 else 1
+            if processes:
+                self.concurrency = min(os.cpu_count() or 1, len(self.companies))
+            else:
+                self.concurrency = 10 if len(self.companies) > 10 else 1
 
             if self.task_total > 1:
                 _logger.info(f'Screening {self.task_total} symbols from {self.table} table (days={self.days}, end={self.backtest})')
             else:
                 _logger.info(f'Screening {self.table} (days={self.days}, end={self.backtest})')
 
-            # Randomize and split up the lists
-            random.shuffle(self.companies)
-            companies: list[np.ndarray] = np.array_split(self.companies, self.concurrency)
-            companies = [i.tolist() for i in companies if i is not None]
-
-            with futures.ThreadPoolExecutor(max_workers=self.concurrency) as executor:
-                self.task_futures = [executor.submit(self._run, list) for list in companies]
+            # Worker processes load their own histories, so only the other paths need them here
+            if not processes:
+                self._load_histories()
 
-                for future in futures.as_completed(self.task_futures):
-                    _logger.info(f'Thread completed: {future.result()}')
+            if vectorized:
+                self._run_vectorized()
+            elif processes:
+                self._run_processes()
+            else:
+                # Threads take small batches from a shared queue so a slow batch doesn't hold up the rest
+                random.shuffle(self.companies)
+                executor = Executor(workers=self.concurrency, batch=SCREEN_BATCH)
+                self.task_futures = executor.futures
+
+                for result in executor.map(self._run, self.companies):
+                    if result.error is not None:
+                        self.task_state = str(result.error)
+                        _logger.error(f'Exception: {self.task_state}')
+                    if self.task_state != 'None':
+                        break
+
+                if self.task_state != 'None':
+                    self.task_completed = self.task_total
+                    self.results = []
+                    self.valids = []
+
+                # Each company's Technical is shared across all filters of the screen
+                technicals = [company.ta for company in self.companies if company.ta is not None]
+                if technicals:
+                    hits = sum(ta.memo_hits for ta in technicals)
+                    misses = sum(ta.memo_misses for ta in technicals)
+                    _logger.info(f'Technical memo: {hits} hits, {misses} misses')
 
             # Extract the successful screens, sort based on score, then summarize
             self.valids = [result for result in self.results if result]
@@ -167,6 +201,23 @@ class Screener(Threaded):
             if save_results:
                 cache.dump(self.results, self.cache_name, CACHE_TYPE)
 
+    def remove_duplicates(self, clusters: pd.DataFrame) -> int:
+        ''' Drop valid results whose cluster (see Correlate.cluster) is already held by a higher scoring result, so
+        near-identical tickers aren't each passed on to have their option chains fetched
+
+        :return: <int> Number of results removed
+        '''
+
+        count = len(self.valids)
+        tickers = set(remove_duplicates([result.company.ticker for result in self.valids], clusters))
+        self.valids = [result for result in self.valids if result.company.ticker in tickers]
+
+        if len(self.valids) < count:
+            self.summary = summarize_results(self.valids)
+            _logger.info(f'Removed {count - len(self.valids)} near-identical result(s)')
+
+        return count - len(self.valids)
+
     def get_score(self, ticker: str) -> float:
         ticker = ticker.upper()
         score = -1.0
@@ -179,28 +230,18 @@ class Screener(Threaded):
 
     def _run(self, companies: list[Company]) -> None:
         for company in companies:
-            successes = []
-            scores = []
-            descriptions = []
             self.task_ticker = str(company)
-            for filter in self.scripts:
-                try:
-                    interpreter = Interpreter(company, filter)
-                    successes.append(interpreter.run())
-                    scores.append(interpreter.score)
-                    descriptions.append(interpreter.description)
-                except SyntaxError as e:
-                    self.task_state = str(e)
-                    _logger.error(f'SyntaxError: {self.task_state}')
-                    break
-                except RuntimeError as e:
-                    self.task_state = str(e)
-                    _logger.error(f'RuntimeError: {self.task_state}')
-                    break
-                except Exception as e:
-                    self.task_state = str(e)
-                    _logger.error(f'Exception: {self.task_state} for {company}')
-                    break
+            try:
+                successes, scores, descriptions = _screen_company(company, self.scripts)
+            except SyntaxError as e:
+                self.task_state = str(e)
+                _logger.error(f'SyntaxError: {self.task_state}')
+            except RuntimeError as e:
+                self.task_state = str(e)
+                _logger.error(f'RuntimeError: {self.task_state}')
+            except Exception as e:
+                self.task_state = str(e)
+                _logger.error(f'Exception: {self.task_state} for {company}')
 
             if self.task_state == 'None':
                 self.task_completed += 1
@@ -215,6 +256,90 @@ class Screener(Threaded):
                 self.valids = []
                 break
 
+    def _run_processes(self) -> None:
+        ''' Screen chunks of tickers in worker processes, each loading its own histories over its own connections '''
+
+        companies = {company.ticker: company for company in self.companies}
+        tickers = list(companies.keys())
+        random.shuffle(tickers)
+
+        # Several chunks per worker keeps the workers evenly loaded and the progress current
+        chunks = np.array_split(tickers, self.concurrency * PROCESS_CHUNKS)
+        chunks = [chunk.tolist() for chunk in chunks if chunk.size > 0]
+
+        with futures.ProcessPoolExecutor(max_workers=self.concurrency, initializer=store.dispose_engine) as executor:
+            self.task_futures = [executor.submit(_run_process, chunk, self.scripts, self.days, self.backtest, self.live) for chunk in chunks]
+
+            for future in futures.as_completed(self.task_futures):
+                try:
+                    records = future.result()
+                except SyntaxError as e:
+                    self.task_state = str(e)
+                    _logger.error(f'SyntaxError: {self.task_state}')
+                except RuntimeError as e:
+                    self.task_state = str(e)
+                    _logger.error(f'RuntimeError: {self.task_state}')
+                except Exception as e:
+                    self.task_state = str(e)
+                    _logger.error(f'Exception: {self.task_state}')
+
+                if self.task_state != 'None':
+                    executor.shutdown(wait=False, cancel_futures=True)
+                    self.task_completed = self.task_total
+                    self.results = []
+                    self.valids = []
+                    break
+
+                for record in records:
+                    company = companies[record.ticker]
+                    if record.information and not company.information:
+                        company.information = record.information
+
+                    self.results.append(Result(company, self.screen, record.successes, record.scores, record.descriptions, record.price))
+                    if bool(self.results[-1]):
+                        self.task_success += 1
+
+                    self.task_ticker = record.ticker
+                    self.task_completed += 1
+
+                _logger.info(f'Process completed: {len(records)} symbols')
+
+    def _run_vectorized(self) -> None:
+        ''' Evaluate each filter once across all companies instead of once per company '''
+
+        self.task_ticker = self.table
+        try:
+            interpreter = PanelInterpreter(self.companies, self.days)
+            evaluations = [interpreter.run(filter) for filter in self.scripts]
+        except SyntaxError as e:
+            self.task_state = str(e)
+            _logger.error(f'SyntaxError: {self.task_state}')
+        except RuntimeError as e:
+            self.task_state = str(e)
+            _logger.error(f'RuntimeError: {self.task_state}')
+        except Exception as e:
+            self.task_state = str(e)
+            _logger.error(f'Exception: {self.task_state}')
+
+        if self.task_state == 'None':
+            # The last close is the current price unless backtesting
+            prices = interpreter.get_last_close().tolist() if self.backtest == 0 else [store.get_last_price(ticker) for ticker in interpreter.tickers]
+
+            for index, company in enumerate(self.companies):
+                successes = [bool(evaluation[0][index]) for evaluation in evaluations]
+                scores = [float(evaluation[1][index]) for evaluation in evaluations]
+                descriptions = [evaluation[2][index] for evaluation in evaluations]
+
+                self.results.append(Result(company, self.screen, successes, scores, descriptions, prices[index]))
+                if bool(self.results[-1]):
+                    self.task_success += 1
+
+            self.task_completed = self.task_total
+        else:
+            self.task_completed = self.task_total
+            self.results = []
+            self.valids = []
+
     def _load_screen(self) -> bool:
         self.scripts = []
         path = Path(self.script_path)
@@ -245,10 +370,8 @@ class Screener(Threaded):
             tickers = [self.table]
 
         if len(tickers) > 0:
-            try:
-                self.companies = [Company(ticker, self.days, backtest=self.backtest, live=self.live) for ticker in tickers]
-            except ValueError as e:
-                _logger.warning(f'Invalid ticker: {e}')
+            # Tickers come from the store's own lists (or were checked above), and histories are loaded when run
+            self.companies = [Company(ticker, self.days, backtest=self.backtest, live=self.live, validated=True) for ticker in tickers]
 
             if len(self.companies) > 1:
                 _logger.info(f'Opened {len(self.companies)} symbols from {self.table} table')
@@ -259,6 +382,16 @@ class Screener(Threaded):
 
         return bool(self.companies)
 
+    def _load_histories(self) -> None:
+        ''' Load all histories in a few bulk queries, rather than one per company on first use '''
+
+        if not self.live:
+            histories = store.get_history_bulk([company.ticker for company in self.companies], self.days, end=self.backtest)
+            for company in self.companies:
+                company.set_history(histories.get(company.ticker, pd.DataFrame()))
+
+            _logger.info(f'Loaded {len(histories)} histories')
+
     def _add_init_script(self) -> bool:
         path = Path(self.init_path)
         if path.is_file():
@@ -274,6 +407,34 @@ class Screener(Threaded):
         return bool(self.scripts)
 
 
+def _screen_company(company: Company, scripts: list[dict]) -> tuple[list[bool], list[float], list[str]]:
+    successes = []
+    scores = []
+    descriptions = []
+    for filter in scripts:
+        interpreter = Interpreter(company, filter)
+        successes.append(interpreter.run())
+        scores.append(interpreter.score)
+        descriptions.append(interpreter.description)
+
+    return successes, scores, descriptions
+
+
+def _run_process(tickers: list[str], scripts: list[dict], days: int, backtest: int, live: bool) -> list[record_type]:
+    ''' Worker process entry point. Returns compact records rather than Companies to keep the transfer small '''
+
+    histories = {} if live else store.get_history_bulk(tickers, days, end=backtest)
+
+    records = []
+    for ticker in tickers:
+        company = Company(ticker, days, backtest=backtest, live=live, history=histories.get(ticker), validated=True)
+        successes, scores, descriptions = _screen_company(company, scripts)
+        price = store.get_last_price(ticker)
+        records.append(record_type(ticker, successes, scores, descriptions, price, company.information))
+
+    return records
+
+
 def analyze_results(table: str) -> tuple[pd.DataFrame, pd.DataFrame]:
     table = table.lower()
 
@@ -9,8 +9,11 @@ import strategies as s
 from analysis.company import Company
 from options.option import Option
 from pricing.pricing import Pricing
+from pricing.context import MarketContext
 from pricing.blackscholes import BlackScholes
 from pricing.montecarlo import MonteCarlo
+from pricing.binomial import Binomial
+from pricing import implied
 from utils import logger
 from utils import math as m
 
@@ -30,7 +33,8 @@ class Leg:
                  direction: s.DirectionType,
                  strike: float,
                  expiry: dt.datetime,
-                 volatility: tuple[float, float]):
+                 volatility: tuple[float, float],
+                 context: MarketContext | None = None):
 
         self.quantity: int = quantity
         self.option: Option = Option(ticker, product, strike, expiry, volatility)
@@ -39,6 +43,7 @@ class Leg:
         self.direction: s.DirectionType = direction
         self.value_table: pd.DataFrame = pd.DataFrame()
         self.range: m.range_type = m.range_type(0.0, 0.0, 0.0)
+        self.context: MarketContext | None = context
 
     def __str__(self):
         return self.description()
@@ -49,9 +54,11 @@ class Leg:
         if self.validate():
             # Build the pricer
             if self.pricing_method == p.PricingType.BlackScholes:
-                self.pricer = BlackScholes(self.company.ticker, self.option.expiry, self.option.strike)
+                self.pricer = BlackScholes(self.company.ticker, self.option.expiry, self.option.strike, context=self.context)
             elif self.pricing_method == p.PricingType.MonteCarlo:
-                self.pricer = MonteCarlo(self.company.ticker, self.option.expiry, self.option.strike)
+                self.pricer = MonteCarlo(self.company.ticker, self.option.expiry, self.option.strike, context=self.context)
+            elif self.pricing_method == p.PricingType.Binomial:
+                self.pricer = Binomial(self.company.ticker, self.option.expiry, self.option.strike, context=self.context)
             else:
                 raise ValueError('Unknown pricing model')
 
@@ -63,6 +70,9 @@ class Leg:
             self.option.rate = self.pricer.risk_free_rate
             self.option.time_to_maturity = self.pricer.time_to_maturity
 
+            # Solve implied volatility from the loaded chain (self.pricer must be valid)
+            self.calculate_implied_volatility()
+
             # Calculate volatility (self.pricer must be valid)
             self.calculate_volatility()
 
@@ -115,6 +125,25 @@ class Leg:
 
         return call, put
 
+    def recalculate_table(self, spot_price: np.ndarray, time_to_maturity: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        if self.pricer is not None:
+            call, put = self.pricer.calculate_price_table(spot_price, time_to_maturity, volatility=self.option.volatility_eff)
+        else:
+            raise AssertionError('Must call calculate() prior to recalculate_table()')
+
+        return call, put
+
+    def calculate_implied_volatility(self) -> None:
+        if not self.option.chain.empty:
+            # Solve the whole chain once per expiry, then interpolate from the cached surface
+            surface = implied.get_surface(self.company.ticker)
+            if not surface.has_expiry(self.option.time_to_maturity, self.option.product.value):
+                surface.add_chain(self.option.chain, self.pricer.spot_price, self.option.time_to_maturity, self.pricer.risk_free_rate, self.pricer.dividend)
+
+            volatility = surface.get_volatility(self.option.strike, self.option.time_to_maturity)
+            if volatility > 0.0:
+                self.option.volatility_implied = volatility
+
     def calculate_volatility(self):
         if self.option.volatility_user > 0.0:
             self.option.volatility_eff = self.option.volatility_user
@@ -135,53 +164,32 @@ class Leg:
             cols, step = self.calculate_date_step()
 
             if cols > 1:
-                row: list[float] = []
-                table = []
-                col_index = []
-                row_index = []
-
                 # Create list of dates to be used as the df columns
                 today = dt.datetime.today().replace(hour=0, minute=0, second=0, microsecond=0)
 
-                col_index.append(str(today))
+                dates = [today]
                 while today < self.option.expiry:
                     today += dt.timedelta(days=step)
-                    col_index.append(str(today))
+                    dates.append(today)
 
                 if self.range.min <= 0.0 or self.range.max <= 0.0 or self.range.step <= 0.0:
                     self.range = m.calculate_min_max_step(self.option.strike)
 
-                # Calculate option price every day till expiry
-                for spot in np.arange(self.range.min, self.range.max, self.range.step):
-                    row = []
-                    for item in col_index:
-                        maturity_date = dt.datetime.strptime(item, '%Y-%m-%d %H:%M:%S')
-                        time_to_maturity = self.option.expiry - maturity_date
-                        decimaldays_to_maturity = time_to_maturity.days / 365.0
-
-                        # Compensate for zero delta days to provide small fraction of day (ex: expiration day)
-                        if decimaldays_to_maturity < 0.0003:
-                            decimaldays_to_maturity = 0.00001
-
-                        price_call, price_put = self.recalculate(spot_price=spot, time_to_maturity=decimaldays_to_maturity)
-
-                        if self.option.product == s.ProductType.Call:
-                            row.append(price_call)
-                        else:
-                            row.append(price_put)
+                spots = np.arange(self.range.min, self.range.max, self.range.step)
+                decimaldays_to_maturity = np.array([(self.option.expiry - date).days / 365.0 for date in dates])
 
-                    table.append(row)
+                # Compensate for zero delta days to provide small fraction of day (ex: expiration day)
+                decimaldays_to_maturity[decimaldays_to_maturity < 0.0003] = 0.00001
 
-                    # Create row index
-                    row_index.append(spot)
+                # Calculate option price every day till expiry in a single pass (spot rows x date columns)
+                table_call, table_put = self.recalculate_table(spots[:, np.newaxis], decimaldays_to_maturity[np.newaxis, :])
+                table = table_call if self.option.product == s.ProductType.Call else table_put
 
-                # Strip the time from the datetime string
-                for index, item in enumerate(col_index):
-                    day = dt.datetime.strptime(item, '%Y-%m-%d %H:%M:%S').date()
-                    col_index[index] = f'{str(day.strftime("%b"))}-{str(day.day)}-{str(day.year)}'
+                # Strip the time from the dates
+                col_index = [f'{date:%b}-{date.day}-{date.year}' for date in dates]
 
                 # Finally, create the dataframe then reverse the row order
-                value = pd.DataFrame(table, index=row_index, columns=col_index)
+                value = pd.DataFrame(table, index=spots.tolist(), columns=col_index)
                 value = value.iloc[::-1]
 
         else:
@@ -199,7 +207,12 @@ class Leg:
         if greeks:
             output = f'Delta={self.option.delta:.3f}, gamma={self.option.gamma:.3f}, theta={self.option.theta:.3f}, vega={self.option.vega:.3f}, rho={self.option.rho:.3f}'
         elif self.option.price_calc > 0.0:
-            d2 = 'bs' if self.pricing_method == p.PricingType.BlackScholes else p.PricingType.MonteCarlo
+            if self.pricing_method == p.PricingType.BlackScholes:
+                d2 = 'bs'
+            elif self.pricing_method == p.PricingType.MonteCarlo:
+                d2 = 'mc'
+            else:
+                d2 = 'bt'
             if self.option.volatility_user > 0.0:
                 d3 = 'uv'
             elif self.option.volatility_user == 0.0:
@@ -255,5 +268,7 @@ class Leg:
             valid = True
         elif self.pricing_method == p.PricingType.MonteCarlo:
             valid = True
+        elif self.pricing_method == p.PricingType.Binomial:
+            valid = True
 
         return valid
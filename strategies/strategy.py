@@ -9,6 +9,7 @@ import strategies as s
 import pricing as p
 from strategies.leg import Leg
 from strategies.analysis import Analysis
+from pricing.context import MarketContext
 from options.chain import Chain
 from data import store
 from utils import math as m
@@ -57,6 +58,7 @@ class Strategy(ABC, Threaded):
         self.load_contracts = load_contracts
 
         self.pricing_method = p.PricingType.BlackScholes
+        self.context: MarketContext | None = None
         self.chain: Chain = Chain(self.ticker)
         self.analysis = Analysis(ticker=self.ticker)
         self.legs: list[Leg] = []
@@ -112,7 +114,7 @@ class Strategy(ABC, Threaded):
             leg.option.expiry = date
 
     def add_leg(self, quantity: int, product: s.ProductType, direction: s.DirectionType, strike: float, expiry: dt.datetime, volatility: tuple[float, float]) -> int:
-        leg = Leg(self.ticker, quantity, product, direction, strike, expiry, volatility)
+        leg = Leg(self.ticker, quantity, product, direction, strike, expiry, volatility, context=self.context)
         self.legs.append(leg)
 
         return len(self.legs)
@@ -122,6 +124,11 @@ class Strategy(ABC, Threaded):
         for leg in self.legs:
             leg.pricing_method = method
 
+    def set_context(self, context: MarketContext | None):
+        self.context = context
+        for leg in self.legs:
+            leg.context = context
+
     def fetch_contracts(self, expiry: dt.datetime, strike: float = -1.0) -> list[tuple[str, pd.DataFrame]]:
         # Works for one-legged strategies. Override for others
         expiry_tuple = self.chain.get_expiry()
@@ -11,6 +11,8 @@ from strategies.put import Put
 from strategies.vertical import Vertical
 from strategies.iron_condor import IronCondor
 from strategies.iron_butterfly import IronButterfly
+from pricing.context import MarketContext
+from analysis.correlate import remove_duplicates
 from utils import logger
 
 
@@ -39,7 +41,7 @@ strategy_errors = []
 strategy_futures = []
 
 
-def analyze(strategies: list[strategy_type]) -> None:
+def analyze(strategies: list[strategy_type], context: MarketContext | None = None, clusters: pd.DataFrame | None = None) -> None:
     global strategy_state
     global strategy_msg
     global strategy_parameters
@@ -68,8 +70,17 @@ def analyze(strategies: list[strategy_type]) -> None:
 
         strategy_completed += 1
 
+    if clusters is not None and not clusters.empty:
+        # Only the first (best) ticker of each cluster of near-identical tickers has its contracts fetched
+        tickers = set(remove_duplicates(list(dict.fromkeys(strategy.ticker for strategy in strategies)), clusters))
+        strategies = [strategy for strategy in strategies if strategy.ticker in tickers]
+
     strategy_total = len(strategies)
     if strategy_total > 0:
+        # Share one market snapshot across all strategies so each ticker's rate and history are fetched once
+        if context is None:
+            context = MarketContext()
+
         strategy_state = 'Creating'
         item: Strategy
         items: list[Strategy] = []
@@ -82,30 +93,35 @@ def analyze(strategies: list[strategy_type]) -> None:
                     item = Call(strategy.ticker, s.ProductType.Call, strategy.direction, strategy.strike, quantity=1,
                                 expiry=strategy.expiry, volatility=strategy.volatility, load_contracts=strategy.load_contracts)
                     item.set_score_screen(strategy.score_screen)
+                    item.set_context(context)
                     items.append(item)
                 elif strategy.strategy == s.StrategyType.Put:
                     strategy_msg = f'{strategy.ticker}: ${strategy.strike:.2f} {strategy.direction.value} {strategy.product.value}{decorator}'
                     item = Put(strategy.ticker, s.ProductType.Put, strategy.direction, strategy.strike, quantity=1,
                                expiry=strategy.expiry, volatility=strategy.volatility, load_contracts=strategy.load_contracts)
                     item.set_score_screen(strategy.score_screen)
+                    item.set_context(context)
                     items.append(item)
                 elif strategy.strategy == s.StrategyType.Vertical:
                     strategy_msg = f'{strategy.ticker}: ${strategy.strike:.2f} {strategy.direction.value} {strategy.strategy.value} {strategy.product.value}{decorator}'
                     item = Vertical(strategy.ticker, strategy.product, strategy.direction, strategy.strike, width=strategy.width1, quantity=1,
                                     expiry=strategy.expiry, volatility=strategy.volatility, load_contracts=strategy.load_contracts)
                     item.set_score_screen(strategy.score_screen)
+                    item.set_context(context)
                     items.append(item)
                 elif strategy.strategy == s.StrategyType.IronCondor:
                     strategy_msg = f'{strategy.ticker}: ${strategy.strike:.2f}{decorator}'
                     item = IronCondor(strategy.ticker, s.ProductType.Hybrid, strategy.direction, strategy.strike, width1=strategy.width1, width2=strategy.width2, quantity=1,
                                       expiry=strategy.expiry, volatility=strategy.volatility, load_contracts=strategy.load_contracts)
                     item.set_score_screen(strategy.score_screen)
+                    item.set_context(context)
                     items.append(item)
                 elif strategy.strategy == s.StrategyType.IronButterfly:
                     strategy_msg = f'{strategy.ticker}: ${strategy.strike:.2f}{decorator}'
                     item = IronButterfly(strategy.ticker, s.ProductType.Hybrid, strategy.direction, strategy.strike, width1=strategy.width1, quantity=1,
                                          expiry=strategy.expiry, volatility=strategy.volatility, load_contracts=strategy.load_contracts)
                     item.set_score_screen(strategy.score_screen)
+                    item.set_context(context)
                     items.append(item)
         except Exception as e:
             strategy_state = f'{items[-1].ticker}: {str(sys.exc_info()[1])}'
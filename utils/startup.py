@@ -0,0 +1,80 @@
+'''
+Console startup benchmark using the interpreter's import profiler (python -X importtime)
+'''
+
+import sys
+import time
+import subprocess
+import collections
+from pathlib import Path
+
+from utils import logger
+
+
+_logger = logger.get_logger()
+
+STARTUP_BUDGET = 1.0  # Max secs for a console to import (time-to-menu)
+CONSOLES = ['console_screener', 'console_manager']
+ROOT = Path(__file__).resolve().parent.parent
+
+import_type = collections.namedtuple('import_type', ['module', 'self', 'cumulative'])
+
+
+def measure_imports(module: str) -> tuple[float, list[import_type]]:
+    ''' Import a module in a fresh interpreter with the import profiler enabled
+
+    :return: <float> Secs to start the interpreter and import the module, and <list[import_type]> the imports made
+        directly by the module (secs), slowest first
+    '''
+
+    tic = time.perf_counter()
+    process = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'], cwd=ROOT, capture_output=True, text=True)
+    toc = time.perf_counter()
+
+    if process.returncode != 0:
+        raise ImportError(f'Unable to import {module}: {process.stderr.splitlines()[-1] if process.stderr else ""}')
+
+    imports = []
+    children = []
+    for line in process.stderr.splitlines():
+        # Lines are 'import time: <self us> | <cumulative us> | <module>', with two spaces of indent per level of
+        # nesting, and each module is listed after the imports it made
+        if line.startswith('import time:') and not line.endswith('imported package'):
+            self, cumulative, name = line[len('import time:'):].split('|')
+            depth = (len(name) - len(name.lstrip()) - 1) // 2
+            if depth == 0:
+                if name.strip() == module:
+                    imports = children
+                children = []
+            elif depth == 1:
+                children.append(import_type(name.strip(), int(self) / 1e6, int(cumulative) / 1e6))
+
+    imports = sorted(imports, key=lambda i: i.cumulative, reverse=True)
+
+    return toc - tic, imports
+
+
+def check_startup(modules: list[str] = CONSOLES, budget: float = STARTUP_BUDGET, top: int = 10) -> bool:
+    ''' Report the import time of each module against the startup budget
+
+    :return: <bool> True if every module is within budget
+    '''
+
+    within = True
+    for module in modules:
+        elapsed, imports = measure_imports(module)
+        status = 'ok' if elapsed <= budget else 'OVER BUDGET'
+        within = within and elapsed <= budget
+
+        print(f'{module}: {elapsed:.3f}s (budget {budget:.3f}s) {status}')
+        for item in imports[:top]:
+            print(f'  {item.cumulative:8.3f}s  {item.module}')
+
+    return within
+
+
+if __name__ == '__main__':
+    modules = sys.argv[1:] if len(sys.argv) > 1 else CONSOLES
+
+    if not check_startup(modules):
+        sys.exit(1)